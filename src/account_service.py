@@ -0,0 +1,251 @@
+import threading
+import time
+
+import numpy as np
+
+from src.nado_client import get_nado_client
+from src.request_scheduler import get_scheduler, PRIORITY_ACCOUNT
+
+X18 = 10**18
+
+# Order of the engine's healths list, and of the second axis of AccountService.health
+HEALTH_INITIAL = 0
+HEALTH_MAINTENANCE = 1
+HEALTH_UNWEIGHTED = 2
+HEALTH_TYPES = ("initial", "maintenance", "unweighted")
+
+# Last axis of AccountService.health
+ASSETS = 0
+LIABILITIES = 1
+HEALTH = 2
+
+# Flat, untouched subaccounts only change through deposits, withdrawals and transfers,
+# so they are re-fetched on this cadence rather than on every refresh
+FULL_REFRESH_SECONDS = 60.0
+
+
+def _fingerprint(summary) -> tuple:
+    """The raw fields a summary is decoded from, used to skip decoding unchanged accounts."""
+    return (
+        bool(summary.exists),
+        tuple((h.assets, h.liabilities, h.health) for h in summary.healths or []),
+        tuple((b.product_id, b.balance.amount) for b in summary.spot_balances or []),
+        tuple((b.product_id, b.balance.amount, b.balance.v_quote_balance) for b in summary.perp_balances or []),
+    )
+
+
+class AccountService:
+    """
+    Monitors every subaccount of a signer.
+
+    Subaccounts are listed once, their engine summaries are fetched concurrently through the
+    request scheduler, and healths and perp balances are kept in columnar arrays with one row
+    per subaccount. Only summaries that changed since the last refresh are decoded again.
+
+    A refresh fetches only the accounts whose state can have changed: those with open perp
+    positions (their health moves with prices), those marked with touch() after an order,
+    and those not loaded yet. Every FULL_REFRESH_SECONDS all accounts are fetched.
+
+    Arrays (rows follow `subaccounts`, perp columns follow `product_ids`):
+        exists (n,): Whether the engine knows the subaccount.
+        health (n, 3, 3): [row, HEALTH_INITIAL/MAINTENANCE/UNWEIGHTED, ASSETS/LIABILITIES/HEALTH].
+        quote_balance (n,): Spot balance of the quote product (product 0).
+        perp_amount (n, p): Perp position sizes, positive for long.
+        perp_v_quote (n, p): Perp virtual quote balances.
+
+    Args:
+        nado_client: The Nado client (or MockNadoClient). Defaults to get_nado_client().
+        address (str, optional): Signer address to monitor. Defaults to the client's signer.
+        full_refresh_seconds (float): How often every subaccount is fetched.
+    """
+
+    def __init__(self, nado_client=None, address: str = None, full_refresh_seconds: float = FULL_REFRESH_SECONDS):
+        self.nado_client = nado_client or get_nado_client()
+        self.address = address or self.nado_client.context.signer.address
+        self.full_refresh_seconds = full_refresh_seconds
+        self.subaccounts = []
+        self.product_ids = []
+        self.summaries = {}
+        self.exists = np.zeros(0, dtype=bool)
+        self.health = np.zeros((0, len(HEALTH_TYPES), 3))
+        self.quote_balance = np.zeros(0)
+        self.perp_amount = np.zeros((0, 0))
+        self.perp_v_quote = np.zeros((0, 0))
+
+        self._rows = {}
+        self._columns = {}
+        self._fingerprints = {}
+        self._touched = set()
+        self._last_full_refresh = None
+        self._listed = False
+        self._lock = threading.Lock()
+
+    def list_subaccounts(self, refresh: bool = False) -> list:
+        """
+        Returns the signer's subaccount IDs, querying the indexer only the first time.
+
+        Args:
+            refresh (bool): Query again, e.g. after a subaccount was created.
+        """
+        if self._listed and not refresh:
+            return list(self.subaccounts)
+
+        response = get_scheduler().call(
+            "indexer", self.nado_client.subaccount.get_subaccounts,
+            address=self.address,
+            priority=PRIORITY_ACCOUNT, key=("subaccounts", self.address)
+        )
+        with self._lock:
+            for subaccount in (response.subaccounts if response else None) or []:
+                self._add_row(subaccount.subaccount)
+            self._listed = True
+        return list(self.subaccounts)
+
+    def _add_row(self, subaccount: str) -> int:
+        row = self._rows.get(subaccount)
+        if row is not None:
+            return row
+        row = self._rows[subaccount] = len(self.subaccounts)
+        self.subaccounts.append(subaccount)
+        self.exists = np.append(self.exists, False)
+        self.health = np.concatenate([self.health, np.zeros((1,) + self.health.shape[1:])])
+        self.quote_balance = np.append(self.quote_balance, 0.0)
+        self.perp_amount = np.vstack([self.perp_amount, np.zeros((1, len(self.product_ids)))])
+        self.perp_v_quote = np.vstack([self.perp_v_quote, np.zeros((1, len(self.product_ids)))])
+        return row
+
+    def _column(self, product_id: int) -> int:
+        column = self._columns.get(product_id)
+        if column is not None:
+            return column
+        column = self._columns[product_id] = len(self.product_ids)
+        self.product_ids.append(product_id)
+        self.perp_amount = np.hstack([self.perp_amount, np.zeros((len(self.subaccounts), 1))])
+        self.perp_v_quote = np.hstack([self.perp_v_quote, np.zeros((len(self.subaccounts), 1))])
+        return column
+
+    def touch(self, subaccount: str):
+        """Marks a subaccount for the next refresh, e.g. after placing an order from it."""
+        with self._lock:
+            self._touched.add(subaccount)
+
+    def _due(self) -> list:
+        now = time.monotonic()
+        subaccounts = self.list_subaccounts()
+        if self._last_full_refresh is None or now - self._last_full_refresh >= self.full_refresh_seconds:
+            self._last_full_refresh = now
+            return subaccounts
+
+        with self._lock:
+            open_rows = set(np.flatnonzero((self.perp_amount != 0).any(axis=1)))
+            return [
+                subaccount for row, subaccount in enumerate(subaccounts)
+                if row in open_rows or subaccount in self._touched or subaccount not in self._fingerprints
+            ]
+
+    def refresh(self, subaccounts: list = None) -> list:
+        """
+        Fetches engine summaries concurrently and updates the rows of accounts that changed.
+
+        Args:
+            subaccounts (list, optional): Subaccounts to fetch. Defaults to the ones that can
+                                          have changed (see the class docstring).
+
+        Returns:
+            list: The subaccounts whose summary changed since the previous refresh.
+        """
+        if subaccounts is None:
+            subaccounts = self._due()
+
+        scheduler = get_scheduler()
+        futures = {
+            subaccount: scheduler.submit(
+                "engine.query", self.nado_client.subaccount.get_engine_subaccount_summary,
+                subaccount=subaccount,
+                priority=PRIORITY_ACCOUNT, key=("subaccount_summary", subaccount)
+            )
+            for subaccount in subaccounts
+        }
+
+        changed = []
+        for subaccount, future in futures.items():
+            try:
+                summary = future.result()
+            except Exception as e:
+                print(f"An error occurred while fetching summary for subaccount {subaccount}: {e}")
+                continue
+
+            fingerprint = _fingerprint(summary)
+            with self._lock:
+                self._touched.discard(subaccount)
+            if self._fingerprints.get(subaccount) == fingerprint:
+                continue
+            with self._lock:
+                self._decode(self._add_row(subaccount), summary)
+                self._fingerprints[subaccount] = fingerprint
+                self.summaries[subaccount] = summary
+            changed.append(subaccount)
+        return changed
+
+    def _decode(self, row: int, summary):
+        self.exists[row] = bool(summary.exists)
+
+        self.health[row] = 0.0
+        for i, health in enumerate((summary.healths or [])[:len(HEALTH_TYPES)]):
+            self.health[row, i] = (
+                int(health.assets) / X18, int(health.liabilities) / X18, int(health.health) / X18
+            )
+
+        self.quote_balance[row] = 0.0
+        for balance in summary.spot_balances or []:
+            if int(balance.product_id) == 0:
+                self.quote_balance[row] = int(balance.balance.amount) / X18
+
+        self.perp_amount[row] = 0.0
+        self.perp_v_quote[row] = 0.0
+        for balance in summary.perp_balances or []:
+            column = self._column(int(balance.product_id))
+            self.perp_amount[row, column] = int(balance.balance.amount) / X18
+            self.perp_v_quote[row, column] = int(balance.balance.v_quote_balance) / X18
+
+    def row(self, subaccount: str) -> int:
+        """Returns the table row of a subaccount, or None if it is not monitored."""
+        return self._rows.get(subaccount)
+
+    def position(self, subaccount: str, product_id: int) -> tuple:
+        """
+        Returns (amount, v_quote_balance) of a subaccount's perp position, zeros if there is none.
+        """
+        row = self._rows.get(subaccount)
+        column = self._columns.get(product_id)
+        if row is None or column is None:
+            return 0.0, 0.0
+        return float(self.perp_amount[row, column]), float(self.perp_v_quote[row, column])
+
+    def to_dataframe(self):
+        """
+        Returns the table as a DataFrame with one row per subaccount: healths, quote balance,
+        and amount_<product_id>/v_quote_<product_id> columns per perp product.
+        """
+        import pandas as pd
+
+        with self._lock:
+            columns = {'exists': self.exists.copy()}
+            for i, health_type in enumerate(HEALTH_TYPES):
+                columns[f'{health_type}_assets'] = self.health[:, i, ASSETS]
+                columns[f'{health_type}_liabilities'] = self.health[:, i, LIABILITIES]
+                columns[f'{health_type}_health'] = self.health[:, i, HEALTH]
+            columns['quote_balance'] = self.quote_balance.copy()
+            for column, product_id in enumerate(self.product_ids):
+                columns[f'amount_{product_id}'] = self.perp_amount[:, column]
+                columns[f'v_quote_{product_id}'] = self.perp_v_quote[:, column]
+            return pd.DataFrame(columns, index=pd.Index(list(self.subaccounts), name='subaccount'))
+
+
+if __name__ == "__main__":
+    service = AccountService()
+    started = time.perf_counter()
+    subaccounts = service.list_subaccounts()
+    changed = service.refresh()
+    print(f"Fetched {len(changed)} of {len(subaccounts)} subaccount summaries in {time.perf_counter() - started:.3f}s")
+    print(service.to_dataframe().T)
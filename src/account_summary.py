@@ -1,5 +1,5 @@
-from src.nado_client import get_nado_client, NadoClientMode
-from nado_protocol.client import NadoClientMode
+from src.nado_client import get_nado_client
+from src.request_scheduler import get_scheduler, PRIORITY_ACCOUNT
 import os
 
 def get_account_summary():
@@ -11,7 +11,11 @@ def get_account_summary():
         main_account_address = nado_client.context.signer.address
         print(f"Fetching subaccounts for main account address: {main_account_address}")
 
-        subaccounts = nado_client.subaccount.get_subaccounts(address=main_account_address)
+        subaccounts = get_scheduler().call(
+            "indexer", nado_client.subaccount.get_subaccounts,
+            address=main_account_address,
+            priority=PRIORITY_ACCOUNT, key=("subaccounts", main_account_address)
+        )
 
         if not subaccounts.subaccounts:
             print("No subaccounts found.")
@@ -23,15 +27,43 @@ def get_account_summary():
         print(f"Fetching summary for subaccount ID: {first_subaccount_id}")
 
         # 2. Get the engine subaccount summary
-        summary = nado_client.subaccount.get_engine_subaccount_summary(subaccount=first_subaccount_id)
+        summary = get_scheduler().call(
+            "engine.query", nado_client.subaccount.get_engine_subaccount_summary,
+            subaccount=first_subaccount_id,
+            priority=PRIORITY_ACCOUNT, key=("subaccount_summary", first_subaccount_id)
+        )
 
         return summary
     except Exception as e:
         print(f"An error occurred while fetching account summary: {e}")
         return None
 
-if __name__ == "__main__":
-    account_data = get_account_summary()
+def get_account_summaries():
+    """
+    Fetches the engine summaries of all subaccounts of the signer concurrently.
+
+    Returns:
+        AccountService: The service holding every summary and the decoded table, or None on error.
+    """
+    try:
+        from src.account_service import AccountService
+
+        service = AccountService(get_nado_client())
+        subaccounts = service.list_subaccounts()
+        if not subaccounts:
+            print("No subaccounts found.")
+            return None
+        print(f"Fetching summaries for {len(subaccounts)} subaccounts")
+        service.refresh()
+        return service
+    except Exception as e:
+        print(f"An error occurred while fetching account summaries: {e}")
+        return None
+
+def print_account_summary(account_data):
+    """
+    Prints a readable overview of an engine subaccount summary.
+    """
     if account_data:
         print("\n--- Account Summary ---")
         print(f"Subaccount ID: {account_data.subaccount}")
@@ -72,3 +104,7 @@ if __name__ == "__main__":
 
     else:
         print("Failed to retrieve account summary.")
+
+if __name__ == "__main__":
+    account_data = get_account_summary()
+    print_account_summary(account_data)
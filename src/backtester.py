@@ -1,5 +1,12 @@
+import numpy as np
 import pandas as pd
-from src.strategy import moving_average_crossover_strategy
+from src.data_acquisition import get_historical_candlesticks
+from src.strategy import (
+    apply_moving_average_crossover,
+    candlesticks_to_dataframe,
+    crossover_strategy_name,
+    moving_average_crossover_strategy,
+)
 
 def run_backtest(
     product_id: int,
@@ -8,7 +15,9 @@ def run_backtest(
     long_window: int,
     initial_capital: float = 10000.0,
     commission_rate: float = 0.001, # 0.1% commission
-    slippage: float = 0.0001 # 0.01% slippage
+    slippage: float = 0.0001, # 0.01% slippage
+    journal=None,
+    fill_model=None
 ) -> dict:
     """
     Runs a backtest of the moving average crossover strategy.
@@ -21,9 +30,13 @@ def run_backtest(
         initial_capital (float): Starting capital for the backtest.
         commission_rate (float): Commission rate per trade (e.g., 0.001 for 0.1%).
         slippage (float): Slippage percentage per trade.
+        journal (TradeJournal, optional): Journal to record the trades in.
+        fill_model (FillModel, optional): Prices orders from order book depth instead of
+                                          the fixed slippage.
 
     Returns:
         dict: A dictionary containing backtest results (e.g., final capital, PnL, trades).
+              With a journal, 'run_id' is the run the trades were recorded under.
     """
     strategy_data = moving_average_crossover_strategy(
         product_id, interval, short_window, long_window
@@ -33,41 +46,90 @@ def run_backtest(
         print("No strategy data to backtest.")
         return {}
 
+    results = simulate_trades(strategy_data, initial_capital, commission_rate, slippage, fill_model=fill_model)
+    if journal is not None:
+        results['run_id'] = journal.record_backtest(
+            results, product_id, crossover_strategy_name(short_window, long_window)
+        )
+    return results
+
+def simulate_trades(
+    strategy_data: pd.DataFrame,
+    initial_capital: float = 10000.0,
+    commission_rate: float = 0.001,
+    slippage: float = 0.0001,
+    verbose: bool = True,
+    fill_model=None
+) -> dict:
+    """
+    Trades the Position signals of strategy data and returns the backtest results.
+
+    Args:
+        strategy_data (pd.DataFrame): Output of apply_moving_average_crossover.
+        initial_capital (float): Starting capital for the backtest.
+        commission_rate (float): Commission rate per trade (e.g., 0.001 for 0.1%).
+        slippage (float): Slippage percentage per trade.
+        verbose (bool): Print every trade.
+        fill_model (FillModel, optional): Prices each order by its size from order book depth
+                                          instead of the fixed slippage.
+
+    Returns:
+        dict: A dictionary containing backtest results (e.g., final capital, PnL, trades).
+    """
     capital = initial_capital
     position = 0  # 0 for no position, 1 for long, -1 for short
     trades = []
     current_trade_pnl = 0
     in_trade = False
 
-    for i, row in strategy_data.iterrows():
+    # Only crossover bars can trade, so visit those instead of iterating over every row
+    closes = strategy_data['close'].to_numpy(dtype=float)
+    signals = strategy_data['Position'].to_numpy(dtype=float)
+    signal_bars = np.flatnonzero((signals == 1) | (signals == -1))
+    if fill_model is not None:
+        timestamps = strategy_data.index.to_numpy().astype('datetime64[s]').astype(np.int64)
+
+    def fill_price(bar: int, size: float, is_buy: bool) -> float:
+        if fill_model is None:
+            return closes[bar] * (1 + slippage) if is_buy else closes[bar] * (1 - slippage)
+        return float(fill_model.fill_prices(closes[bar], timestamps[bar], size, is_buy)[0])
+
+    for bar in signal_bars:
+        i = strategy_data.index[bar]
+        close = closes[bar]
+
         # Buy signal
-        if row['Position'] == 1 and position == 0:
-            # Open a long position
-            trade_price = row['close'] * (1 + slippage)
+        if signals[bar] == 1 and position == 0:
+            # Open a long position; the order size is what the capital buys at the close
+            trade_price = fill_price(bar, capital / close, True)
             shares = capital / trade_price
             capital -= shares * trade_price
             capital -= shares * trade_price * commission_rate
             position = 1
             in_trade = True
-            trades.append({'date': i, 'type': 'BUY', 'price': trade_price, 'shares': shares, 'capital': capital})
-            print(f"BUY: {i} - Price: {trade_price:.2f}, Shares: {shares:.6f}, Capital: {capital:.2f}")
+            trades.append({'date': i, 'type': 'BUY', 'price': trade_price, 'shares': shares, 'capital': capital,
+                           'signal_price': close, 'fee': shares * trade_price * commission_rate})
+            if verbose:
+                print(f"BUY: {i} - Price: {trade_price:.2f}, Shares: {shares:.6f}, Capital: {capital:.2f}")
 
         # Sell signal (to close long position)
-        elif row['Position'] == -1 and position == 1:
+        elif signals[bar] == -1 and position == 1:
             # Close long position
-            trade_price = row['close'] * (1 - slippage)
+            trade_price = fill_price(bar, shares, False)
             capital += shares * trade_price
             capital -= shares * trade_price * commission_rate
             current_trade_pnl = (shares * trade_price) - (trades[-1]['shares'] * trades[-1]['price']) # Simple PnL for this trade
             position = 0
             in_trade = False
-            trades.append({'date': i, 'type': 'SELL', 'price': trade_price, 'shares': shares, 'capital': capital, 'pnl': current_trade_pnl})
-            print(f"SELL: {i} - Price: {trade_price:.2f}, Shares: {shares:.6f}, Capital: {capital:.2f}, PnL: {current_trade_pnl:.2f}")
+            trades.append({'date': i, 'type': 'SELL', 'price': trade_price, 'shares': shares, 'capital': capital, 'pnl': current_trade_pnl,
+                           'signal_price': close, 'fee': shares * trade_price * commission_rate})
+            if verbose:
+                print(f"SELL: {i} - Price: {trade_price:.2f}, Shares: {shares:.6f}, Capital: {capital:.2f}, PnL: {current_trade_pnl:.2f}")
 
         # Additional logic for short selling if desired:
-        # if row['Position'] == -1 and position == 0:
+        # if signals[bar] == -1 and position == 0:
         #     # Open a short position
-        #     trade_price = row['close'] * (1 - slippage)
+        #     trade_price = close * (1 - slippage)
         #     shares = capital / trade_price # Assuming we can short with full capital value
         #     capital += shares * trade_price # Shorting increases capital initially
         #     capital -= shares * trade_price * commission_rate
@@ -76,9 +138,9 @@ def run_backtest(
         #     trades.append({'date': i, 'type': 'SHORT', 'price': trade_price, 'shares': shares, 'capital': capital})
         #     print(f"SHORT: {i} - Price: {trade_price:.2f}, Shares: {shares:.6f}, Capital: {capital:.2f}")
 
-        # elif row['Position'] == 1 and position == -1:
+        # elif signals[bar] == 1 and position == -1:
         #     # Close short position
-        #     trade_price = row['close'] * (1 + slippage)
+        #     trade_price = close * (1 + slippage)
         #     capital -= shares * trade_price # Closing short decreases capital
         #     capital -= shares * trade_price * commission_rate
         #     current_trade_pnl = (trades[-1]['shares'] * trades[-1]['price']) - (shares * trade_price) # PnL for short
@@ -89,19 +151,23 @@ def run_backtest(
 
     # If still in a position at the end, close it
     if position == 1: # Long position
-        trade_price = strategy_data.iloc[-1]['close'] * (1 - slippage)
+        trade_price = fill_price(len(closes) - 1, shares, False)
         capital += shares * trade_price
         capital -= shares * trade_price * commission_rate
         current_trade_pnl = (shares * trade_price) - (trades[-1]['shares'] * trades[-1]['price'])
-        trades.append({'date': strategy_data.index[-1], 'type': 'SELL_FINAL', 'price': trade_price, 'shares': shares, 'capital': capital, 'pnl': current_trade_pnl})
-        print(f"SELL_FINAL: {strategy_data.index[-1]} - Price: {trade_price:.2f}, Shares: {shares:.6f}, Capital: {capital:.2f}, PnL: {current_trade_pnl:.2f}")
+        trades.append({'date': strategy_data.index[-1], 'type': 'SELL_FINAL', 'price': trade_price, 'shares': shares, 'capital': capital, 'pnl': current_trade_pnl,
+                       'signal_price': closes[-1], 'fee': shares * trade_price * commission_rate})
+        if verbose:
+            print(f"SELL_FINAL: {strategy_data.index[-1]} - Price: {trade_price:.2f}, Shares: {shares:.6f}, Capital: {capital:.2f}, PnL: {current_trade_pnl:.2f}")
     elif position == -1: # Short position
-        trade_price = strategy_data.iloc[-1]['close'] * (1 + slippage)
+        trade_price = fill_price(len(closes) - 1, shares, True)
         capital -= shares * trade_price
         capital -= shares * trade_price * commission_rate
         current_trade_pnl = (trades[-1]['shares'] * trades[-1]['price']) - (shares * trade_price)
-        trades.append({'date': strategy_data.index[-1], 'type': 'COVER_FINAL', 'price': trade_price, 'shares': shares, 'capital': capital, 'pnl': current_trade_pnl})
-        print(f"COVER_FINAL: {strategy_data.index[-1]} - Price: {trade_price:.2f}, Shares: {shares:.6f}, Capital: {capital:.2f}, PnL: {current_trade_pnl:.2f}")
+        trades.append({'date': strategy_data.index[-1], 'type': 'COVER_FINAL', 'price': trade_price, 'shares': shares, 'capital': capital, 'pnl': current_trade_pnl,
+                       'signal_price': closes[-1], 'fee': shares * trade_price * commission_rate})
+        if verbose:
+            print(f"COVER_FINAL: {strategy_data.index[-1]} - Price: {trade_price:.2f}, Shares: {shares:.6f}, Capital: {capital:.2f}, PnL: {current_trade_pnl:.2f}")
 
 
     final_pnl = capital - initial_capital
@@ -113,6 +179,79 @@ def run_backtest(
         'trades': trades
     }
 
+def _backtest_windows(bars, short_window, long_window, initial_capital, commission_rate, slippage, fill_model=None):
+    strategy_data = apply_moving_average_crossover(bars.copy(), short_window, long_window)
+    results = simulate_trades(strategy_data, initial_capital, commission_rate, slippage, verbose=False,
+                              fill_model=fill_model)
+    results['short_window'] = short_window
+    results['long_window'] = long_window
+    return results
+
+def run_sweep(
+    product_id: int,
+    interval: str,
+    short_windows: list,
+    long_windows: list,
+    initial_capital: float = 10000.0,
+    commission_rate: float = 0.001,
+    slippage: float = 0.0001,
+    workers: int = 1,
+    journal=None,
+    fill_model=None
+) -> list:
+    """
+    Backtests every short/long window combination on one fetch of candlestick data.
+
+    Args:
+        product_id (int): The ID of the product (e.g., 1 for BTC).
+        interval (str): The candlestick interval (e.g., "1H", "4H", "1D").
+        short_windows (list): Short-term SMA windows to try.
+        long_windows (list): Long-term SMA windows to try; pairs with short >= long are skipped.
+        initial_capital (float): Starting capital for each backtest.
+        commission_rate (float): Commission rate per trade (e.g., 0.001 for 0.1%).
+        slippage (float): Slippage percentage per trade.
+        workers (int): Worker processes; 1 runs the combinations in this process.
+        journal (TradeJournal, optional): Journal to record every combination's trades in,
+                                          under one run ID.
+        fill_model (FillModel, optional): Prices orders from order book depth instead of
+                                          the fixed slippage.
+
+    Returns:
+        list: Backtest results with their windows, best total PnL first.
+    """
+    candlesticks = get_historical_candlesticks(product_id, interval)
+    if not candlesticks:
+        print("No candlestick data to sweep.")
+        return []
+    bars = candlesticks_to_dataframe(candlesticks)
+
+    combinations = [(short_window, long_window)
+                    for short_window in short_windows
+                    for long_window in long_windows
+                    if short_window < long_window]
+    if not combinations:
+        print("No window combinations with short < long to sweep.")
+        return []
+    args = [(bars, short_window, long_window, initial_capital, commission_rate, slippage, fill_model)
+            for short_window, long_window in combinations]
+
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_backtest_windows, *zip(*args)))
+    else:
+        results = [_backtest_windows(*arg) for arg in args]
+
+    if journal is not None:
+        run_id = journal.record_backtests([
+            (result, product_id, crossover_strategy_name(result['short_window'], result['long_window']))
+            for result in results
+        ])
+        for result in results:
+            result['run_id'] = run_id
+
+    return sorted(results, key=lambda result: result['total_pnl'], reverse=True)
+
 if __name__ == "__main__":
     product_id_btc = 2
     interval_1h = "1H"
@@ -0,0 +1,247 @@
+"""
+nado-bot: one entry point for the bot's tools.
+
+    python -m src.cli run [--stream | --bus [--workers N]] [--max-cycles N]
+    python -m src.cli backtest --product-id 2 --interval 1H --short 10 --long 30
+    python -m src.cli sweep --short 5,10,20 --long 30,50,100 --workers 4
+    python -m src.cli montecarlo --method blocks --resamples 10000 --seed 42
+    python -m src.cli journal --by strategy --source backtest
+    python -m src.cli account
+    python -m src.cli price --product-id 2
+
+Each subcommand imports only what it uses, so e.g. `price` never loads pandas and
+`--help` loads neither pandas nor the SDK.
+"""
+import argparse
+import sys
+
+from src.data_acquisition import INTERVAL_SECONDS
+
+DEFAULT_PRODUCT_ID = 2  # BTC Perpetual
+DEFAULT_INTERVAL = "1H"
+
+
+def _int_list(value: str) -> list:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def cmd_run(args):
+    from src import main_bot
+
+    try:
+        if args.stream or args.ws_url:
+            main_bot.run_streaming_bot(url=args.ws_url)
+        elif args.bus:
+            main_bot.run_bus_bot(workers=args.workers)
+        else:
+            main_bot.run_bot(max_cycles=args.max_cycles)
+    except KeyboardInterrupt:
+        main_bot.logger.info("Bot shutting down gracefully...")
+        print("\nBot stopped by user.")
+
+
+def _journal(args):
+    if not args.journal:
+        return None
+    from src.trade_journal import TradeJournal
+    return TradeJournal(args.journal)
+
+
+def _fill_model(args):
+    if not args.book:
+        return None
+    from src.fill_model import FillModel
+    fill_model = FillModel.load(args.book)
+    print(f"Pricing orders from {len(fill_model.snapshots)} book snapshots, falling back to {fill_model.curve}")
+    return fill_model
+
+
+def cmd_backtest(args):
+    from src.backtester import run_backtest
+
+    results = run_backtest(
+        args.product_id, args.interval, args.short, args.long,
+        args.capital, args.commission, args.slippage, journal=_journal(args), fill_model=_fill_model(args)
+    )
+    if not results:
+        print("Backtest failed or no trades executed.")
+        return 1
+
+    print("\n--- Backtest Results ---")
+    print(f"Initial Capital: {results['initial_capital']:.2f}")
+    print(f"Final Capital: {results['final_capital']:.2f}")
+    print(f"Total PnL: {results['total_pnl']:.2f}")
+    print(f"Number of Trades: {results['num_trades']}")
+    if 'run_id' in results:
+        print(f"Journaled as run {results['run_id']} in {args.journal}")
+    return 0
+
+
+def cmd_sweep(args):
+    from src.backtester import run_sweep
+
+    results = run_sweep(
+        args.product_id, args.interval, args.short, args.long,
+        args.capital, args.commission, args.slippage, workers=args.workers, journal=_journal(args),
+        fill_model=_fill_model(args)
+    )
+    if not results:
+        return 1
+
+    print(f"\n--- Sweep Results (top {min(args.top, len(results))} of {len(results)}) ---")
+    print(f"{'Short':>6} {'Long':>6} {'Trades':>7} {'Total PnL':>14}")
+    for result in results[:args.top]:
+        print(f"{result['short_window']:>6} {result['long_window']:>6} "
+              f"{result['num_trades']:>7} {result['total_pnl']:>14.2f}")
+    return 0
+
+
+def cmd_montecarlo(args):
+    from src.monte_carlo import print_summary, run_monte_carlo
+
+    summary = run_monte_carlo(
+        args.product_id, args.interval, args.short, args.long, method=args.method,
+        initial_capital=args.capital, commission_rate=args.commission, slippage=args.slippage,
+        n_resamples=args.resamples, workers=args.workers, seed=args.seed,
+        **({'block_length': args.block_length} if args.method == "blocks" else {})
+    )
+    print_summary(summary)
+    return 0 if summary else 1
+
+
+def cmd_journal(args):
+    from src.trade_journal import TradeJournal
+
+    journal = TradeJournal(args.path)
+    filters = {'product_id': args.product_id, 'source': args.source, 'strategy': args.strategy,
+               'run_id': args.run_id, 'start': args.start, 'end': args.end}
+    by = args.by.split(",")
+    pnl = journal.pnl(by=by, **filters)
+    if pnl.empty:
+        print(f"No fills journaled in {args.path} match.")
+        return 1
+
+    print("\n--- PnL ---")
+    print(pnl.to_string(index=False))
+    print("\n--- Slippage vs. Signal Price ---")
+    print(journal.slippage(by=by, **filters).to_string(index=False))
+    print("\n--- Hit Rate ---")
+    print(journal.hit_rate(by=by, **filters).to_string(index=False))
+    return 0
+
+
+def cmd_account(args):
+    from src.account_summary import get_account_summaries, get_account_summary, print_account_summary
+
+    if args.all:
+        service = get_account_summaries()
+        if service is None:
+            return 1
+        print(service.to_dataframe().T.to_string())
+        return 0
+
+    account_data = get_account_summary()
+    print_account_summary(account_data)
+    return 0 if account_data else 1
+
+
+def cmd_price(args):
+    from src.data_acquisition import get_latest_perp_price
+
+    price = get_latest_perp_price(args.product_id)
+    if price is None:
+        return 1
+    print(f"Product {args.product_id} Mark Price: {price}")
+    return 0
+
+
+def _add_book_argument(parser):
+    parser.add_argument("--book", default=None,
+                        help="Book snapshots (.npz from src.fill_model) to price orders by size instead of --slippage.")
+
+
+def _add_backtest_arguments(parser):
+    parser.add_argument("--product-id", type=int, default=DEFAULT_PRODUCT_ID)
+    parser.add_argument("--interval", choices=list(INTERVAL_SECONDS), default=DEFAULT_INTERVAL)
+    parser.add_argument("--capital", type=float, default=100000.0, help="Initial capital.")
+    parser.add_argument("--commission", type=float, default=0.001, help="Commission rate per trade.")
+    parser.add_argument("--slippage", type=float, default=0.0001, help="Slippage per trade.")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="nado-bot", description="Nado trading bot tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the trading bot.")
+    run_parser.add_argument("--stream", action="store_true", help="Trade on bars built from the websocket stream.")
+    run_parser.add_argument("--ws-url", default=None, help="Subscription websocket URL (implies --stream).")
+    run_parser.add_argument("--bus", action="store_true",
+                            help="Poll candles and run the strategy in separate processes over shared memory.")
+    run_parser.add_argument("--workers", type=int, default=None, help="Strategy worker processes with --bus.")
+    run_parser.add_argument("--max-cycles", type=int, default=None, help="Stop after this many polling cycles.")
+    run_parser.set_defaults(func=cmd_run)
+
+    backtest_parser = subparsers.add_parser("backtest", help="Backtest the moving average crossover strategy.")
+    _add_backtest_arguments(backtest_parser)
+    backtest_parser.add_argument("--short", type=int, default=10, help="Short-term SMA window.")
+    backtest_parser.add_argument("--long", type=int, default=30, help="Long-term SMA window.")
+    backtest_parser.add_argument("--journal", default=None, help="Journal the trades to this directory.")
+    _add_book_argument(backtest_parser)
+    backtest_parser.set_defaults(func=cmd_backtest)
+
+    sweep_parser = subparsers.add_parser("sweep", help="Backtest a grid of SMA windows on one data fetch.")
+    _add_backtest_arguments(sweep_parser)
+    sweep_parser.add_argument("--short", type=_int_list, default=[5, 10, 20], help="Comma-separated short windows.")
+    sweep_parser.add_argument("--long", type=_int_list, default=[30, 50, 100], help="Comma-separated long windows.")
+    sweep_parser.add_argument("--workers", type=int, default=1, help="Worker processes.")
+    sweep_parser.add_argument("--top", type=int, default=10, help="Number of results to print.")
+    sweep_parser.add_argument("--journal", default=None, help="Journal every combination's trades to this directory.")
+    _add_book_argument(sweep_parser)
+    sweep_parser.set_defaults(func=cmd_sweep)
+
+    montecarlo_parser = subparsers.add_parser("montecarlo", help="Confidence intervals for a backtest by resampling.")
+    _add_backtest_arguments(montecarlo_parser)
+    montecarlo_parser.add_argument("--short", type=int, default=10, help="Short-term SMA window.")
+    montecarlo_parser.add_argument("--long", type=int, default=30, help="Long-term SMA window.")
+    montecarlo_parser.add_argument("--method", choices=["trades", "blocks"], default="blocks",
+                                   help="Bootstrap round trips or resample blocks of candles.")
+    montecarlo_parser.add_argument("--resamples", type=int, default=10000)
+    montecarlo_parser.add_argument("--block-length", type=int, default=24 * 7, help="Bars per resampled block.")
+    montecarlo_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    montecarlo_parser.add_argument("--seed", type=int, default=None)
+    montecarlo_parser.set_defaults(func=cmd_montecarlo)
+
+    journal_parser = subparsers.add_parser("journal", help="PnL, slippage and hit rate from the trade journal.")
+    journal_parser.add_argument("--path", default="journal", help="Trade journal directory.")
+    journal_parser.add_argument("--by", default="strategy",
+                                help="Comma-separated columns (product_id, strategy, source, run_id, kind) "
+                                     "and/or a period (hour, day, week, month).")
+    journal_parser.add_argument("--product-id", type=int, default=None)
+    journal_parser.add_argument("--source", choices=["live", "backtest"], default=None)
+    journal_parser.add_argument("--strategy", default=None)
+    journal_parser.add_argument("--run-id", default=None)
+    journal_parser.add_argument("--start", default=None, help="Earliest fill time, e.g. 2024-01-01.")
+    journal_parser.add_argument("--end", default=None, help="Fills before this time.")
+    journal_parser.set_defaults(func=cmd_journal)
+
+    account_parser = subparsers.add_parser("account", help="Show the account summary.")
+    account_parser.add_argument("--all", action="store_true", help="Show a table of every subaccount.")
+    account_parser.set_defaults(func=cmd_account)
+
+    price_parser = subparsers.add_parser("price", help="Show the latest perpetual mark price.")
+    price_parser.add_argument("--product-id", type=int, default=DEFAULT_PRODUCT_ID)
+    price_parser.set_defaults(func=cmd_price)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    from dotenv import load_dotenv
+
+    args = build_parser().parse_args(argv)
+    load_dotenv()
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,38 +1,67 @@
-from src.nado_client import get_nado_client, NadoClientMode
+from src.nado_client import get_nado_client
+from src.request_scheduler import get_scheduler, PRIORITY_MARKET_DATA
 from datetime import datetime
-from nado_protocol.indexer_client.types.query import IndexerCandlesticksParams, IndexerCandlesticksGranularity
 
-# Mapping for candlestick intervals
+# Mapping for candlestick intervals to IndexerCandlesticksGranularity members,
+# resolved when candlesticks are fetched so the SDK is only imported when needed
 INTERVAL_MAP = {
-    "1M": IndexerCandlesticksGranularity.ONE_MINUTE,
-    "5M": IndexerCandlesticksGranularity.FIVE_MINUTES,
-    "15M": IndexerCandlesticksGranularity.FIFTEEN_MINUTES,
-    "1H": IndexerCandlesticksGranularity.ONE_HOUR,
-    "2H": IndexerCandlesticksGranularity.TWO_HOURS,
-    "4H": IndexerCandlesticksGranularity.FOUR_HOURS,
-    "1D": IndexerCandlesticksGranularity.ONE_DAY,
-    "1W": IndexerCandlesticksGranularity.ONE_WEEK,
-    "4W": IndexerCandlesticksGranularity.FOUR_WEEKS,
+    "1M": "ONE_MINUTE",
+    "5M": "FIVE_MINUTES",
+    "15M": "FIFTEEN_MINUTES",
+    "1H": "ONE_HOUR",
+    "2H": "TWO_HOURS",
+    "4H": "FOUR_HOURS",
+    "1D": "ONE_DAY",
+    "1W": "ONE_WEEK",
+    "4W": "FOUR_WEEKS",
 }
 
-def get_latest_btc_perp_price():
+# Candlestick interval lengths in seconds
+INTERVAL_SECONDS = {
+    "1M": 60,
+    "5M": 300,
+    "15M": 900,
+    "1H": 3600,
+    "2H": 7200,
+    "4H": 14400,
+    "1D": 86400,
+    "1W": 604800,
+    "4W": 2419200,
+}
+
+def get_latest_perp_price(product_id: int):
     """
-    Initializes Nado client and fetches the latest Perpetual BTC price.
+    Fetches the latest mark price of a perpetual product.
+
+    Args:
+        product_id (int): The ID of the perpetual product (e.g., 2 for BTC).
+
+    Returns:
+        float: The mark price, or None if an error occurs.
     """
     try:
         nado_client = get_nado_client()
-        perp_prices_data = nado_client.perp.get_prices(2)
+        perp_prices_data = get_scheduler().call(
+            "engine.query", nado_client.perp.get_prices, product_id,
+            priority=PRIORITY_MARKET_DATA, key=("perp_prices", product_id)
+        )
 
         if perp_prices_data:
             mark_price = int(perp_prices_data.mark_price_x18) / (10**18)
             return mark_price
         else:
-            print("Could not retrieve perpetual BTC prices.")
+            print(f"Could not retrieve perpetual prices for product {product_id}.")
             return None
     except Exception as e:
-        print(f"An error occurred while fetching BTC Perpetual price: {e}")
+        print(f"An error occurred while fetching perpetual price for product {product_id}: {e}")
         return None
 
+def get_latest_btc_perp_price():
+    """
+    Initializes Nado client and fetches the latest Perpetual BTC price.
+    """
+    return get_latest_perp_price(2)
+
 def get_historical_candlesticks(product_id: int, interval: str):
     """
     Fetches historical candlestick data for a given product.
@@ -45,18 +74,24 @@ def get_historical_candlesticks(product_id: int, interval: str):
         list: A list of candlestick data, or None if an error occurs.
     """
     try:
+        from nado_protocol.indexer_client.types.query import IndexerCandlesticksParams, IndexerCandlesticksGranularity
+
         nado_client = get_nado_client()
 
-        granularity = INTERVAL_MAP.get(interval)
-        if not granularity:
+        granularity_name = INTERVAL_MAP.get(interval)
+        if not granularity_name:
             raise ValueError(f"Invalid interval: {interval}. Supported intervals are {list(INTERVAL_MAP.keys())}")
+        granularity = IndexerCandlesticksGranularity[granularity_name]
 
         params = IndexerCandlesticksParams(
             product_id=product_id,
             granularity=granularity
         )
 
-        candlesticks_data = nado_client.market.get_candlesticks(params)
+        candlesticks_data = get_scheduler().call(
+            "indexer", nado_client.market.get_candlesticks, params,
+            priority=PRIORITY_MARKET_DATA, key=("candlesticks", product_id, interval)
+        )
         if candlesticks_data and hasattr(candlesticks_data, 'candlesticks'):
             return candlesticks_data.candlesticks
         else:
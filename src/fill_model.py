@@ -0,0 +1,371 @@
+import time
+
+import numpy as np
+
+from src.request_scheduler import get_scheduler, PRIORITY_MARKET_DATA
+
+X18 = 10**18
+
+DEFAULT_DEPTH = 100          # Book levels per side requested for each snapshot
+DEFAULT_MAX_AGE = 3600       # Seconds a snapshot is used for before falling back to the impact curve
+DEFAULT_EXPONENT = 0.5       # Square-root impact
+_KEY_MARGIN = 1.0 + 1e-9     # Keeps normalized cumulative depth strictly below the next row
+
+
+class _BookSide:
+    """
+    One side of every snapshot, packed CSR-style: levels of snapshot i are
+    bps[offsets[i]:offsets[i + 1]] (distance from the mid, best first) and size[...].
+
+    For the VWAP walk, cumulative size within each snapshot is normalized by the snapshot's total
+    depth and offset by the snapshot index. The resulting key increases over the whole array, so
+    the level that completes an order in any snapshot is found with one searchsorted call.
+    """
+
+    def __init__(self, offsets: np.ndarray, bps: np.ndarray, size: np.ndarray):
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.bps = np.asarray(bps, dtype=np.float32)
+        self.size = np.asarray(size, dtype=np.float32)
+
+        # Large books: allocate few full-length arrays and work in place
+        counts = np.diff(self.offsets)
+        rows = np.repeat(np.arange(len(counts)), counts)
+        buffer = np.empty(len(self.size))
+
+        # Cumulative cost (size * bps) within each snapshot, inclusive of the level
+        self.cum_cost = np.multiply(self.size, self.bps, dtype=np.float64)
+        np.cumsum(self.cum_cost, out=self.cum_cost)
+        self.cum_cost -= np.take(self._row_starts(self.cum_cost), rows, out=buffer)
+
+        # Walk key: row index plus cumulative size within the row as a fraction of its depth
+        self.key = np.cumsum(self.size, dtype=np.float64)
+        starts = self._row_starts(self.key)
+        self.total = np.diff(np.append(starts, self.key[-1] if len(self.key) else 0.0))
+        self.key -= np.take(starts, rows, out=buffer)
+        np.take(self.total * _KEY_MARGIN, rows, out=buffer)
+        np.divide(self.key, buffer, out=self.key, where=buffer > 0)  # Rows without depth stay at 0
+        self.key += rows
+
+    def _row_starts(self, cumulative: np.ndarray) -> np.ndarray:
+        """Running total before each row's first level, from a cumulative sum over all levels."""
+        previous = self.offsets[:-1] - 1
+        return np.where(previous >= 0, cumulative[np.maximum(previous, 0)] if len(cumulative) else 0.0, 0.0)
+
+    def walk(self, rows: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+        """
+        Average distance from the mid in bps paid to fill each size in its snapshot row.
+        nan where the snapshot has fewer levels than the order needs.
+        """
+        result = np.full(len(rows), np.nan)
+        ok = (self.total[rows] >= sizes) & (self.total[rows] > 0)
+        rows, sizes = rows[ok], sizes[ok]
+
+        scale = self.total[rows] * _KEY_MARGIN
+        levels = np.searchsorted(self.key, rows + sizes / scale, side="left")
+        # Zero sizes land on the row's first level; rounding must not leave the row
+        levels = np.clip(levels, self.offsets[rows], self.offsets[rows + 1] - 1)
+        level_bps = self.bps[levels].astype(np.float64)
+        level_size = self.size[levels].astype(np.float64)
+        filled_before = (self.key[levels] - rows) * scale - level_size
+        cost_before = self.cum_cost[levels] - level_size * level_bps
+        with np.errstate(divide="ignore", invalid="ignore"):
+            walked = (cost_before + (sizes - filled_before) * level_bps) / sizes
+        result[ok] = np.where(sizes > 0, walked, level_bps)
+        return result
+
+
+class BookSnapshots:
+    """
+    Order book depth snapshots of one product, stored compactly and looked up by time.
+
+    Levels are kept as float32 distances from the mid in bps and float32 sizes in CSR arrays,
+    so a snapshot of 100 levels per side takes under 2 KB before compression. Lookups by
+    timestamp are a binary search and walks of the book are vectorized over orders.
+
+    Args:
+        timestamps (np.ndarray): Snapshot times in seconds, ascending.
+        mid (np.ndarray): Mid price of each snapshot.
+        bid_offsets, ask_offsets (np.ndarray): CSR row offsets, length len(timestamps) + 1.
+        bid_bps, ask_bps (np.ndarray): Level distances from the mid in bps, best first.
+        bid_size, ask_size (np.ndarray): Level sizes in base units.
+    """
+
+    def __init__(self, timestamps, mid, bid_offsets, bid_bps, bid_size, ask_offsets, ask_bps, ask_size):
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.mid = np.asarray(mid, dtype=np.float64)
+        self.bids = _BookSide(np.asarray(bid_offsets), np.asarray(bid_bps), np.asarray(bid_size))
+        self.asks = _BookSide(np.asarray(ask_offsets), np.asarray(ask_bps), np.asarray(ask_size))
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @classmethod
+    def from_levels(cls, timestamps: list, bids: list, asks: list) -> "BookSnapshots":
+        """
+        Builds snapshots from per-snapshot price levels.
+
+        Args:
+            timestamps (list): Snapshot times in seconds.
+            bids (list): Per snapshot, (price, size) pairs, best first.
+            asks (list): Per snapshot, (price, size) pairs, best first.
+        """
+        order = np.argsort(np.asarray(timestamps), kind="stable")
+        mids, sides = [], {"bids": ([0], [], []), "asks": ([0], [], [])}
+        for i in order:
+            best_bid = bids[i][0][0] if len(bids[i]) else None
+            best_ask = asks[i][0][0] if len(asks[i]) else None
+            mid = (best_bid + best_ask) / 2 if best_bid and best_ask else (best_bid or best_ask or np.nan)
+            mids.append(mid)
+            for name, levels, sign in (("bids", bids[i], -1), ("asks", asks[i], 1)):
+                offsets, bps, size = sides[name]
+                levels = np.asarray(levels, dtype=np.float64).reshape(-1, 2)
+                bps.append(sign * (levels[:, 0] - mid) / mid * 10000.0)
+                size.append(levels[:, 1])
+                offsets.append(offsets[-1] + len(levels))
+
+        def packed(name):
+            offsets, bps, size = sides[name]
+            return np.array(offsets), np.concatenate(bps or [np.zeros(0)]), np.concatenate(size or [np.zeros(0)])
+
+        return cls(np.asarray(timestamps, dtype=np.int64)[order], mids, *packed("bids"), *packed("asks"))
+
+    def save(self, path: str):
+        """Writes the snapshots to a compressed .npz file."""
+        np.savez_compressed(
+            path, timestamps=self.timestamps, mid=self.mid,
+            bid_offsets=self.bids.offsets, bid_bps=self.bids.bps, bid_size=self.bids.size,
+            ask_offsets=self.asks.offsets, ask_bps=self.asks.bps, ask_size=self.asks.size,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "BookSnapshots":
+        """Reads snapshots written by save()."""
+        with np.load(path) as data:
+            return cls(**{name: data[name] for name in data.files})
+
+    def lookup(self, timestamps, max_age: float = DEFAULT_MAX_AGE) -> np.ndarray:
+        """
+        Index of the latest snapshot at or before each timestamp, -1 if there is none
+        or it is older than max_age seconds.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        rows = np.searchsorted(self.timestamps, timestamps, side="right") - 1
+        stale = (rows < 0) | (timestamps - self.timestamps[np.maximum(rows, 0)] > max_age)
+        return np.where(stale, -1, rows)
+
+    def slippage_bps(self, timestamps, sizes, is_buy, max_age: float = DEFAULT_MAX_AGE) -> np.ndarray:
+        """
+        Average distance from the mid in bps of market orders walking the book, buys against
+        asks and sells against bids. nan where no fresh snapshot exists or the order is larger
+        than the recorded depth.
+
+        Args:
+            timestamps: Order times in seconds.
+            sizes: Order sizes in base units.
+            is_buy: True for buys, per order or for all.
+            max_age (float): Oldest snapshot to use, in seconds.
+        """
+        rows = np.atleast_1d(self.lookup(timestamps, max_age))
+        sizes = np.abs(np.broadcast_to(np.asarray(sizes, dtype=np.float64), rows.shape))
+        is_buy = np.broadcast_to(np.asarray(is_buy, dtype=bool), rows.shape)
+
+        result = np.full(rows.shape, np.nan)
+        for side, selected in ((self.asks, is_buy), (self.bids, ~is_buy)):
+            selected = selected & (rows >= 0)
+            if selected.any():
+                result[selected] = side.walk(rows[selected], sizes[selected])
+        return result
+
+
+class ImpactCurve:
+    """
+    Parametric market impact: slippage_bps = half_spread_bps + impact_bps * (size / reference_size) ** exponent.
+
+    Used where no book snapshot is available, e.g. for orders larger than the recorded depth,
+    and can be calibrated from snapshots with fit().
+
+    Args:
+        half_spread_bps (float): Cost of the smallest order, in bps of the mid.
+        impact_bps (float): Additional cost of an order of reference_size.
+        reference_size (float): Order size impact_bps refers to, in base units.
+        exponent (float): Curvature; 0.5 is the square-root law.
+    """
+
+    def __init__(self, half_spread_bps: float, impact_bps: float, reference_size: float = 1.0,
+                 exponent: float = DEFAULT_EXPONENT):
+        self.half_spread_bps = half_spread_bps
+        self.impact_bps = impact_bps
+        self.reference_size = reference_size
+        self.exponent = exponent
+
+    def __repr__(self):
+        return (f"ImpactCurve(half_spread_bps={self.half_spread_bps:.4g}, impact_bps={self.impact_bps:.4g}, "
+                f"reference_size={self.reference_size:.4g}, exponent={self.exponent})")
+
+    def slippage_bps(self, sizes) -> np.ndarray:
+        """Slippage in bps of the mid for each order size."""
+        sizes = np.abs(np.asarray(sizes, dtype=np.float64))
+        return self.half_spread_bps + self.impact_bps * (sizes / self.reference_size) ** self.exponent
+
+    @classmethod
+    def fit(cls, snapshots: BookSnapshots, exponent: float = DEFAULT_EXPONENT,
+            n_sizes: int = 20, max_snapshots: int = 1000) -> "ImpactCurve":
+        """
+        Least-squares fit of the curve to book walks over a range of order sizes.
+
+        Sizes span up to the median depth of the shallower side; reference_size is set to
+        that depth, so impact_bps is the cost of an order that takes the typical book.
+
+        Args:
+            snapshots (BookSnapshots): Recorded depth.
+            exponent (float): Fixed curvature of the curve.
+            n_sizes (int): Order sizes sampled per snapshot and side.
+            max_snapshots (int): Snapshots sampled, evenly spread.
+        """
+        rows = np.unique(np.linspace(0, len(snapshots) - 1, min(len(snapshots), max_snapshots)).astype(np.int64))
+        depth = np.minimum(snapshots.bids.total[rows], snapshots.asks.total[rows])
+        reference_size = float(np.median(depth[depth > 0])) if (depth > 0).any() else 1.0
+        sizes = reference_size * np.linspace(0.0, 1.0, n_sizes + 1)[1:]
+
+        grid_rows = np.repeat(rows, len(sizes))
+        grid_sizes = np.tile(sizes, len(rows))
+        bps = np.concatenate([
+            snapshots.asks.walk(grid_rows, grid_sizes),
+            snapshots.bids.walk(grid_rows, grid_sizes),
+        ])
+        x = np.concatenate([grid_sizes, grid_sizes]) / reference_size
+        valid = np.isfinite(bps)
+        if valid.sum() < 2:
+            raise ValueError("Not enough book depth recorded to fit an impact curve.")
+        design = np.column_stack([np.ones(valid.sum()), x[valid] ** exponent])
+        (half_spread_bps, impact_bps), *_ = np.linalg.lstsq(design, bps[valid], rcond=None)
+        return cls(max(float(half_spread_bps), 0.0), max(float(impact_bps), 0.0), reference_size, exponent)
+
+
+class FillModel:
+    """
+    Prices market orders in backtests from book snapshots, falling back to an impact curve.
+
+    Args:
+        snapshots (BookSnapshots, optional): Recorded depth of the backtested product.
+        curve (ImpactCurve, optional): Used where no fresh snapshot covers an order.
+                                       Defaults to a curve fitted to the snapshots.
+        max_age (float): Oldest snapshot to use for an order, in seconds.
+    """
+
+    def __init__(self, snapshots: BookSnapshots = None, curve: ImpactCurve = None,
+                 max_age: float = DEFAULT_MAX_AGE):
+        if snapshots is None and curve is None:
+            raise ValueError("A fill model needs book snapshots, an impact curve, or both.")
+        if curve is None:
+            curve = ImpactCurve.fit(snapshots)
+        self.snapshots = snapshots
+        self.curve = curve
+        self.max_age = max_age
+
+    @classmethod
+    def load(cls, path: str, max_age: float = DEFAULT_MAX_AGE) -> "FillModel":
+        """Loads snapshots written by BookSnapshots.save and fits the fallback curve to them."""
+        return cls(BookSnapshots.load(path), max_age=max_age)
+
+    def slippage_bps(self, timestamps, sizes, is_buy) -> np.ndarray:
+        """Slippage in bps of the mid for each order, from the book where possible."""
+        sizes = np.atleast_1d(np.abs(np.asarray(sizes, dtype=np.float64)))
+        if self.snapshots is None:
+            return self.curve.slippage_bps(sizes)
+        bps = self.snapshots.slippage_bps(timestamps, sizes, is_buy, self.max_age)
+        missing = np.isnan(bps)
+        if missing.any():
+            bps[missing] = self.curve.slippage_bps(sizes[missing])
+        return bps
+
+    def fill_prices(self, prices, timestamps, sizes, is_buy) -> np.ndarray:
+        """
+        Average fill prices of market orders: above the price for buys, below it for sells.
+
+        Args:
+            prices: Reference prices, e.g. bar closes.
+            timestamps: Order times in seconds.
+            sizes: Order sizes in base units.
+            is_buy: True for buys, per order or for all.
+        """
+        bps = self.slippage_bps(timestamps, sizes, is_buy)
+        sign = np.where(is_buy, 1.0, -1.0)
+        return np.asarray(prices, dtype=np.float64) * (1.0 + sign * bps / 10000.0)
+
+
+def snapshot_levels(liquidity) -> tuple:
+    """Converts a get_market_liquidity response into (bids, asks) lists of (price, size)."""
+    def levels(side):
+        return [(int(price) / X18, int(size) / X18) for price, size in side or []]
+    return levels(liquidity.bids), levels(liquidity.asks)
+
+
+def record_book_snapshots(
+    path: str,
+    product_id: int,
+    count: int,
+    interval_seconds: float = 60.0,
+    depth: int = DEFAULT_DEPTH,
+    nado_client=None,
+    clock=None,
+) -> BookSnapshots:
+    """
+    Polls get_market_liquidity and saves the snapshots to path, rewriting the file as it goes.
+
+    Args:
+        path (str): .npz file to write.
+        product_id (int): The ID of the product.
+        count (int): Number of snapshots to take.
+        interval_seconds (float): Time between snapshots.
+        depth (int): Levels per side.
+        nado_client: The Nado client (or MockNadoClient). Defaults to get_nado_client().
+        clock: Object with now and sleep(seconds), e.g. a ReplayClock. Defaults to wall time.
+
+    Returns:
+        BookSnapshots: The recorded snapshots.
+    """
+    from src.nado_client import get_nado_client
+
+    nado_client = nado_client or get_nado_client()
+    now = (lambda: clock.now) if clock is not None else time.time
+    sleep = clock.sleep if clock is not None else time.sleep
+
+    timestamps, bids, asks = [], [], []
+    snapshots = None
+    for i in range(count):
+        try:
+            liquidity = get_scheduler().call(
+                "engine.query", nado_client.market.get_market_liquidity, product_id, depth,
+                priority=PRIORITY_MARKET_DATA
+            )
+            snapshot_bids, snapshot_asks = snapshot_levels(liquidity)
+            timestamps.append(int(now()))
+            bids.append(snapshot_bids)
+            asks.append(snapshot_asks)
+        except Exception as e:
+            print(f"An error occurred while fetching market liquidity for product {product_id}: {e}")
+
+        if timestamps and ((i + 1) % 60 == 0 or i == count - 1):
+            snapshots = BookSnapshots.from_levels(timestamps, bids, asks)
+            snapshots.save(path)
+        if i < count - 1:
+            sleep(interval_seconds)
+    return snapshots
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Record order book snapshots for backtest fill models.")
+    parser.add_argument("path", help="Output .npz file.")
+    parser.add_argument("--product-id", type=int, default=2)
+    parser.add_argument("--count", type=int, default=60)
+    parser.add_argument("--interval", type=float, default=60.0, help="Seconds between snapshots.")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH)
+    args = parser.parse_args()
+
+    snapshots = record_book_snapshots(args.path, args.product_id, args.count, args.interval, args.depth)
+    if snapshots is not None:
+        print(f"Saved {len(snapshots)} snapshots to {args.path}")
+        print(ImpactCurve.fit(snapshots))
@@ -7,18 +7,23 @@ LOG_DIR = "logs"
 MAX_BYTES = 5 * 1024 * 1024  # 5 MB
 BACKUP_COUNT = 5             # Keep up to 5 backup logs
 
-# Ensure log directory exists
-if not os.path.exists(LOG_DIR):
-    os.makedirs(LOG_DIR)
-
 log_file_path = os.path.join(LOG_DIR, LOG_FILE_NAME)
 
+# Handlers are attached by setup_logging, so importing this module has no side effects
+logger = logging.getLogger("trading_bot")
+
 def setup_logging():
     """
     Sets up a robust logging system for the trading bot.
-    Logs to both console and a rotating file.
+    Logs to both console and a rotating file. Safe to call more than once.
     """
-    logger = logging.getLogger("trading_bot")
+    if logger.handlers:
+        return logger
+
+    # Ensure log directory exists
+    if not os.path.exists(LOG_DIR):
+        os.makedirs(LOG_DIR)
+
     logger.setLevel(logging.INFO) # Default logging level
 
     # Create formatter
@@ -43,15 +48,14 @@ def setup_logging():
     file_handler.setFormatter(formatter)
     logger.addHandler(file_handler)
 
-    # Prevent duplicate log messages if this function is called multiple times
+    # Prevent duplicate log messages through the root logger
     logger.propagate = False
 
     return logger
 
-# Initialize logger when the module is imported
-logger = setup_logging()
-
 if __name__ == "__main__":
+    setup_logging()
+
     # Test the logger
     logger.debug("This is a DEBUG message")
     logger.info("This is an INFO message")
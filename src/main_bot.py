@@ -1,17 +1,17 @@
+import asyncio
+import os
 import time
 from datetime import datetime
 import traceback
 from dotenv import load_dotenv
 
-from src.logger import logger
-from src.strategy import moving_average_crossover_strategy
-from src.trade_execution import (
-    place_market_order_for_product,
-    place_stop_loss_order,
-    place_take_profit_order
-)
-from src.account_summary import get_account_summary
-from src.nado_client import get_nado_client, NadoClientMode
+from src.logger import logger, setup_logging
+from src.data_acquisition import get_historical_candlesticks
+from src.strategy import latest_crossover_signal, apply_moving_average_crossover, crossover_strategy_name
+from src.order_preparation import OrderPreparer
+from src.account_service import AccountService, HEALTH_INITIAL, HEALTH_MAINTENANCE, HEALTH
+from src.risk import RiskEngine
+from src.nado_client import get_nado_client
 
 # Load environment variables
 load_dotenv()
@@ -27,127 +27,425 @@ CHECK_INTERVAL_SECONDS = 300 # 5 minutes
 # --- Risk Management Configuration ---
 STOP_LOSS_PERCENT = 2.0  # % below entry price for stop-loss
 TAKE_PROFIT_PERCENT = 4.0 # % above entry price for take-profit
+MAX_POSITION = 10 * TRADE_AMOUNT  # Largest absolute position in PRODUCT_ID
+MIN_LIQUIDATION_DISTANCE = 0.10   # Skip entries closer than 10% to the liquidation price
+
+# --- Trade Journal Configuration ---
+TRADE_JOURNAL_DIR = "journal"  # Fills are journaled here (see src/trade_journal.py); None disables
 
 # --- Bot State ---
 current_position = None # Can be 'long', 'short', or None
+order_preparer = None   # Ready-to-send order templates for PRODUCT_ID, see prepare_orders
+account_service = None  # Healths and positions of every subaccount of the signer
+risk_engine = None      # Local health and liquidation figures of the trading subaccount, see prepare_risk
+fill_tracker = None     # Journals the fills of the bot's orders, see prepare_journal
 
-def run_bot():
+def get_trading_subaccount():
     """
-    The main function to run the trading bot continuously.
+    Returns the subaccount ID the bot trades from, or None if it cannot be determined.
+    """
+    global account_service
+    try:
+        account_service = AccountService(get_nado_client())
+        subaccounts = account_service.list_subaccounts()
+        if not subaccounts:
+            logger.error("No subaccounts found for the provided private key. Exiting.")
+            return None
+        subaccount_id = subaccounts[0]
+        logger.info(f"Using subaccount ID: {subaccount_id} (monitoring {len(subaccounts)} subaccounts)")
+        return subaccount_id
+    except Exception as e:
+        logger.error(f"Failed to initialize bot and get subaccount: {e}")
+        logger.error(traceback.format_exc())
+        return None
+
+def prepare_orders(subaccount_id):
+    """
+    Builds the order templates used when signals fire, so only price and nonce are filled in then.
+
+    Returns:
+        bool: True if the templates were built.
+    """
+    global order_preparer
+    if order_preparer is not None:
+        order_preparer.stop()
+    try:
+        order_preparer = OrderPreparer(get_nado_client(), subaccount_id)
+        order_preparer.prepare(PRODUCT_ID, TRADE_AMOUNT)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to prepare orders: {e}")
+        logger.error(traceback.format_exc())
+        if order_preparer is not None:
+            order_preparer.stop()
+            order_preparer = None
+        return False
+
+def prepare_risk(subaccount_id):
+    """
+    Loads market risk weights and the trading subaccount's positions into the risk engine.
+
+    Returns:
+        bool: True if the risk engine is ready.
+    """
+    global risk_engine
+    try:
+        risk_engine = RiskEngine(
+            max_position={PRODUCT_ID: MAX_POSITION},
+            min_liquidation_distance=MIN_LIQUIDATION_DISTANCE,
+        )
+        risk_engine.load_markets(get_nado_client())
+        account_service.refresh([subaccount_id])
+        row = account_service.row(subaccount_id)
+        if row is None or not account_service.exists[row]:
+            # refresh logs and skips failed fetches; an empty row would look like a flat, healthy account
+            logger.error(f"Failed to prepare risk checks: no engine summary for subaccount {subaccount_id}")
+            risk_engine = None
+            return False
+        risk_engine.sync(account_service, subaccount_id)
+        logger.info(f"Initial health: {risk_engine.initial_health:.2f}, maintenance health: {risk_engine.maintenance_health:.2f}")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to prepare risk checks: {e}")
+        logger.error(traceback.format_exc())
+        risk_engine = None
+        return False
+
+def prepare_journal(subaccount_id):
+    """
+    Starts journaling the bot's fills to TRADE_JOURNAL_DIR under a new live run ID,
+    from the trading subaccount's open positions.
+    """
+    global fill_tracker
+    if TRADE_JOURNAL_DIR is None:
+        return
+    # pyarrow is only needed once journaling starts
+    from src.trade_journal import FillTracker, TradeJournal
+
+    fill_tracker = FillTracker(
+        TradeJournal(TRADE_JOURNAL_DIR), get_nado_client(), crossover_strategy_name(SHORT_WINDOW, LONG_WINDOW)
+    )
+    fill_tracker.sync(account_service, subaccount_id)
+    logger.info(f"Journaling fills to {TRADE_JOURNAL_DIR} as run {fill_tracker.run_id}")
+
+def journal_fills():
+    """
+    Journals the fills of orders placed earlier, once the indexer reports them.
+    """
+    if fill_tracker is None:
+        return
+    try:
+        filled = fill_tracker.resolve()
+    except Exception as e:
+        logger.error(f"Failed to journal fills: {e}")
+        return
+    if filled:
+        logger.info(f"Journaled {filled} fills, {len(fill_tracker.pending)} orders pending")
+
+def close_journal():
+    """
+    Journals the last orders' fills, writes the buffered ones and merges small part files, at shutdown.
+    """
+    if fill_tracker is None:
+        return
+    journal_fills()
+    try:
+        fill_tracker.close()
+    except Exception as e:
+        logger.error(f"Failed to close the trade journal: {e}")
+
+def track_order(order_result, signal_price, kind="market"):
+    if fill_tracker is not None:
+        fill_tracker.track(order_result, PRODUCT_ID, signal_price, kind)
+
+def forget_triggers():
+    """
+    Stops journaling the stop-loss and take-profit orders of a position that was closed or replaced.
+    """
+    if fill_tracker is not None:
+        fill_tracker.forget("stop_loss")
+        fill_tracker.forget("take_profit")
+
+def check_positions(product_id, price):
+    """
+    Re-checks every open position of the trading subaccount against a new price, without network calls.
+    """
+    at_risk = risk_engine.on_tick(product_id, price)
+    if not at_risk:
+        return
+    liquidation_prices = dict(zip(risk_engine.product_ids.tolist(), risk_engine.liquidation_prices()))
+    for at_risk_product_id in at_risk:
+        logger.warning(
+            f"Position in product {at_risk_product_id} is near liquidation: "
+            f"liquidation price {liquidation_prices[at_risk_product_id]:.2f}, "
+            f"maintenance health {risk_engine.maintenance_health:.2f}"
+        )
+
+def monitor_accounts():
+    """
+    Refreshes every subaccount concurrently and logs the ones whose balances or health changed.
+    """
+    try:
+        changed = account_service.refresh()
+    except Exception as e:
+        logger.error(f"Failed to refresh subaccounts: {e}")
+        return
+
+    for subaccount in changed:
+        row = account_service.row(subaccount)
+        initial_health = account_service.health[row, HEALTH_INITIAL, HEALTH]
+        maintenance_health = account_service.health[row, HEALTH_MAINTENANCE, HEALTH]
+        logger.info(f"Subaccount {subaccount}: initial health {initial_health:.2f}, maintenance health {maintenance_health:.2f}")
+        if maintenance_health < 0:
+            logger.warning(f"Subaccount {subaccount} is below maintenance health and can be liquidated.")
+        if risk_engine is not None and subaccount == order_preparer.subaccount:
+            risk_engine.sync(account_service, subaccount)
+
+def handle_latest_signal(strategy_df):
+    """
+    Acts on the crossover signal of the latest bar in the strategy data.
+
+    Args:
+        strategy_df (pd.DataFrame): Output of the moving average crossover strategy.
+    """
+    latest_signal = strategy_df.iloc[-1]
+    handle_signal(latest_signal['Position'], latest_signal['close'])
+
+def handle_signal(last_crossover, entry_price):
+    """
+    Opens or closes the position on a crossover.
+
+    Args:
+        last_crossover (int): 1 for buy, -1 for sell, 0 for no change.
+        entry_price (float): Close of the bar the signal was computed on.
     """
     global current_position
 
+    if last_crossover == 1 and current_position is None:
+        # --- Buy Signal ---
+        risk_check = risk_engine.check_order(PRODUCT_ID, TRADE_AMOUNT, entry_price)
+        if not risk_check.allowed:
+            logger.warning(f"Buy signal at price {entry_price:.2f} rejected by risk checks: {risk_check.reason}")
+            return
+
+        logger.info(f"Buy signal detected at price {entry_price:.2f}. Opening a long position.")
+        current_position = 'long'
+
+        # --- EXECUTE LIVE TRADE ---
+        # **WARNING**: Uncommenting the following lines will place REAL orders on the TESTNET.
+        logger.info(f"Placing market BUY order for {TRADE_AMOUNT} of product {PRODUCT_ID}")
+        buy_order_result = order_preparer.fire_market(PRODUCT_ID, is_buy=True, reference_price=entry_price)
+        account_service.touch(order_preparer.subaccount)
+        if buy_order_result:
+            logger.info(f"Market buy order successful: {buy_order_result}")
+            risk_engine.apply_fill(PRODUCT_ID, TRADE_AMOUNT, entry_price)
+            track_order(buy_order_result, entry_price)
+
+            # Place Stop-Loss and Take-Profit orders
+            stop_price = entry_price * (1 - STOP_LOSS_PERCENT / 100)
+            take_profit_price = entry_price * (1 + TAKE_PROFIT_PERCENT / 100)
+            if stop_price <= risk_check.liquidation_price:
+                logger.warning(f"Stop-loss at {stop_price:.2f} is below the liquidation price {risk_check.liquidation_price:.2f}")
+
+            # Triggers of an earlier position that never filled are replaced by the new ones
+            forget_triggers()
+
+            logger.info(f"Placing stop-loss order at {stop_price:.2f}")
+            stop_loss_result = order_preparer.fire_trigger(PRODUCT_ID, "stop_loss", position_is_long=True, trigger_price=stop_price)
+            track_order(stop_loss_result, stop_price, "stop_loss")
+
+            logger.info(f"Placing take-profit order at {take_profit_price:.2f}")
+            take_profit_result = order_preparer.fire_trigger(PRODUCT_ID, "take_profit", position_is_long=True, trigger_price=take_profit_price)
+            track_order(take_profit_result, take_profit_price, "take_profit")
+            logger.info(f"Order latency: {order_preparer.latency_summary()}")
+        else:
+            logger.error("Market buy order failed. No risk management orders placed.")
+            current_position = None # Reset position as entry failed
+
+
+    elif last_crossover == -1 and current_position == 'long':
+        # --- Sell Signal ---
+        logger.info(f"Sell signal detected. Closing long position.")
+        current_position = None
+
+        # --- EXECUTE LIVE TRADE ---
+        # **WARNING**: Uncommenting the following lines will place REAL orders on the TESTNET.
+        # In a real scenario, you'd cancel existing TP/SL orders first.
+        # Here, we assume a simple market order to close the position.
+        logger.info(f"Placing market SELL order for {TRADE_AMOUNT} of product {PRODUCT_ID}")
+        sell_order_result = order_preparer.fire_market(PRODUCT_ID, is_buy=False, reference_price=entry_price)
+        account_service.touch(order_preparer.subaccount)
+        if sell_order_result:
+            logger.info(f"Market sell order successful: {sell_order_result}")
+            risk_engine.apply_fill(PRODUCT_ID, -TRADE_AMOUNT, entry_price)
+            track_order(sell_order_result, entry_price)
+            forget_triggers()
+        else:
+            logger.error("Market sell order failed to close position.")
+            current_position = 'long' # Revert state as closing failed
+
+    else:
+        logger.info("No new trading opportunities. Holding current position.")
+
+def run_bot(max_cycles=None, sleep_fn=None):
+    """
+    The main function to run the trading bot continuously.
+
+    Args:
+        max_cycles (int, optional): Stop after this many cycles. Runs forever if None.
+        sleep_fn (callable, optional): Used instead of time.sleep between cycles,
+                                       e.g. a replay clock for offline runs.
+    """
+    if sleep_fn is None:
+        sleep_fn = time.sleep
+
+    setup_logging()
     logger.info("Starting Nado Trading Bot...")
     logger.info(f"Configuration: Product ID={PRODUCT_ID}, Interval={INTERVAL}, Strategy={SHORT_WINDOW}/{LONG_WINDOW} SMA Crossover")
 
     # Get subaccount for trading
-    try:
-        nado_client = get_nado_client()
-        subaccounts = nado_client.subaccount.get_subaccounts(address=nado_client.context.signer.address)
-        if not subaccounts or not subaccounts.subaccounts:
-            logger.error("No subaccounts found for the provided private key. Exiting.")
-            return
-        subaccount_id = subaccounts.subaccounts[0].subaccount
-        logger.info(f"Using subaccount ID: {subaccount_id}")
-    except Exception as e:
-        logger.error(f"Failed to initialize bot and get subaccount: {e}")
-        logger.error(traceback.format_exc())
+    subaccount_id = get_trading_subaccount()
+    if subaccount_id is None:
+        return
+    if not prepare_orders(subaccount_id):
+        return
+    if not prepare_risk(subaccount_id):
         return
+    prepare_journal(subaccount_id)
 
-    while True:
-        try:
-            logger.info("Checking for new trading signals...")
-
-            # 1. Get strategy data and the latest signal
-            strategy_df = moving_average_crossover_strategy(
-                PRODUCT_ID, INTERVAL, SHORT_WINDOW, LONG_WINDOW
-            )
-
-            if strategy_df.empty:
-                logger.warning("Could not generate strategy data. Skipping this cycle.")
-                time.sleep(CHECK_INTERVAL_SECONDS)
-                continue
-
-            latest_signal = strategy_df.iloc[-1]
-            last_crossover = latest_signal['Position'] # 1 for buy, -1 for sell, 0 for no change
-
-            entry_price = latest_signal['close']
-
-            # 2. Execute trades based on signals
-            if last_crossover == 1 and current_position is None:
-                # --- Buy Signal ---
-                logger.info(f"Buy signal detected at price {entry_price:.2f}. Opening a long position.")
-                current_position = 'long'
-
-                # --- EXECUTE LIVE TRADE ---
-                # **WARNING**: Uncommenting the following lines will place REAL orders on the TESTNET.
-                logger.info(f"Placing market BUY order for {TRADE_AMOUNT} of product {PRODUCT_ID}")
-                buy_order_result = place_market_order_for_product(
-                    product_id=PRODUCT_ID,
-                    subaccount=subaccount_id,
-                    is_buy=True,
-                    amount=TRADE_AMOUNT
-                )
-                if buy_order_result:
-                    logger.info(f"Market buy order successful: {buy_order_result}")
-
-                    # Place Stop-Loss and Take-Profit orders
-                    stop_price = entry_price * (1 - STOP_LOSS_PERCENT / 100)
-                    take_profit_price = entry_price * (1 + TAKE_PROFIT_PERCENT / 100)
-
-                    logger.info(f"Placing stop-loss order at {stop_price:.2f}")
-                    place_stop_loss_order(
-                        PRODUCT_ID, subaccount_id, position_is_long=True,
-                        stop_price=stop_price, amount_to_close=TRADE_AMOUNT
-                    )
-
-                    logger.info(f"Placing take-profit order at {take_profit_price:.2f}")
-                    place_take_profit_order(
-                        PRODUCT_ID, subaccount_id, position_is_long=True,
-                        take_profit_price=take_profit_price, amount_to_close=TRADE_AMOUNT
-                    )
-                else:
-                    logger.error("Market buy order failed. No risk management orders placed.")
-                    current_position = None # Reset position as entry failed
-
-
-            elif last_crossover == -1 and current_position == 'long':
-                # --- Sell Signal ---
-                logger.info(f"Sell signal detected. Closing long position.")
-                current_position = None
-
-                # --- EXECUTE LIVE TRADE ---
-                # **WARNING**: Uncommenting the following lines will place REAL orders on the TESTNET.
-                # In a real scenario, you'd cancel existing TP/SL orders first.
-                # Here, we assume a simple market order to close the position.
-                logger.info(f"Placing market SELL order for {TRADE_AMOUNT} of product {PRODUCT_ID}")
-                sell_order_result = place_market_order_for_product(
-                    product_id=PRODUCT_ID,
-                    subaccount=subaccount_id,
-                    is_buy=False,
-                    amount=TRADE_AMOUNT
+    try:
+        cycles = 0
+        while max_cycles is None or cycles < max_cycles:
+            cycles += 1
+            try:
+                monitor_accounts()
+                journal_fills()
+                logger.info("Checking for new trading signals...")
+
+                # 1. Get the latest signal; only the last bar's crossover is acted on
+                latest_signal = latest_crossover_signal(
+                    get_historical_candlesticks(PRODUCT_ID, INTERVAL), SHORT_WINDOW, LONG_WINDOW
                 )
-                if sell_order_result:
-                    logger.info(f"Market sell order successful: {sell_order_result}")
-                else:
-                    logger.error("Market sell order failed to close position.")
-                    current_position = 'long' # Revert state as closing failed
 
-            else:
-                logger.info("No new trading opportunities. Holding current position.")
+                if latest_signal is None:
+                    logger.warning("Could not generate strategy data. Skipping this cycle.")
+                    sleep_fn(CHECK_INTERVAL_SECONDS)
+                    continue
+
+                last_crossover, entry_price = latest_signal
+                check_positions(PRODUCT_ID, entry_price)
+
+                # 2. Execute trades based on signals
+                handle_signal(last_crossover, entry_price)
+
+                logger.info(f"Next check at {datetime.fromtimestamp(time.time() + CHECK_INTERVAL_SECONDS)}")
+                sleep_fn(CHECK_INTERVAL_SECONDS)
+
+            except Exception as e:
+                logger.error(f"An unexpected error occurred in the main trading loop: {e}")
+                logger.error(traceback.format_exc())
+                sleep_fn(CHECK_INTERVAL_SECONDS) # Wait before retrying
+    finally:
+        # Fills of the last cycle's orders
+        close_journal()
+
+def run_streaming_bot(url=None):
+    """
+    Runs the trading bot on bars built from the websocket trade stream instead of polling.
+
+    Args:
+        url (str, optional): Subscription websocket URL. Defaults to NADO_WS_URL or the gateway's.
+    """
+    # Only the streaming mode needs the websocket stack
+    from src.market_stream import MarketStream, bars_to_dataframe
+
+    setup_logging()
+    logger.info("Starting Nado Trading Bot in streaming mode...")
+    logger.info(f"Configuration: Product ID={PRODUCT_ID}, Interval={INTERVAL}, Strategy={SHORT_WINDOW}/{LONG_WINDOW} SMA Crossover")
+
+    subaccount_id = get_trading_subaccount()
+    if subaccount_id is None:
+        return
+    if not prepare_orders(subaccount_id):
+        return
+    if not prepare_risk(subaccount_id):
+        return
+    prepare_journal(subaccount_id)
+
+    def on_bar(product_id, bar, bars):
+        if product_id != PRODUCT_ID or len(bars) <= LONG_WINDOW:
+            return
+        logger.info(f"Bar closed for product {product_id} at {datetime.fromtimestamp(bar['timestamp'])}: close={bar['close']:.2f}")
+        monitor_accounts()
+        journal_fills()
+        check_positions(product_id, bar['close'])
+        strategy_df = apply_moving_average_crossover(bars_to_dataframe(bars), SHORT_WINDOW, LONG_WINDOW)
+        handle_latest_signal(strategy_df)
+
+    stream = MarketStream([PRODUCT_ID], INTERVAL, url=url)
+    stream.on_bar(on_bar)
+    try:
+        asyncio.run(stream.run())
+    finally:
+        close_journal()
+
+def run_bus_bot(workers=None):
+    """
+    Runs the trading bot with candle polling and strategy computation in separate processes.
+
+    A producer process publishes bars to shared memory and strategy workers send back signals
+    (see src/market_data_bus.py); this process only handles signals, accounts and orders.
 
-            logger.info(f"Next check at {datetime.fromtimestamp(time.time() + CHECK_INTERVAL_SECONDS)}")
-            time.sleep(CHECK_INTERVAL_SECONDS)
+    Args:
+        workers (int, optional): Strategy worker processes. Defaults to one per strategy, up to the CPU count.
+    """
+    from src.market_data_bus import MarketDataBus, crossover_spec
 
-        except Exception as e:
-            logger.error(f"An unexpected error occurred in the main trading loop: {e}")
-            logger.error(traceback.format_exc())
-            time.sleep(CHECK_INTERVAL_SECONDS) # Wait before retrying
+    setup_logging()
+    logger.info("Starting Nado Trading Bot with the market data bus...")
+    logger.info(f"Configuration: Product ID={PRODUCT_ID}, Interval={INTERVAL}, Strategy={SHORT_WINDOW}/{LONG_WINDOW} SMA Crossover")
+
+    # Start the producer and workers before this process opens connections and threads
+    bus = MarketDataBus(
+        [PRODUCT_ID], INTERVAL, [crossover_spec(PRODUCT_ID, SHORT_WINDOW, LONG_WINDOW)],
+        workers=workers, poll_seconds=CHECK_INTERVAL_SECONDS,
+    )
+    with bus:
+        subaccount_id = get_trading_subaccount()
+        if subaccount_id is None:
+            return
+        if not prepare_orders(subaccount_id):
+            return
+        if not prepare_risk(subaccount_id):
+            return
+        prepare_journal(subaccount_id)
+
+        try:
+            while bus.running:
+                signal = bus.get_signal()
+                if signal is None:
+                    continue
+                try:
+                    logger.info(f"Signal {signal.position} from {signal.strategy} at {signal.close:.2f} "
+                                f"(bar {datetime.fromtimestamp(signal.timestamp)})")
+                    monitor_accounts()
+                    journal_fills()
+                    check_positions(signal.product_id, signal.close)
+                    handle_signal(signal.position, signal.close)
+                except Exception as e:
+                    logger.error(f"An unexpected error occurred while handling a signal: {e}")
+                    logger.error(traceback.format_exc())
+            logger.warning("Market data producer stopped.")
+        finally:
+            close_journal()
 
 
 if __name__ == "__main__":
     try:
-        run_bot()
+        if os.getenv("NADO_WS_URL"):
+            run_streaming_bot()
+        else:
+            run_bot()
     except KeyboardInterrupt:
         logger.info("Bot shutting down gracefully...")
         print("\nBot stopped by user.")
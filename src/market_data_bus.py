@@ -0,0 +1,467 @@
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+import numpy as np
+
+from src.strategy import sma_crossover_positions
+
+X18 = 10**18
+
+DEFAULT_CAPACITY = 4096      # Bars kept per product
+DEFAULT_POLL_SECONDS = 300   # How often the producer refreshes candles
+WAIT_SECONDS = 1.0           # Longest a process blocks before checking for shutdown
+
+# Rows of a ring's bar array; each row is one column of bars, oldest first
+COLUMNS = ("timestamp", "open", "high", "low", "close", "volume")
+TIMESTAMP, OPEN, HIGH, LOW, CLOSE, VOLUME = range(len(COLUMNS))
+
+# Ring header slots (int64)
+SEQUENCE, COUNT, CAPACITY = range(3)
+HEADER_SLOTS = 8
+
+
+class BarRing:
+    """
+    OHLCV bars of one product in a shared-memory ring, written by one process and read by many.
+
+    Each column is stored contiguously and every bar is written twice, at its slot and at
+    slot + capacity, so the latest n bars are always one contiguous view and readers never copy.
+    A sequence number in the header is odd while the writer is updating (a seqlock); readers
+    take it before using a view and check it is unchanged afterwards.
+
+    Use BarRing.create in the owning process and BarRing.attach(name) in the others.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self._owner = owner
+        self._header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=shm.buf)
+        self.capacity = int(self._header[CAPACITY])
+        self._data = np.ndarray(
+            (len(COLUMNS), 2 * self.capacity), dtype=np.float64, buffer=shm.buf, offset=HEADER_SLOTS * 8
+        )
+
+    @classmethod
+    def create(cls, capacity: int = DEFAULT_CAPACITY) -> "BarRing":
+        shm = shared_memory.SharedMemory(create=True, size=HEADER_SLOTS * 8 + len(COLUMNS) * 2 * capacity * 8)
+        header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[CAPACITY] = capacity
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "BarRing":
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def sequence(self) -> int:
+        return int(self._header[SEQUENCE])
+
+    @property
+    def latest_timestamp(self):
+        """Timestamp of the latest bar, or None if nothing was published yet."""
+        count = int(self._header[COUNT])
+        return float(self._data[TIMESTAMP, (count - 1) % self.capacity]) if count else None
+
+    def __len__(self) -> int:
+        return min(int(self._header[COUNT]), self.capacity)
+
+    def publish(self, bars: np.ndarray) -> int:
+        """
+        Appends bars, given as a (len(COLUMNS), n) array sorted by timestamp.
+
+        Bars older than the latest one are skipped, and a bar with the latest timestamp
+        replaces it, so polling the still-forming candle updates it in place.
+
+        Returns:
+            int: Number of bars written.
+        """
+        bars = np.asarray(bars, dtype=np.float64).reshape(len(COLUMNS), -1)
+        count = int(self._header[COUNT])
+        start = count
+        latest = self.latest_timestamp
+        if latest is not None:
+            bars = bars[:, bars[TIMESTAMP] >= latest]
+            if bars.shape[1] and bars[TIMESTAMP, 0] == latest:
+                start -= 1
+        written = bars.shape[1]
+        if written > self.capacity:
+            start += written - self.capacity
+            bars = bars[:, -self.capacity:]
+        slots = (start + np.arange(bars.shape[1])) % self.capacity
+
+        self._header[SEQUENCE] += 1
+        self._data[:, slots] = bars
+        self._data[:, slots + self.capacity] = bars
+        self._header[COUNT] = start + bars.shape[1]
+        self._header[SEQUENCE] += 1
+        return written
+
+    def read(self, n: int = None):
+        """
+        Returns a view of the latest n bars (all of them by default) and the sequence it was taken at.
+
+        The view aliases shared memory; it is only consistent if changed(sequence) is still
+        False once the caller is done with it.
+
+        Returns:
+            tuple: (np.ndarray of shape (len(COLUMNS), n), int sequence)
+        """
+        while True:
+            sequence = int(self._header[SEQUENCE])
+            if sequence % 2 == 0:
+                break
+            time.sleep(0)
+        count = int(self._header[COUNT])
+        n = min(count, self.capacity) if n is None else min(n, count, self.capacity)
+        end = (count - 1) % self.capacity + self.capacity + 1 if count else 0
+        view = self._data[:, end - n:end]
+        view.flags.writeable = False
+        return view, sequence
+
+    def changed(self, sequence: int) -> bool:
+        return int(self._header[SEQUENCE]) != sequence
+
+    def close(self):
+        """Releases this process's mapping, and frees the ring if this process created it."""
+        self._header = self._data = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+class StrategySpec(NamedTuple):
+    """
+    A strategy run by the bus workers. fn(bars, **params) gets a read-only (len(COLUMNS), lookback)
+    bar view and returns 1 to buy, -1 to sell or 0; it must be a module-level function so it pickles.
+    """
+    name: str
+    product_id: int
+    fn: object
+    params: dict
+    lookback: int
+
+
+class Signal(NamedTuple):
+    strategy: str
+    product_id: int
+    timestamp: float  # Start of the bar the signal was computed on
+    position: int     # 1 for buy, -1 for sell, 0 for no change
+    close: float
+    sequence: int     # Ring sequence the bars were read at
+
+
+def crossover_signal(bars: np.ndarray, short_window: int, long_window: int) -> int:
+    """Position of the latest bar under the moving average crossover strategy."""
+    return int(sma_crossover_positions(bars[CLOSE], short_window, long_window)[-1])
+
+
+def crossover_spec(product_id: int, short_window: int, long_window: int) -> StrategySpec:
+    """StrategySpec for the moving average crossover, with just enough bars for the latest position."""
+    from src.strategy import crossover_lookback, crossover_strategy_name
+
+    return StrategySpec(
+        crossover_strategy_name(short_window, long_window), product_id, crossover_signal,
+        {'short_window': short_window, 'long_window': long_window}, crossover_lookback(short_window, long_window),
+    )
+
+
+def candlesticks_to_bars(candlesticks, since: float = None) -> np.ndarray:
+    """
+    Converts indexer candlesticks into a (len(COLUMNS), n) bar array sorted by timestamp.
+
+    Args:
+        candlesticks (list): Candlesticks from get_historical_candlesticks.
+        since (float, optional): Only convert candles starting at or after this timestamp.
+    """
+    if since is not None:
+        candlesticks = [c for c in candlesticks if int(c.timestamp) >= since]
+    bars = np.array([
+        (int(c.timestamp), int(c.open_x18) / X18, int(c.high_x18) / X18, int(c.low_x18) / X18,
+         int(c.close_x18) / X18, int(c.volume) / X18)
+        for c in candlesticks
+    ], dtype=np.float64).reshape(-1, len(COLUMNS)).T
+    return bars[:, np.argsort(bars[TIMESTAMP], kind="stable")]
+
+
+def run_producer(ring_names: dict, interval: str, poll_seconds: float, stop, bars_ready, consumed,
+                 polls_done, workers: int, replay: bool = False, max_polls: int = None):
+    """
+    Producer process: owns the Nado client, polls candles and publishes them to the rings.
+
+    Args:
+        ring_names (dict): product_id -> BarRing name.
+        interval (str): Candlestick interval, e.g. "1H".
+        poll_seconds (float): Time between polls.
+        stop (multiprocessing.Event): Set to shut down.
+        bars_ready (multiprocessing.Condition): Notified after every poll.
+        consumed (multiprocessing.Semaphore): Released by workers once for every poll they process.
+        polls_done (multiprocessing.Value): Number of completed polls, for the workers.
+        workers (int): Number of worker processes.
+        replay (bool): Advance the mock client's replay clock (NADO_MOCK_RECORDING) instead of
+                       sleeping, and wait for every worker after each poll so no bar is skipped.
+        max_polls (int, optional): Stop after this many polls.
+    """
+    from src.data_acquisition import get_historical_candlesticks
+    from src.nado_client import get_nado_client, set_nado_client
+    from src.request_scheduler import RequestScheduler, set_scheduler
+
+    # Ctrl-C reaches the whole process group; the parent shuts the bus down through stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    nado_client = get_nado_client()
+    set_nado_client(nado_client)
+    set_scheduler(RequestScheduler(throttle=not replay))
+    rings = {product_id: BarRing.attach(name) for product_id, name in ring_names.items()}
+    sleep = nado_client.clock.sleep if replay else stop.wait
+
+    polls = 0
+    try:
+        while not stop.is_set() and (max_polls is None or polls < max_polls):
+            polls += 1
+            for product_id, ring in rings.items():
+                candlesticks = get_historical_candlesticks(product_id, interval)
+                if candlesticks:
+                    # The ring is the candle cache: only the forming candle and newer ones are converted
+                    ring.publish(candlesticks_to_bars(candlesticks, ring.latest_timestamp))
+            with bars_ready:
+                polls_done.value = polls
+                bars_ready.notify_all()
+
+            if replay:
+                pending = workers
+                while pending and not stop.is_set():
+                    pending -= consumed.acquire(timeout=WAIT_SECONDS)
+                if nado_client.clock.finished:
+                    break
+            sleep(poll_seconds)
+    finally:
+        for ring in rings.values():
+            ring.close()
+
+
+def run_worker(specs: list, ring_names: dict, signals, stop, bars_ready, consumed, polls_done):
+    """
+    Worker process: runs its strategies on every update of their rings and queues the signals.
+
+    Args:
+        specs (list): StrategySpecs assigned to this worker.
+        ring_names (dict): product_id -> BarRing name.
+        signals (multiprocessing.Queue): Signals are put here.
+        stop (multiprocessing.Event): Set to shut down.
+        bars_ready (multiprocessing.Condition): Waited on for new bars.
+        consumed (multiprocessing.Semaphore, optional): Released once for every poll processed, in replays,
+                                                        including polls that brought no new bars.
+        polls_done (multiprocessing.Value): Number of completed polls, set by the producer.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    rings = {product_id: BarRing.attach(ring_names[product_id]) for product_id in {spec.product_id for spec in specs}}
+    seen = {product_id: 0 for product_id in rings}
+    acknowledged = 0
+    try:
+        while not stop.is_set():
+            # Read before the rings: every poll counted here has already been published
+            polls = polls_done.value
+            updated = [product_id for product_id, ring in rings.items() if ring.changed(seen[product_id])]
+            if not updated and polls == acknowledged:
+                with bars_ready:
+                    if polls_done.value == polls:
+                        bars_ready.wait(WAIT_SECONDS)
+                continue
+
+            for product_id in updated:
+                ring = rings[product_id]
+                # Later publishes are picked up on the next pass
+                _, seen[product_id] = ring.read(0)
+                for spec in specs:
+                    if spec.product_id != product_id:
+                        continue
+                    while True:
+                        bars, sequence = ring.read(spec.lookback)
+                        if bars.shape[1] < spec.lookback:
+                            result = None
+                            break
+                        result = Signal(spec.name, product_id, float(bars[TIMESTAMP, -1]),
+                                        int(spec.fn(bars, **spec.params)), float(bars[CLOSE, -1]), sequence)
+                        if not ring.changed(sequence):
+                            break  # Otherwise the writer overlapped the read; compute again
+                    del bars
+                    if result is not None:
+                        signals.put(result)
+            if consumed is not None:
+                for _ in range(polls - acknowledged):
+                    consumed.release()
+            acknowledged = polls
+    finally:
+        # Signals still buffered at shutdown are dropped rather than blocking the exit
+        signals.cancel_join_thread()
+        for ring in rings.values():
+            ring.close()
+
+
+class MarketDataBus:
+    """
+    Spreads strategy computation over worker processes that read bars from shared memory.
+
+    One producer process owns its own Nado client, polls candles and publishes them into one
+    BarRing per product; worker processes run StrategySpecs on the rings without copying and put
+    Signals on a queue. The process that starts the bus only reads signals, so order submission
+    there never waits for market data or strategy code.
+
+    Processes are spawned, so the producer creates its client from the environment (e.g.
+    NADO_PRIVATE_KEY or NADO_MOCK_RECORDING) rather than inheriting set_nado_client.
+
+    Args:
+        product_ids (list): Products to publish bars for.
+        interval (str): Candlestick interval, e.g. "1H".
+        specs (list): StrategySpecs to run.
+        workers (int, optional): Worker processes. Defaults to min(len(specs), CPU count).
+        poll_seconds (float): Time between candle polls.
+        capacity (int): Bars kept per product.
+        replay (bool): See run_producer.
+        max_polls (int, optional): Stop the producer after this many polls.
+    """
+
+    def __init__(
+        self,
+        product_ids: list,
+        interval: str,
+        specs: list,
+        workers: int = None,
+        poll_seconds: float = DEFAULT_POLL_SECONDS,
+        capacity: int = DEFAULT_CAPACITY,
+        replay: bool = False,
+        max_polls: int = None,
+    ):
+        missing = {spec.product_id for spec in specs} - set(product_ids)
+        if missing:
+            raise ValueError(f"Strategies use products without bars: {sorted(missing)}")
+        if any(spec.lookback > capacity for spec in specs):
+            raise ValueError(f"Strategy lookbacks must not exceed the ring capacity of {capacity} bars.")
+
+        self.product_ids = list(product_ids)
+        self.interval = interval
+        self.specs = list(specs)
+        self.workers = max(1, min(len(self.specs), workers or os.cpu_count() or 1))
+        self.poll_seconds = poll_seconds
+        self.capacity = capacity
+        self.replay = replay
+        self.max_polls = max_polls
+
+        self._context = multiprocessing.get_context("spawn")
+        self.rings = {}
+        self.signals = None
+        self._processes = []
+        self._producer = None
+
+    def start(self):
+        context = self._context
+        self.rings = {product_id: BarRing.create(self.capacity) for product_id in self.product_ids}
+        ring_names = {product_id: ring.name for product_id, ring in self.rings.items()}
+        self.signals = context.Queue()
+        self._stop = context.Event()
+        self._bars_ready = context.Condition()
+        self._consumed = context.Semaphore(0)
+        self._polls_done = context.Value("q", 0)
+
+        for i in range(self.workers):
+            self._processes.append(context.Process(
+                target=run_worker, name=f"market-data-worker-{i}", daemon=True,
+                args=(self.specs[i::self.workers], ring_names, self.signals, self._stop,
+                      self._bars_ready, self._consumed if self.replay else None, self._polls_done),
+            ))
+        self._producer = context.Process(
+            target=run_producer, name="market-data-producer", daemon=True,
+            args=(ring_names, self.interval, self.poll_seconds, self._stop, self._bars_ready,
+                  self._consumed, self._polls_done, self.workers, self.replay, self.max_polls),
+        )
+        self._processes.append(self._producer)
+        for process in self._processes:
+            process.start()
+        return self
+
+    @property
+    def running(self) -> bool:
+        """False once the producer has exited and every queued signal has been read."""
+        return self._producer is not None and (self._producer.is_alive() or not self.signals.empty())
+
+    def get_signal(self, timeout: float = WAIT_SECONDS):
+        """Next signal from the workers, or None if none arrived within timeout."""
+        try:
+            return self.signals.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stop(self):
+        if self._producer is None:
+            return
+        self._stop.set()
+        with self._bars_ready:
+            self._bars_ready.notify_all()
+        for process in self._processes:
+            process.join(timeout=2 * WAIT_SECONDS)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self._producer = None
+        self.signals.close()
+        for ring in self.rings.values():
+            ring.close()
+        self.rings = {}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Run crossover strategies on the shared-memory market data bus.")
+    parser.add_argument("--product-ids", default="2", help="Comma-separated product IDs.")
+    parser.add_argument("--interval", default="1H")
+    parser.add_argument("--windows", default="10/30", help="Comma-separated short/long SMA windows.")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--poll-seconds", type=float, default=DEFAULT_POLL_SECONDS)
+    parser.add_argument("--max-polls", type=int, default=None)
+    parser.add_argument("--replay", action="store_true",
+                        help="Replay NADO_MOCK_RECORDING as fast as possible instead of polling in real time.")
+    args = parser.parse_args()
+    load_dotenv()
+
+    product_ids = [int(product_id) for product_id in args.product_ids.split(",")]
+    windows = [tuple(int(window) for window in pair.split("/")) for pair in args.windows.split(",")]
+    specs = [crossover_spec(product_id, short, long) for product_id in product_ids for short, long in windows]
+
+    received = crossovers = 0
+    started = time.perf_counter()
+    try:
+        with MarketDataBus(product_ids, args.interval, specs, workers=args.workers, poll_seconds=args.poll_seconds,
+                           replay=args.replay, max_polls=args.max_polls) as bus:
+            print(f"Running {len(specs)} strategies on {bus.workers} workers")
+            while bus.running:
+                message = bus.get_signal()
+                if message is None:
+                    continue
+                received += 1
+                if message.position:
+                    crossovers += 1
+                    print(f"{message.strategy} product {message.product_id}: "
+                          f"{'BUY' if message.position == 1 else 'SELL'} at {message.close:.2f} "
+                          f"(bar {time.strftime('%Y-%m-%d %H:%M', time.gmtime(message.timestamp))})")
+    except KeyboardInterrupt:
+        print("\nBus stopped by user.")
+    elapsed = time.perf_counter() - started
+    print(f"{received} signals ({crossovers} crossovers) in {elapsed:.2f}s")
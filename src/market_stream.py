@@ -0,0 +1,309 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from nado_protocol.ws.client import http_url_to_ws
+from nado_protocol.ws.messages import subscribe_message
+from nado_protocol.ws.streams import TradeStream
+
+from src.nado_client import get_nado_client
+from src.data_acquisition import INTERVAL_SECONDS, get_historical_candlesticks
+
+DEFAULT_HISTORY = 500          # Closed bars kept per product
+IDLE_CHECK_SECONDS = 1.0       # How often bars are closed when no trades arrive
+RECONNECT_DELAY = 1.0          # First reconnect delay in seconds, doubled up to MAX_RECONNECT_DELAY
+MAX_RECONNECT_DELAY = 30.0
+
+
+def bars_to_dataframe(bars) -> pd.DataFrame:
+    """
+    Converts a list of bar dicts into a DataFrame shaped like candlesticks_to_dataframe's output.
+    """
+    if not bars:
+        return pd.DataFrame()
+    df = pd.DataFrame(list(bars))
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+    df.set_index('timestamp', inplace=True)
+    return df
+
+
+class BarBuilder:
+    """
+    Aggregates trades into OHLCV bars aligned to the interval.
+
+    Args:
+        interval_seconds (int): Bar length in seconds.
+    """
+
+    def __init__(self, interval_seconds: int):
+        self.interval_seconds = interval_seconds
+        self.current = None
+        self.last_closed = None
+        self.skipped = None  # Start of a bar whose trades were partly missed; it is taken from REST
+        self._skip_next = False
+
+    def update(self, timestamp: float, price: float, size: float = 0.0) -> list:
+        """
+        Adds a trade and returns the bars it closed (at most one).
+        """
+        start = int(timestamp // self.interval_seconds) * self.interval_seconds
+        if self.last_closed is not None and start <= self.last_closed:
+            return []  # Late trade for a bar that was already published
+        if self._skip_next:
+            self.skipped, self._skip_next = start, False
+        if self.skipped is not None and start <= self.skipped:
+            return []
+
+        closed = []
+        if self.current is not None and start > self.current['timestamp']:
+            closed.append(self._close())
+
+        if self.current is None:
+            self.current = {'timestamp': start, 'open': price, 'high': price,
+                            'low': price, 'close': price, 'volume': size}
+        else:
+            self.current['high'] = max(self.current['high'], price)
+            self.current['low'] = min(self.current['low'], price)
+            self.current['close'] = price
+            self.current['volume'] += size
+        return closed
+
+    def skip(self, now: float = None):
+        """
+        Drops the forming bar and ignores trades until the next interval starts, after trades
+        were missed (before subscribing or during a disconnect).
+
+        Args:
+            now (float, optional): Current exchange time. If unknown, the bar of the next trade is skipped.
+        """
+        self.current = None
+        if now is None:
+            self._skip_next = True
+        else:
+            self.skipped = int(now // self.interval_seconds) * self.interval_seconds
+
+    def close_until(self, now: float) -> list:
+        """
+        Closes the current bar if its interval has ended by `now`.
+        """
+        if self.current is not None and now >= self.current['timestamp'] + self.interval_seconds:
+            return [self._close()]
+        return []
+
+    def _close(self) -> dict:
+        bar = self.current
+        self.current = None
+        self.last_closed = bar['timestamp']
+        return bar
+
+
+class MarketStream:
+    """
+    Streams trades over a websocket, builds bars on the fly and publishes closed bars.
+
+    Trade messages are expected in the gateway's subscription format:
+        {"type": "trade", "product_id": 2, "timestamp": "<ns>", "price": "<x18>", "taker_qty": "<x18>", ...}
+    After a disconnect, gaps are filled from the REST candlestick endpoint before resubscribing.
+    A bar whose trades were partly missed (the one forming at startup or across a disconnect)
+    is never built from trades; it is fetched from REST once it has closed.
+
+    Args:
+        product_ids (list): Products to subscribe to.
+        interval (str): Bar interval (e.g. "1H"), one of INTERVAL_SECONDS.
+        url (str, optional): Subscription websocket URL. Defaults to NADO_WS_URL, or the
+                             gateway's /subscribe endpoint derived from the client's engine URL.
+        history (int): Closed bars kept per product.
+    """
+
+    def __init__(self, product_ids: list, interval: str, url: str = None, history: int = DEFAULT_HISTORY):
+        self.url = url or os.getenv("NADO_WS_URL") \
+            or http_url_to_ws(get_nado_client().context.engine_client.url, "/subscribe")
+        if interval not in INTERVAL_SECONDS:
+            raise ValueError(f"Invalid interval: {interval}. Supported intervals are {list(INTERVAL_SECONDS.keys())}")
+
+        self.product_ids = list(product_ids)
+        self.interval = interval
+        self.interval_seconds = INTERVAL_SECONDS[interval]
+        self.bars = {product_id: deque(maxlen=history) for product_id in self.product_ids}
+        self._builders = {product_id: BarBuilder(self.interval_seconds) for product_id in self.product_ids}
+        self._callbacks = []
+        # Callbacks run in order on one thread so they never block the socket
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="market-stream")
+        self._clock_offset = None  # Exchange time minus local time, from the latest trade
+        self._stopped = False
+
+    def on_bar(self, callback):
+        """
+        Registers callback(product_id, bar, bars), called for every bar that closes while streaming,
+        but not for bars loaded by backfill. `bars` is a snapshot of the product's closed bars,
+        backfilled ones included, oldest first.
+        """
+        self._callbacks.append(callback)
+
+    def stop(self):
+        self._stopped = True
+
+    def _now(self) -> float:
+        return time.time() + (self._clock_offset or 0.0)
+
+    def _publish(self, product_id: int, bar: dict, notify: bool = True):
+        bars = self.bars[product_id]
+        if bars and bar['timestamp'] <= bars[-1]['timestamp']:
+            return  # Already published, e.g. from a REST backfill
+        bars.append(bar)
+        builder = self._builders[product_id]
+        if builder.last_closed is None or bar['timestamp'] > builder.last_closed:
+            builder.last_closed = bar['timestamp']
+        if not notify:
+            return
+        snapshot = list(bars)
+        for callback in self._callbacks:
+            self._executor.submit(self._run_callback, callback, product_id, bar, snapshot)
+
+    @staticmethod
+    def _run_callback(callback, product_id: int, bar: dict, bars: list):
+        try:
+            callback(product_id, bar, bars)
+        except Exception as e:
+            print(f"An error occurred in a market stream callback: {e}")
+
+    def handle_message(self, raw):
+        """
+        Processes one websocket message, publishing any bars it closes.
+        """
+        message = json.loads(raw)
+        if not isinstance(message, dict) or message.get('type') != 'trade':
+            return  # Subscription acknowledgements and other streams
+        product_id = int(message['product_id'])
+        if product_id not in self._builders:
+            return
+
+        timestamp = int(message['timestamp']) / 1e9
+        price = int(message['price']) / (10**18)
+        size = abs(int(message.get('taker_qty', 0))) / (10**18)
+        self._clock_offset = timestamp - time.time()
+
+        for bar in self._builders[product_id].update(timestamp, price, size):
+            self._publish(product_id, bar)
+
+    async def backfill(self, product_id: int, live_from: int = None):
+        """
+        Fetches closed candles from REST and adds the ones newer than the last known bar to the history.
+
+        Bars that closed before startup or during a disconnect are not passed to callbacks;
+        strategies see them in `bars` from the next bar that closes live.
+
+        Args:
+            product_id (int): The ID of the product.
+            live_from (int, optional): Bars starting at or after this timestamp closed while
+                                       streaming and are passed to callbacks.
+        """
+        loop = asyncio.get_running_loop()
+        candles = await loop.run_in_executor(None, get_historical_candlesticks, product_id, self.interval)
+        if not candles:
+            return
+
+        now = self._now()
+        for candle in sorted(candles, key=lambda c: int(c.timestamp)):
+            timestamp = int(candle.timestamp)
+            if timestamp + self.interval_seconds > now:
+                continue  # Still forming
+            self._publish(product_id, notify=live_from is not None and timestamp >= live_from, bar={
+                'timestamp': timestamp,
+                'open': int(candle.open_x18) / (10**18),
+                'high': int(candle.high_x18) / (10**18),
+                'low': int(candle.low_x18) / (10**18),
+                'close': int(candle.close_x18) / (10**18),
+                'volume': int(candle.volume) / (10**18),
+            })
+
+        # A partial bar started before the gap would be missing trades; drop it
+        builder = self._builders[product_id]
+        if builder.current is not None and builder.last_closed is not None \
+                and builder.current['timestamp'] <= builder.last_closed:
+            builder.current = None
+
+    async def resync(self):
+        """
+        Backfills every product and skips the bar forming now, whose earlier trades were missed.
+        """
+        for product_id in self.product_ids:
+            await self.backfill(product_id)
+            # Until a trade has arrived, exchange time is unknown (e.g. when replaying recorded trades)
+            self._builders[product_id].skip(None if self._clock_offset is None else self._now())
+
+    async def _fetch_skipped_bar(self, product_id: int, builder: BarBuilder, now: float):
+        skipped = builder.skipped
+        await self.backfill(product_id, live_from=skipped)
+        bars = self.bars[product_id]
+        if bars and bars[-1]['timestamp'] >= skipped:
+            builder.skipped = None
+        elif now >= skipped + 2 * self.interval_seconds:
+            print(f"Market stream: no candle from REST for product {product_id} at {skipped}, skipping it")
+            builder.skipped = None
+
+    async def _close_idle_bars(self):
+        while not self._stopped:
+            await asyncio.sleep(IDLE_CHECK_SECONDS)
+            now = self._now()
+            for product_id, builder in self._builders.items():
+                for bar in builder.close_until(now):
+                    self._publish(product_id, bar)
+                if builder.skipped is not None and now >= builder.skipped + self.interval_seconds:
+                    try:
+                        await self._fetch_skipped_bar(product_id, builder, now)
+                    except Exception as e:
+                        print(f"An error occurred while fetching a skipped bar for product {product_id}: {e}")
+
+    async def run(self):
+        """
+        Connects, subscribes and publishes bars until stop() is called, reconnecting on errors.
+        """
+        import websockets
+
+        await self.resync()
+
+        idle_task = asyncio.ensure_future(self._close_idle_bars())
+        delay = RECONNECT_DELAY
+        try:
+            while not self._stopped:
+                try:
+                    async with websockets.connect(self.url) as websocket:
+                        for request_id, product_id in enumerate(self.product_ids, start=1):
+                            await websocket.send(json.dumps(
+                                subscribe_message(TradeStream(product_id=product_id), request_id)
+                            ))
+                        delay = RECONNECT_DELAY
+                        while not self._stopped:
+                            try:
+                                raw = await asyncio.wait_for(websocket.recv(), IDLE_CHECK_SECONDS)
+                            except asyncio.TimeoutError:
+                                continue
+                            self.handle_message(raw)
+                except Exception as e:
+                    print(f"Market stream disconnected: {e}")
+
+                if self._stopped:
+                    break
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+                await self.resync()
+        finally:
+            idle_task.cancel()
+            self._executor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    product_id_btc = 2
+    interval_1m = "1M"
+
+    stream = MarketStream([product_id_btc], interval_1m)
+    stream.on_bar(lambda product_id, bar, bars: print(f"Product {product_id} bar closed: {bar}"))
+    try:
+        asyncio.run(stream.run())
+    except KeyboardInterrupt:
+        print("\nStream stopped by user.")
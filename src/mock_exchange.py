@@ -0,0 +1,705 @@
+import bisect
+import json
+import math
+import os
+import time
+from types import SimpleNamespace
+
+from src.data_acquisition import INTERVAL_SECONDS, get_historical_candlesticks
+
+X18 = 10**18
+
+DEFAULT_CANDLE_LIMIT = 1000   # Candles returned per get_candlesticks call, like the indexer page size
+DEFAULT_WARMUP_BARS = 50      # Bars available before the replay clock starts
+DEFAULT_INITIAL_BALANCE = 10000.0
+DEFAULT_TAKER_FEE = 0.0002    # 2 bps taker fee
+DEFAULT_SLIPPAGE = 0.0        # Extra fill slippage on top of the replayed price
+BOOK_TICK = 0.0001            # Synthetic book: levels 1 bp apart, starting one tick from the price
+BOOK_LEVEL_SIZE = 1.0         # Synthetic book: base size of the best level, growing by this per level
+
+# (long_weight, short_weight) for the initial, maintenance and unweighted healths
+HEALTH_WEIGHTS = [(0.9, 1.1), (0.95, 1.05), (1.0, 1.0)]
+
+
+def _to_x18(value: float) -> int:
+    return int(round(value * X18))
+
+
+def _subaccount_id(address: str, name: str) -> str:
+    """Builds a bytes32 subaccount id from a 20-byte address and a 12-byte name."""
+    name_hex = name.encode()[:12].hex().ljust(24, "0")
+    return address.lower() + name_hex
+
+
+class ReplayClock:
+    """
+    Simulated clock driving the replay.
+
+    Args:
+        start (int): Simulated start time (unix seconds).
+        end (int): Last simulated timestamp covered by the recording.
+        speed (float): Simulated seconds per real second. 0 replays as fast as possible.
+    """
+
+    def __init__(self, start: int, end: int, speed: float = 0.0):
+        self.now = start
+        self.end = end
+        self.speed = speed
+        self._listeners = []
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    @property
+    def finished(self) -> bool:
+        return self.now >= self.end
+
+    def sleep(self, seconds: float):
+        """Drop-in replacement for time.sleep that advances simulated time instead."""
+        if self.speed > 0:
+            time.sleep(seconds / self.speed)
+        self.advance(seconds)
+
+    def advance(self, seconds: float):
+        self.now += seconds
+        for callback in self._listeners:
+            callback(self.now)
+
+
+class _SubaccountState:
+    def __init__(self, subaccount: str, quote_balance: float):
+        self.subaccount = subaccount
+        self.quote_balance = quote_balance
+        self.positions = {}  # product_id -> [amount, v_quote_balance]
+        self.trigger_orders = []
+
+
+class _MockMarketAPI:
+    def __init__(self, exchange):
+        self._exchange = exchange
+
+    def get_candlesticks(self, params):
+        return self._exchange.get_candlesticks(params)
+
+    def get_all_engine_markets(self):
+        return self._exchange.get_all_engine_markets()
+
+    def place_order(self, params):
+        return self._exchange.place_order(params)
+
+    def place_market_order(self, params):
+        return self._exchange.place_market_order(params)
+
+    def place_trigger_order(self, params):
+        return self._exchange.place_trigger_order(params)
+
+    def place_price_trigger_order(self, **kwargs):
+        return self._exchange.place_price_trigger_order(**kwargs)
+
+    def get_historical_orders_by_digest(self, digests: list):
+        return self._exchange.get_historical_orders_by_digest(digests)
+
+    def get_market_liquidity(self, product_id: int, depth: int):
+        return self._exchange.get_market_liquidity(product_id, depth)
+
+
+class _MockPerpAPI:
+    def __init__(self, exchange):
+        self._exchange = exchange
+
+    def get_prices(self, product_id: int):
+        return self._exchange.get_prices(product_id)
+
+
+class _MockSubaccountAPI:
+    def __init__(self, exchange):
+        self._exchange = exchange
+
+    def get_subaccounts(self, address: str = None):
+        return self._exchange.get_subaccounts(address)
+
+    def get_engine_subaccount_summary(self, subaccount: str):
+        return self._exchange.get_engine_subaccount_summary(subaccount)
+
+
+class MockNadoClient:
+    """
+    In-process stand-in for the nado_protocol client, backed by recorded market data.
+
+    It exposes the subset of the SDK surface the bot uses (market, perp, subaccount and
+    context.signer.address), serves candlesticks and prices as of the replay clock, and
+    fills market and price trigger orders against the replayed prices.
+
+    Args:
+        candlesticks (dict): {product_id: {interval: [candle dicts]}} where each candle has
+                             timestamp, open, high, low, close and volume as plain floats.
+        start (int, optional): Simulated start time. Defaults to after DEFAULT_WARMUP_BARS bars.
+        speed (float): Replay speed, see ReplayClock.
+        address (str): Signer address reported by context.signer.address.
+        subaccount_names (list): Names of the subaccounts to create for the signer.
+        initial_balance (float): Starting quote balance of each subaccount.
+        taker_fee (float): Fee rate charged on every fill.
+        slippage (float): Fractional slippage applied against the taker on every fill.
+    """
+
+    def __init__(
+        self,
+        candlesticks: dict,
+        start: int = None,
+        speed: float = 0.0,
+        address: str = "0x" + "00" * 19 + "01",
+        subaccount_names: list = None,
+        initial_balance: float = DEFAULT_INITIAL_BALANCE,
+        taker_fee: float = DEFAULT_TAKER_FEE,
+        slippage: float = DEFAULT_SLIPPAGE,
+        warmup_bars: int = DEFAULT_WARMUP_BARS,
+    ):
+        self.taker_fee = taker_fee
+        self.slippage = slippage
+        self.fills = []
+        self._order_count = 0
+
+        # (product_id, seconds) -> (timestamps, prebuilt SDK-shaped candles), oldest first
+        self._series = {}
+        for product_id, intervals in candlesticks.items():
+            for interval, candles in intervals.items():
+                seconds = INTERVAL_SECONDS[interval]
+                candles = sorted(candles, key=lambda c: int(c["timestamp"]))
+                self._series[(int(product_id), seconds)] = (
+                    [int(c["timestamp"]) for c in candles],
+                    [self._build_candle(int(product_id), seconds, c) for c in candles],
+                )
+        if not self._series:
+            raise ValueError("Recording does not contain any candlesticks.")
+
+        first_close = min(
+            timestamps[min(warmup_bars, len(timestamps) - 1)] + seconds
+            for (_, seconds), (timestamps, _) in self._series.items()
+        )
+        last_close = max(
+            timestamps[-1] + seconds for (_, seconds), (timestamps, _) in self._series.items()
+        )
+        self.clock = ReplayClock(first_close if start is None else start, last_close, speed)
+        self.clock.add_listener(self._on_time_advanced)
+
+        self.context = SimpleNamespace(signer=SimpleNamespace(address=address))
+        self._subaccounts = {}
+        for name in subaccount_names or ["default"]:
+            subaccount = _subaccount_id(address, name)
+            self._subaccounts[subaccount] = _SubaccountState(subaccount, initial_balance)
+
+        self.market = _MockMarketAPI(self)
+        self.perp = _MockPerpAPI(self)
+        self.subaccount = _MockSubaccountAPI(self)
+
+    @classmethod
+    def from_recording(cls, path: str, **kwargs):
+        """
+        Loads a recording written by record_market_data.
+
+        Keyword arguments override the settings stored in the recording.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            recording = json.load(f)
+
+        settings = {
+            key: recording[key]
+            for key in ("address", "subaccount_names", "initial_balance", "taker_fee", "slippage")
+            if key in recording
+        }
+        if os.getenv("NADO_MOCK_SPEED"):
+            settings["speed"] = float(os.getenv("NADO_MOCK_SPEED"))
+        settings.update(kwargs)
+        return cls(recording["candlesticks"], **settings)
+
+    # --- Market data ---
+
+    @staticmethod
+    def _build_candle(product_id: int, seconds: int, candle: dict):
+        return SimpleNamespace(
+            product_id=product_id,
+            granularity=seconds,
+            timestamp=str(int(candle["timestamp"])),
+            open_x18=str(_to_x18(candle["open"])),
+            high_x18=str(_to_x18(candle["high"])),
+            low_x18=str(_to_x18(candle["low"])),
+            close_x18=str(_to_x18(candle["close"])),
+            volume=str(_to_x18(candle.get("volume", 0.0))),
+        )
+
+    def _closed_count(self, product_id: int, seconds: int) -> int:
+        """Number of candles of a series that have fully closed at the current replay time."""
+        timestamps, _ = self._series[(product_id, seconds)]
+        return bisect.bisect_right(timestamps, self.clock.now - seconds)
+
+    def get_candlesticks(self, params):
+        product_id = int(params.product_id)
+        seconds = int(getattr(params.granularity, "value", params.granularity))
+        if (product_id, seconds) not in self._series:
+            return SimpleNamespace(candlesticks=[])
+
+        limit = getattr(params, "limit", None) or DEFAULT_CANDLE_LIMIT
+        _, candles = self._series[(product_id, seconds)]
+        end = self._closed_count(product_id, seconds)
+        # The indexer returns the newest candles first
+        return SimpleNamespace(candlesticks=candles[max(0, end - limit):end][::-1])
+
+    def price(self, product_id: int) -> float:
+        """Last closed price of the finest recorded interval for a product, or None."""
+        finest = min(
+            (seconds for (pid, seconds) in self._series if pid == product_id), default=None
+        )
+        if finest is None:
+            return None
+        end = self._closed_count(product_id, finest)
+        if end == 0:
+            return None
+        return int(self._series[(product_id, finest)][1][end - 1].close_x18) / X18
+
+    def get_prices(self, product_id: int):
+        price = self.price(product_id)
+        if price is None:
+            return None
+        price_x18 = str(_to_x18(price))
+        return SimpleNamespace(
+            product_id=product_id,
+            index_price_x18=price_x18,
+            mark_price_x18=price_x18,
+            update_time=str(int(self.clock.now)),
+        )
+
+    def trade_events(self, product_id: int):
+        """
+        Yields websocket trade messages synthesized from the product's finest recorded candles,
+        starting at the replay clock: open, high/low and close trades spread across each bar.
+        """
+        finest = min(seconds for (pid, seconds) in self._series if pid == product_id)
+        timestamps, candles = self._series[(product_id, finest)]
+        for candle in candles[bisect.bisect_left(timestamps, self.clock.now - finest):]:
+            start = int(candle.timestamp)
+            up = int(candle.close_x18) >= int(candle.open_x18)
+            prices = [candle.open_x18, candle.low_x18 if up else candle.high_x18,
+                      candle.high_x18 if up else candle.low_x18, candle.close_x18]
+            size = str(int(candle.volume) // 4)
+            for i, price in enumerate(prices):
+                offset = finest - 1 if i == 3 else finest * i // 4
+                yield {
+                    "type": "trade",
+                    "product_id": product_id,
+                    "timestamp": str((start + offset) * 10**9),
+                    "price": price,
+                    "taker_qty": size,
+                }
+
+    # --- Subaccounts ---
+
+    def get_subaccounts(self, address: str = None):
+        address = (address or self.context.signer.address).lower()
+        return SimpleNamespace(subaccounts=[
+            SimpleNamespace(subaccount=state.subaccount, address=address)
+            for state in self._subaccounts.values()
+            if state.subaccount.startswith(address)
+        ])
+
+    def get_engine_subaccount_summary(self, subaccount: str):
+        state = self._subaccounts.get(subaccount)
+        if state is None:
+            return SimpleNamespace(subaccount=subaccount, exists=False, healths=[],
+                                   spot_balances=[], perp_balances=[])
+
+        healths = []
+        for long_weight, short_weight in HEALTH_WEIGHTS:
+            assets = max(state.quote_balance, 0.0)
+            liabilities = max(-state.quote_balance, 0.0)
+            for product_id, (amount, v_quote) in state.positions.items():
+                price = self.price(product_id) or 0.0
+                weight = long_weight if amount >= 0 else short_weight
+                value = amount * price * weight + v_quote
+                if value >= 0:
+                    assets += value
+                else:
+                    liabilities -= value
+            healths.append(SimpleNamespace(
+                assets=str(_to_x18(assets)),
+                liabilities=str(_to_x18(liabilities)),
+                health=str(_to_x18(assets - liabilities)),
+            ))
+
+        return SimpleNamespace(
+            subaccount=subaccount,
+            exists=True,
+            healths=healths,
+            spot_balances=[SimpleNamespace(
+                product_id=0,
+                balance=SimpleNamespace(amount=str(_to_x18(state.quote_balance))),
+            )],
+            perp_balances=[
+                SimpleNamespace(
+                    product_id=product_id,
+                    balance=SimpleNamespace(
+                        amount=str(_to_x18(amount)),
+                        v_quote_balance=str(_to_x18(v_quote)),
+                    ),
+                )
+                for product_id, (amount, v_quote) in state.positions.items()
+            ],
+        )
+
+    # --- Order matching ---
+
+    def _next_digest(self) -> str:
+        self._order_count += 1
+        return "0x%064x" % self._order_count
+
+    def _response(self, digest: str):
+        return SimpleNamespace(status="success", error=None, data=SimpleNamespace(digest=digest))
+
+    def _fill(self, state, product_id: int, amount: float, price: float, kind: str, digest: str = None):
+        """Fills a signed amount (positive buys, negative sells) at the given price."""
+        fill_price = price * (1 + self.slippage) if amount > 0 else price * (1 - self.slippage)
+        fee = abs(amount) * fill_price * self.taker_fee
+        position = state.positions.setdefault(product_id, [0.0, 0.0])
+        position[0] += amount
+        position[1] -= amount * fill_price + fee
+        self.fills.append({
+            "timestamp": self.clock.now,
+            "subaccount": state.subaccount,
+            "product_id": product_id,
+            "amount": amount,
+            "price": fill_price,
+            "fee": fee,
+            "type": kind,
+            "digest": digest,
+        })
+
+    def _state(self, subaccount):
+        # SDK params carry the sender as bytes32
+        if isinstance(subaccount, bytes):
+            subaccount = "0x" + subaccount.hex()
+        state = self._subaccounts.get(subaccount)
+        if state is None:
+            raise ValueError(f"Unknown subaccount: {subaccount}")
+        return state
+
+    def get_all_engine_markets(self):
+        long_weight, short_weight = HEALTH_WEIGHTS[0]
+        long_maintenance, short_maintenance = HEALTH_WEIGHTS[1]
+        perp_products = []
+        for product_id in sorted({pid for (pid, _) in self._series}):
+            price_x18 = str(_to_x18(self.price(product_id) or 0.0))
+            perp_products.append(SimpleNamespace(
+                product_id=product_id,
+                oracle_price_x18=price_x18,
+                risk=SimpleNamespace(
+                    long_weight_initial_x18=str(_to_x18(long_weight)),
+                    short_weight_initial_x18=str(_to_x18(short_weight)),
+                    long_weight_maintenance_x18=str(_to_x18(long_maintenance)),
+                    short_weight_maintenance_x18=str(_to_x18(short_maintenance)),
+                    price_x18=price_x18,
+                ),
+                book_info=SimpleNamespace(size_increment="1", price_increment_x18="1", min_size="0"),
+            ))
+        return SimpleNamespace(spot_products=[], perp_products=perp_products)
+
+    def get_historical_orders_by_digest(self, digests: list):
+        """Indexer view of orders: filled base and quote amounts (quote negative for buys) and fees."""
+        orders = []
+        for digest in digests:
+            fills = [fill for fill in self.fills if fill["digest"] == digest]
+            if not fills:
+                continue
+            orders.append(SimpleNamespace(
+                digest=digest,
+                subaccount=fills[0]["subaccount"],
+                product_id=fills[0]["product_id"],
+                timestamp=str(int(fills[-1]["timestamp"])),
+                base_filled=str(_to_x18(sum(fill["amount"] for fill in fills))),
+                quote_filled=str(_to_x18(-sum(fill["amount"] * fill["price"] for fill in fills))),
+                fee=str(_to_x18(sum(fill["fee"] for fill in fills))),
+            ))
+        return SimpleNamespace(orders=orders)
+
+    def get_market_liquidity(self, product_id: int, depth: int):
+        """Synthetic order book around the replayed price, for recording fill model snapshots offline."""
+        price = self._market_price(product_id)
+        levels = range(1, depth + 1)
+        return SimpleNamespace(
+            bids=[[str(_to_x18(price * (1 - i * BOOK_TICK))), str(_to_x18(i * BOOK_LEVEL_SIZE))] for i in levels],
+            asks=[[str(_to_x18(price * (1 + i * BOOK_TICK))), str(_to_x18(i * BOOK_LEVEL_SIZE))] for i in levels],
+            timestamp=str(int(self.clock.now)),
+        )
+
+    def _market_price(self, product_id: int) -> float:
+        price = self.price(product_id)
+        if price is None:
+            raise ValueError(f"No replayed price for product {product_id}")
+        return price
+
+    def place_market_order(self, params):
+        state = self._state(params.market_order.sender)
+        price = self._market_price(int(params.product_id))
+        digest = self._next_digest()
+        self._fill(state, int(params.product_id), int(params.market_order.amount) / X18, price, "market", digest)
+        return self._response(digest)
+
+    def place_order(self, params):
+        """Fills marketable orders at the replayed price; anything else is rejected like a FOK."""
+        from nado_protocol.utils.order import order_reduce_only
+
+        state = self._state(params.order.sender)
+        product_id = int(params.product_id)
+        price = self._market_price(product_id)
+        amount = int(params.order.amount) / X18
+        limit = int(params.order.priceX18) / X18
+        fill_price = price * (1 + self.slippage) if amount > 0 else price * (1 - self.slippage)
+        if (amount > 0 and fill_price > limit) or (amount < 0 and fill_price < limit):
+            raise Exception(f"Order not filled: limit {limit} is not marketable at {fill_price}")
+        if order_reduce_only(int(params.order.appendix)):
+            position = state.positions.get(product_id, [0.0, 0.0])[0]
+            amount = math.copysign(min(abs(amount), abs(position)), amount) if position * amount < 0 else 0.0
+        digest = self._next_digest()
+        if amount:
+            self._fill(state, product_id, amount, price, "market", digest)
+        return self._response(digest)
+
+    def place_trigger_order(self, params):
+        from nado_protocol.utils.order import order_reduce_only
+
+        requirement = params.trigger.price_trigger.price_requirement
+        trigger_type, trigger_price_x18 = next(iter(requirement.dict().items()))
+        return self.place_price_trigger_order(
+            product_id=params.product_id,
+            sender=params.order.sender,
+            price_x18=str(params.order.priceX18),
+            amount_x18=str(params.order.amount),
+            trigger_price_x18=trigger_price_x18,
+            trigger_type=trigger_type,
+            expiration=params.order.expiration,
+            reduce_only=order_reduce_only(int(params.order.appendix)),
+        )
+
+    def place_price_trigger_order(
+        self,
+        product_id: int,
+        sender: str,
+        price_x18: str,
+        amount_x18: str,
+        trigger_price_x18: str,
+        trigger_type: str,
+        expiration: int = None,
+        reduce_only: bool = False,
+        **kwargs
+    ):
+        state = self._state(sender)
+        digest = self._next_digest()
+        expires_at = None
+        if expiration is not None:
+            # Expirations are wall-clock based; keep the remaining lifetime on the replay clock
+            remaining = (int(expiration) & 0xFFFFFFFF) - time.time()
+            expires_at = self.clock.now + remaining
+        state.trigger_orders.append({
+            "product_id": int(product_id),
+            "limit_price": int(price_x18) / X18,
+            "amount": int(amount_x18) / X18,
+            "trigger_price": int(trigger_price_x18) / X18,
+            "trigger_type": trigger_type,
+            "expires_at": expires_at,
+            "reduce_only": reduce_only,
+            "digest": digest,
+        })
+        return self._response(digest)
+
+    def _on_time_advanced(self, now: float):
+        for state in self._subaccounts.values():
+            if state.trigger_orders:
+                state.trigger_orders = [
+                    order for order in state.trigger_orders
+                    if not self._process_trigger(state, order, now)
+                ]
+
+    def _process_trigger(self, state, order: dict, now: float) -> bool:
+        """Returns True when the trigger order is done (filled, expired or cancelled)."""
+        if order["expires_at"] is not None and now > order["expires_at"]:
+            return True
+
+        price = self.price(order["product_id"])
+        if price is None:
+            return False
+        # Oracle and mid price triggers are approximated with the replayed last price
+        if order["trigger_type"].endswith("_below") and price > order["trigger_price"]:
+            return False
+        if order["trigger_type"].endswith("_above") and price < order["trigger_price"]:
+            return False
+
+        amount = order["amount"]
+        if order["reduce_only"]:
+            position = state.positions.get(order["product_id"], [0.0, 0.0])[0]
+            if position == 0 or (position > 0) == (amount > 0):
+                return True  # Nothing left to reduce
+            amount = math.copysign(min(abs(amount), abs(position)), amount)
+
+        limit = order["limit_price"]
+        if limit:
+            if (amount > 0 and price > limit) or (amount < 0 and price < limit):
+                return False  # Triggered, but the limit is not marketable yet
+            price = limit
+        self._fill(state, order["product_id"], amount, price, "trigger", order["digest"])
+        return True
+
+
+async def serve_trade_stream(path: str, host: str = "127.0.0.1", port: int = 8765, speed: float = 0.0):
+    """
+    Local websocket stand-in for the trade subscription stream, replaying a recording.
+
+    Clients subscribe with {"method": "subscribe", "stream": {"type": "trade", "product_id": ...}}.
+
+    Args:
+        path (str): Recording written by record_market_data.
+        host (str): Interface to listen on.
+        port (int): Port to listen on.
+        speed (float): Simulated seconds per real second. 0 streams as fast as possible.
+    """
+    import asyncio
+    import websockets
+
+    async def stream_trades(websocket, client, product_id):
+        previous = None
+        for event in client.trade_events(product_id):
+            timestamp = int(event["timestamp"]) / 1e9
+            if speed > 0 and previous is not None:
+                await asyncio.sleep((timestamp - previous) / speed)
+            else:
+                await asyncio.sleep(0)
+            previous = timestamp
+            await websocket.send(json.dumps(event))
+
+    async def handler(websocket, request_path=None):
+        client = MockNadoClient.from_recording(path)
+        tasks = []
+        try:
+            async for raw in websocket:
+                message = json.loads(raw)
+                if message.get("method") == "subscribe":
+                    product_id = int(message["stream"]["product_id"])
+                    await websocket.send(json.dumps({"result": None, "id": message.get("id")}))
+                    tasks.append(asyncio.ensure_future(stream_trades(websocket, client, product_id)))
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async with websockets.serve(handler, host, port):
+        print(f"Serving replayed trades on ws://{host}:{port}")
+        await asyncio.Future()
+
+
+def record_market_data(path: str, product_ids: list, intervals: list, initial_balance: float = DEFAULT_INITIAL_BALANCE):
+    """
+    Records candlesticks from the live indexer into a file MockNadoClient can replay.
+
+    Args:
+        path (str): Output JSON file.
+        product_ids (list): Product IDs to record (e.g. [2] for BTC perp).
+        intervals (list): Candlestick intervals to record (e.g. ["1H"]).
+        initial_balance (float): Starting quote balance stored with the recording.
+    """
+    candlesticks = {}
+    for product_id in product_ids:
+        for interval in intervals:
+            candles = get_historical_candlesticks(product_id, interval) or []
+            candlesticks.setdefault(str(product_id), {})[interval] = [
+                {
+                    "timestamp": int(c.timestamp),
+                    "open": int(c.open_x18) / X18,
+                    "high": int(c.high_x18) / X18,
+                    "low": int(c.low_x18) / X18,
+                    "close": int(c.close_x18) / X18,
+                    "volume": int(c.volume) / X18,
+                } for c in candles
+            ]
+            print(f"Recorded {len(candles)} {interval} candlesticks for product {product_id}.")
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"initial_balance": initial_balance, "candlesticks": candlesticks}, f)
+
+
+def replay_bot(path: str, speed: float = 0.0, max_cycles: int = None, quiet: bool = True, journal_dir: str = None):
+    """
+    Runs the real run_bot loop against a recording, faster than real time.
+
+    Args:
+        path (str): Recording written by record_market_data.
+        speed (float): Simulated seconds per real second. 0 runs as fast as possible.
+        max_cycles (int, optional): Number of bot cycles. Defaults to the end of the recording.
+        quiet (bool): Only log warnings and errors from the bot while replaying.
+        journal_dir (str, optional): Trade journal directory for the replayed fills.
+                                     Replays are not journaled by default.
+
+    Returns:
+        MockNadoClient: The client after the replay, with fills and balances.
+    """
+    import logging
+    from src.logger import setup_logging
+    from src.nado_client import set_nado_client
+    from src.request_scheduler import RequestScheduler, get_scheduler, set_scheduler
+    from src import main_bot
+
+    client = MockNadoClient.from_recording(path, speed=speed)
+    if max_cycles is None:
+        max_cycles = max(1, math.ceil((client.clock.end - client.clock.now) / main_bot.CHECK_INTERVAL_SECONDS))
+
+    # Configure handlers first so run_bot's setup does not reset the quiet level
+    bot_logger = setup_logging()
+    previous_level = bot_logger.level
+    if quiet:
+        bot_logger.setLevel(logging.WARNING)
+
+    # The mock has no rate limits, so replay without throttling
+    previous_scheduler = get_scheduler()
+    set_scheduler(RequestScheduler(throttle=False))
+    set_nado_client(client)
+    previous_journal_dir = main_bot.TRADE_JOURNAL_DIR
+    main_bot.TRADE_JOURNAL_DIR = journal_dir
+    started = time.perf_counter()
+    try:
+        main_bot.run_bot(max_cycles=max_cycles, sleep_fn=client.clock.sleep)
+    finally:
+        main_bot.TRADE_JOURNAL_DIR = previous_journal_dir
+        set_nado_client(None)
+        set_scheduler(previous_scheduler)
+        bot_logger.setLevel(previous_level)
+    elapsed = time.perf_counter() - started
+
+    print(f"Replayed {max_cycles} cycles in {elapsed:.3f}s ({max_cycles / elapsed:.0f} cycles/s), {len(client.fills)} fills.")
+    return client
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Record market data or replay the bot offline.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="Record candlesticks from the live indexer.")
+    record_parser.add_argument("path")
+    record_parser.add_argument("--product-id", type=int, action="append", default=None)
+    record_parser.add_argument("--interval", action="append", default=None)
+
+    replay_parser = subparsers.add_parser("replay", help="Run the bot loop against a recording.")
+    replay_parser.add_argument("path")
+    replay_parser.add_argument("--speed", type=float, default=0.0)
+    replay_parser.add_argument("--max-cycles", type=int, default=None)
+    replay_parser.add_argument("--journal", default=None, help="Journal the replayed fills to this directory.")
+
+    serve_parser = subparsers.add_parser("serve", help="Serve recorded trades over a local websocket.")
+    serve_parser.add_argument("path")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--speed", type=float, default=0.0)
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record_market_data(args.path, args.product_id or [2], args.interval or ["1H"])
+    elif args.command == "serve":
+        import asyncio
+        asyncio.run(serve_trade_stream(args.path, port=args.port, speed=args.speed))
+    else:
+        replay_bot(args.path, speed=args.speed, max_cycles=args.max_cycles, journal_dir=args.journal)
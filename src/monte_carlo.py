@@ -0,0 +1,346 @@
+import math
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.data_acquisition import INTERVAL_SECONDS
+from src.strategy import sma_crossover_positions
+
+DEFAULT_RESAMPLES = 10000
+DEFAULT_CHUNK_SIZE = 50         # Resamples per task; each task gets its own RNG stream
+DEFAULT_BLOCK_LENGTH = 24 * 7   # Bars per resampled block (one week of hourly candles)
+DEFAULT_CONFIDENCE = 0.95
+SECONDS_PER_YEAR = 365 * 86400
+
+METRICS = ("total_pnl", "max_drawdown", "sharpe")
+
+
+def trade_factors(trades: list) -> np.ndarray:
+    """
+    Converts run_backtest trades into capital multipliers, one per round trip.
+
+    The backtester puts all capital into each trade, so a round trip multiplies capital by
+    (sell_price / buy_price) * (1 - commission) - commission; this recovers that factor from
+    the capital before the buy (shares * price) and the capital after the sell.
+    """
+    factors = []
+    capital_before = None
+    for trade in trades:
+        if trade['type'] == 'BUY':
+            capital_before = trade['shares'] * trade['price']
+        elif trade['type'] in ('SELL', 'SELL_FINAL') and capital_before:
+            factors.append(trade['capital'] / capital_before)
+            capital_before = None
+    return np.array(factors)
+
+
+def crossover_trade_factors(close: np.ndarray, positions: np.ndarray,
+                            commission_rate: float, slippage: float) -> np.ndarray:
+    """
+    Capital multipliers of the long-only round trips simulate_trades makes on a Position series.
+    """
+    entries = np.flatnonzero(positions == 1)
+    exits = np.flatnonzero(positions == -1)
+    if len(entries) == 0:
+        return np.zeros(0)
+    # Crossovers alternate starting with a buy; an open position is closed at the last bar
+    exit_prices = close[exits[:len(entries)]]
+    if len(exit_prices) < len(entries):
+        exit_prices = np.append(exit_prices, close[-1])
+    ratio = (exit_prices * (1 - slippage)) / (close[entries] * (1 + slippage))
+    return ratio * (1 - commission_rate) - commission_rate
+
+
+def path_metrics(factors: np.ndarray, counts: np.ndarray, initial_capital: float,
+                 trades_per_year: np.ndarray) -> dict:
+    """
+    Total PnL, maximum drawdown and annualized Sharpe ratio of trade-level equity paths.
+
+    Args:
+        factors (np.ndarray): (paths, max_trades) capital multipliers, padded with 1.0.
+        counts (np.ndarray): Number of real trades per path.
+        initial_capital (float): Starting capital.
+        trades_per_year (np.ndarray): Per-path trade frequency used to annualize the Sharpe ratio.
+
+    Returns:
+        dict: Arrays of total_pnl, max_drawdown (fraction of the peak) and sharpe per path.
+    """
+    equity = initial_capital * np.cumprod(factors, axis=1)
+    equity = np.hstack([np.full((len(factors), 1), initial_capital), equity])
+    peaks = np.maximum.accumulate(equity, axis=1)
+
+    returns = factors - 1.0  # Padding contributes 0 to the sums below
+    counts = counts.astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = returns.sum(axis=1) / counts
+        variance = ((returns ** 2).sum(axis=1) - counts * mean ** 2) / (counts - 1)
+        sharpe = mean / np.sqrt(variance) * np.sqrt(trades_per_year)
+    sharpe[(counts < 2) | ~(variance > 0)] = np.nan
+
+    return {
+        'total_pnl': equity[:, -1] - initial_capital,
+        'max_drawdown': ((peaks - equity) / peaks).max(axis=1),
+        'sharpe': sharpe,
+    }
+
+
+def _trade_bootstrap_chunk(seed, n_resamples, factors, initial_capital, trades_per_year):
+    rng = np.random.default_rng(seed)
+    samples = factors[rng.integers(0, len(factors), size=(n_resamples, len(factors)))]
+    counts = np.full(n_resamples, len(factors))
+    return path_metrics(samples, counts, initial_capital, np.full(n_resamples, trades_per_year))
+
+
+def _block_bootstrap_chunk(seed, n_resamples, close, block_length, short_window, long_window,
+                           initial_capital, commission_rate, slippage, years):
+    rng = np.random.default_rng(seed)
+    log_returns = np.diff(np.log(close))
+    block_length = min(block_length, len(log_returns))
+    n_blocks = math.ceil(len(log_returns) / block_length)
+
+    # Moving block bootstrap: concatenate randomly chosen blocks of consecutive returns
+    starts = rng.integers(0, len(log_returns) - block_length + 1, size=(n_resamples, n_blocks))
+    blocks = sliding_window_view(log_returns, block_length)[starts].reshape(n_resamples, -1)
+    paths = np.zeros((n_resamples, len(close)))
+    np.cumsum(blocks[:, :len(log_returns)], axis=1, out=paths[:, 1:])
+    np.exp(paths, out=paths)
+    paths *= close[0]
+    positions = sma_crossover_positions(paths, short_window, long_window)
+
+    path_factors = [
+        crossover_trade_factors(path, path_positions, commission_rate, slippage)
+        for path, path_positions in zip(paths, positions)
+    ]
+    counts = np.array([len(f) for f in path_factors])
+    factors = np.ones((n_resamples, max(1, counts.max())))
+    for i, f in enumerate(path_factors):
+        factors[i, :len(f)] = f
+    return path_metrics(factors, counts, initial_capital, counts / years)
+
+
+def _run_chunks(task, args, n_resamples, chunk_size, workers, seed):
+    """Runs task over chunks of resamples, each with its own spawned seed, and merges the metrics."""
+    sizes = [chunk_size] * (n_resamples // chunk_size)
+    if n_resamples % chunk_size:
+        sizes.append(n_resamples % chunk_size)
+    # Seeds depend only on the seed and chunk sizes, so results do not depend on the worker count
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes))) as executor:
+            futures = [executor.submit(task, chunk_seed, size, *args) for chunk_seed, size in zip(seeds, sizes)]
+            chunks = [future.result() for future in futures]
+    else:
+        chunks = [task(chunk_seed, size, *args) for chunk_seed, size in zip(seeds, sizes)]
+
+    return {metric: np.concatenate([chunk[metric] for chunk in chunks]) for metric in METRICS}
+
+
+def summarize(samples: dict, observed: dict = None, confidence: float = DEFAULT_CONFIDENCE) -> dict:
+    """
+    Confidence intervals of resampled metrics.
+
+    Returns:
+        dict: For each metric, the mean, median and lower/upper percentile bounds (and the
+              observed backtest value if given), plus the probability of a loss.
+    """
+    tail = (1 - confidence) / 2 * 100
+    summary = {'n_resamples': len(samples['total_pnl']), 'confidence': confidence}
+    for metric in METRICS:
+        values = samples[metric]
+        with warnings.catch_warnings():
+            # Sharpe is nan for paths with fewer than two trades; all-nan metrics stay nan
+            warnings.simplefilter("ignore", RuntimeWarning)
+            summary[metric] = {
+                'mean': float(np.nanmean(values)),
+                'median': float(np.nanmedian(values)),
+                'lower': float(np.nanpercentile(values, tail)),
+                'upper': float(np.nanpercentile(values, 100 - tail)),
+            }
+        if observed is not None:
+            summary[metric]['observed'] = float(observed[metric][0])
+    summary['prob_loss'] = float(np.mean(samples['total_pnl'] < 0))
+    return summary
+
+
+def bootstrap_trades(
+    factors: np.ndarray,
+    years: float,
+    initial_capital: float = 10000.0,
+    n_resamples: int = DEFAULT_RESAMPLES,
+    workers: int = None,
+    seed: int = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    confidence: float = DEFAULT_CONFIDENCE
+) -> dict:
+    """
+    Resamples a backtest's round trips with replacement and reports confidence intervals.
+
+    Args:
+        factors (np.ndarray): Capital multiplier per round trip, from trade_factors.
+        years (float): Length of the backtest, used to annualize the Sharpe ratio.
+        initial_capital (float): Starting capital.
+        n_resamples (int): Number of resampled equity paths.
+        workers (int, optional): Worker processes. Defaults to the number of CPUs.
+        seed (int, optional): Seed for reproducible results.
+        chunk_size (int): Resamples per task.
+        confidence (float): Width of the reported intervals (e.g. 0.95).
+
+    Returns:
+        dict: See summarize. Empty if there were fewer than two trades.
+    """
+    factors = np.asarray(factors, dtype=float)
+    if len(factors) < 2:
+        print("Not enough trades to bootstrap.")
+        return {}
+
+    trades_per_year = len(factors) / years
+    samples = _run_chunks(
+        _trade_bootstrap_chunk, (factors, initial_capital, trades_per_year),
+        n_resamples, chunk_size, workers, seed
+    )
+    observed = path_metrics(factors[None, :], np.array([len(factors)]), initial_capital,
+                            np.array([trades_per_year]))
+    return summarize(samples, observed, confidence)
+
+
+def bootstrap_candles(
+    close: np.ndarray,
+    interval: str,
+    short_window: int,
+    long_window: int,
+    initial_capital: float = 10000.0,
+    commission_rate: float = 0.001,
+    slippage: float = 0.0001,
+    n_resamples: int = DEFAULT_RESAMPLES,
+    block_length: int = DEFAULT_BLOCK_LENGTH,
+    workers: int = None,
+    seed: int = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    confidence: float = DEFAULT_CONFIDENCE
+) -> dict:
+    """
+    Rebuilds price paths from randomly chosen blocks of candle returns, reruns the moving
+    average crossover strategy on each, and reports confidence intervals.
+
+    Blocks keep the short-term autocorrelation and volatility clustering the strategy trades on,
+    which resampling individual trades or returns would destroy.
+
+    Args:
+        close (np.ndarray): Closing prices oldest first.
+        interval (str): The candlestick interval of close, one of INTERVAL_SECONDS.
+        short_window (int): The window size for the short-term SMA.
+        long_window (int): The window size for the long-term SMA.
+        initial_capital (float): Starting capital.
+        commission_rate (float): Commission rate per trade (e.g., 0.001 for 0.1%).
+        slippage (float): Slippage percentage per trade.
+        n_resamples (int): Number of resampled price paths.
+        block_length (int): Consecutive bars per block.
+        workers (int, optional): Worker processes. Defaults to the number of CPUs.
+        seed (int, optional): Seed for reproducible results.
+        chunk_size (int): Resamples per task.
+        confidence (float): Width of the reported intervals (e.g. 0.95).
+
+    Returns:
+        dict: See summarize. Empty if there are too few candles.
+    """
+    close = np.asarray(close, dtype=float)
+    if len(close) <= long_window + 1:
+        print("Not enough candles to bootstrap.")
+        return {}
+
+    years = len(close) * INTERVAL_SECONDS[interval] / SECONDS_PER_YEAR
+    samples = _run_chunks(
+        _block_bootstrap_chunk,
+        (close, block_length, short_window, long_window, initial_capital, commission_rate, slippage, years),
+        n_resamples, chunk_size, workers, seed
+    )
+    factors = crossover_trade_factors(close, sma_crossover_positions(close, short_window, long_window),
+                                      commission_rate, slippage)
+    padded = factors if len(factors) else np.ones(1)
+    observed = path_metrics(padded[None, :], np.array([len(factors)]), initial_capital,
+                            np.array([len(factors) / years]))
+    return summarize(samples, observed, confidence)
+
+
+def run_monte_carlo(
+    product_id: int,
+    interval: str,
+    short_window: int,
+    long_window: int,
+    method: str = "blocks",
+    initial_capital: float = 10000.0,
+    commission_rate: float = 0.001,
+    slippage: float = 0.0001,
+    **kwargs
+) -> dict:
+    """
+    Fetches candlesticks once and runs a Monte Carlo analysis of the moving average crossover
+    strategy on them.
+
+    Args:
+        product_id (int): The ID of the product (e.g., 1 for BTC).
+        interval (str): The candlestick interval (e.g., "1H", "4H", "1D").
+        short_window (int): The window size for the short-term SMA.
+        long_window (int): The window size for the long-term SMA.
+        method (str): "trades" to bootstrap round trips, "blocks" to resample candle blocks.
+        initial_capital (float): Starting capital.
+        commission_rate (float): Commission rate per trade (e.g., 0.001 for 0.1%).
+        slippage (float): Slippage percentage per trade.
+        **kwargs: Passed to bootstrap_trades or bootstrap_candles (n_resamples, workers, seed, ...).
+
+    Returns:
+        dict: See summarize, or an empty dict if no data could be fetched.
+    """
+    from src.data_acquisition import get_historical_candlesticks
+
+    candlesticks = get_historical_candlesticks(product_id, interval)
+    if not candlesticks:
+        print("No candlestick data for the Monte Carlo analysis.")
+        return {}
+    candles = sorted(candlesticks, key=lambda c: int(c.timestamp))
+    close = np.array([int(c.close_x18) / (10**18) for c in candles])
+
+    if method == "trades":
+        positions = sma_crossover_positions(close, short_window, long_window)
+        factors = crossover_trade_factors(close, positions, commission_rate, slippage)
+        years = len(close) * INTERVAL_SECONDS[interval] / SECONDS_PER_YEAR
+        return bootstrap_trades(factors, years, initial_capital, **kwargs)
+    if method == "blocks":
+        return bootstrap_candles(close, interval, short_window, long_window,
+                                 initial_capital, commission_rate, slippage, **kwargs)
+    raise ValueError(f"Invalid method: {method}. Use 'trades' or 'blocks'.")
+
+
+def print_summary(summary: dict):
+    """
+    Prints the confidence intervals returned by the bootstrap functions.
+    """
+    if not summary:
+        print("Monte Carlo analysis failed.")
+        return
+    print(f"\n--- Monte Carlo ({summary['n_resamples']} resamples, {summary['confidence']:.0%} intervals) ---")
+    for metric, label, fmt in (("total_pnl", "Total PnL", "{:.2f}"),
+                               ("max_drawdown", "Max Drawdown", "{:.2%}"),
+                               ("sharpe", "Sharpe Ratio", "{:.2f}")):
+        values = summary[metric]
+        observed = f"observed {fmt.format(values['observed'])}, " if 'observed' in values else ""
+        print(f"{label}: {observed}median {fmt.format(values['median'])}, "
+              f"interval [{fmt.format(values['lower'])}, {fmt.format(values['upper'])}]")
+    print(f"Probability of Loss: {summary['prob_loss']:.1%}")
+
+
+if __name__ == "__main__":
+    product_id_btc = 2
+    interval_1h = "1H"
+    short_window = 10
+    long_window = 30
+
+    for method in ("trades", "blocks"):
+        print(f"\nMethod: {method}")
+        print_summary(run_monte_carlo(product_id_btc, interval_1h, short_window, long_window, method=method, seed=42))
@@ -1,11 +1,38 @@
 import os
-from nado_protocol.client import create_nado_client, NadoClientMode
-from nado_protocol.utils.backend import Signer
+
+# nado_protocol pulls in web3 and takes most of a second to import, so it is loaded
+# on first use rather than when this module is imported.
+
+# Client returned by get_nado_client instead of a live one (see set_nado_client)
+_client_override = None
+
+def set_nado_client(client):
+    """
+    Makes get_nado_client return the given client, e.g. a MockNadoClient for offline replay.
+    Pass None to go back to creating live clients.
+    """
+    global _client_override
+    _client_override = client
 
 def get_nado_client(mode=None):
     """
     Initializes and returns a Nado client.
+
+    If a client was installed with set_nado_client, or NADO_MOCK_RECORDING points to a
+    recorded market data file, an offline mock client is returned instead.
     """
+    global _client_override
+    if _client_override is not None:
+        return _client_override
+
+    recording_path = os.getenv("NADO_MOCK_RECORDING")
+    if recording_path:
+        from src.mock_exchange import MockNadoClient
+        _client_override = MockNadoClient.from_recording(recording_path)
+        return _client_override
+
+    from nado_protocol.client import create_nado_client, NadoClientMode
+
     if mode is None:
         mode = NadoClientMode.TESTNET
 
@@ -16,6 +43,13 @@ def get_nado_client(mode=None):
     client = create_nado_client(mode, private_key)
     return client
 
+def __getattr__(name):
+    # Keeps `from src.nado_client import NadoClientMode` working without an eager SDK import
+    if name == "NadoClientMode":
+        from nado_protocol.client import NadoClientMode
+        return NadoClientMode
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 if __name__ == "__main__":
     try:
         nado_client = get_nado_client()
@@ -0,0 +1,348 @@
+import threading
+import time
+from collections import deque
+
+from nado_protocol.contracts.types import NadoExecuteType
+from nado_protocol.engine_client.types.execute import PlaceOrderParams
+from nado_protocol.trigger_client.types.execute import PlaceTriggerOrderParams
+from nado_protocol.trigger_client.types.models import (
+    LastPriceAbove,
+    LastPriceBelow,
+    PriceTrigger,
+    PriceTriggerData,
+)
+from nado_protocol.utils.execute import OrderParams
+from nado_protocol.utils.expiration import OrderType
+from nado_protocol.utils.math import round_x18, to_x18
+from nado_protocol.utils.nonce import gen_order_nonce
+from nado_protocol.utils.order import (
+    OrderAppendixTriggerType,
+    build_appendix,
+    gen_order_verifying_contract,
+)
+
+from src.request_scheduler import get_scheduler, is_rate_limited, PRIORITY_MARKET_DATA, PRIORITY_ORDER
+
+NONCE_POOL_SIZE = 16
+NONCE_MAX_AGE_SECONDS = 30.0   # Nonces embed a receive deadline (~90s ahead), so drop old ones early
+NONCE_REFRESH_SECONDS = 1.0
+PRICE_REFRESH_SECONDS = 1.0
+PRICE_MAX_AGE_SECONDS = 10.0   # Older mark prices (by the engine's update time) fall back to the caller's price
+MARKET_ORDER_TTL = 1000        # Seconds, same as the SDK's market orders
+TRIGGER_ORDER_TTL = 3600 * 24 * 7
+DEFAULT_MARKET_SLIPPAGE = 0.005  # 0.5%, same default as the SDK's market orders
+LATENCY_HISTORY = 1000         # Fires kept for latency statistics
+
+TRIGGER_REQUIREMENTS = {
+    "last_price_above": LastPriceAbove,
+    "last_price_below": LastPriceBelow,
+}
+
+
+class NonceManager:
+    """
+    Keeps a pool of fresh order nonces, refilled by a background thread.
+
+    Args:
+        pool_size (int): Nonces kept ready.
+        max_age_seconds (float): Nonces older than this are discarded.
+        refresh_seconds (float): How often the pool is topped up.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = NONCE_POOL_SIZE,
+        max_age_seconds: float = NONCE_MAX_AGE_SECONDS,
+        refresh_seconds: float = NONCE_REFRESH_SECONDS,
+    ):
+        self.pool_size = pool_size
+        self.max_age_seconds = max_age_seconds
+        self.refresh_seconds = refresh_seconds
+        self.misses = 0  # Nonces that had to be generated on the hot path
+        self._pool = deque()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._refill()
+        self._thread = threading.Thread(target=self._run, name="nado-nonces", daemon=True)
+        self._thread.start()
+
+    def _refill(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._pool and now - self._pool[0][0] > self.max_age_seconds:
+                self._pool.popleft()
+            while len(self._pool) < self.pool_size:
+                self._pool.append((now, gen_order_nonce()))
+
+    def _run(self):
+        while not self._stopped.wait(self.refresh_seconds):
+            self._refill()
+
+    def take(self) -> int:
+        """Returns a fresh nonce, generating one inline only if the pool ran dry."""
+        now = time.monotonic()
+        with self._lock:
+            while self._pool:
+                created, nonce = self._pool.pop()  # Newest first
+                if now - created <= self.max_age_seconds:
+                    return nonce
+        self.misses += 1
+        return gen_order_nonce()
+
+    def stop(self):
+        self._stopped.set()
+
+
+class OrderTemplate:
+    """
+    Everything about an order that is known before a signal fires.
+
+    Args:
+        product_id (int): The ID of the product.
+        sender (str): The subaccount placing the order.
+        amount_x18 (int): Signed amount, positive to buy and negative to sell.
+        appendix (int): Order type and flags, from build_appendix.
+        ttl (int): Seconds until the order expires.
+        trigger_type (str, optional): Price trigger type for SL/TP orders.
+    """
+
+    def __init__(self, product_id: int, sender: str, amount_x18: int, appendix: int, ttl: int, trigger_type: str = None):
+        self.product_id = product_id
+        self.sender = sender
+        self.amount_x18 = amount_x18
+        self.appendix = appendix
+        self.ttl = ttl
+        self.trigger_type = trigger_type
+        self.verifying_contract = gen_order_verifying_contract(product_id)
+        self.expiration = int(time.time()) + ttl
+
+    def refresh(self):
+        self.expiration = int(time.time()) + self.ttl
+
+    def build(self, price_x18: int, nonce: int) -> OrderParams:
+        return OrderParams(
+            sender=self.sender,
+            priceX18=price_x18,
+            amount=self.amount_x18,
+            expiration=self.expiration,
+            nonce=nonce,
+            appendix=self.appendix,
+        )
+
+
+class OrderPreparer:
+    """
+    Keeps ready-to-send order templates per product and side so only price and nonce
+    are filled in when a signal fires, and records where the submission time goes.
+
+    Market orders are sent as FOK limit orders at the reference price plus slippage,
+    which skips the two queries the SDK's place_market_order makes before every order.
+    The reference price is the mark price of each prepared product, kept fresh by a
+    background thread; the caller's price is only used when that mark price is stale.
+
+    Args:
+        nado_client: The Nado client (or MockNadoClient).
+        subaccount (str): The subaccount to trade from.
+        nonce_manager (NonceManager, optional): Shared nonce pool. One is created if omitted.
+        slippage (float): Slippage allowed on market orders (e.g. 0.005 for 0.5%).
+    """
+
+    def __init__(self, nado_client, subaccount: str, nonce_manager: NonceManager = None,
+                 slippage: float = DEFAULT_MARKET_SLIPPAGE):
+        self.nado_client = nado_client
+        self.subaccount = subaccount
+        self.nonces = nonce_manager or NonceManager()
+        self.slippage = slippage
+        self.templates = {}
+        self.price_increments = {}
+        self.mark_prices = {}  # product_id -> (engine update time, mark price)
+        self.price_misses = 0  # Market orders priced from the caller's price
+        # (prepare, sign, network) seconds for recent fires
+        self.latencies = deque(maxlen=LATENCY_HISTORY)
+
+        # The mock exchange has no engine client and does not check signatures
+        self._engine_client = getattr(nado_client.context, "engine_client", None)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._refresh_expirations, name="nado-templates", daemon=True)
+        self._thread.start()
+        self._price_thread = threading.Thread(target=self._refresh_prices, name="nado-prices", daemon=True)
+        self._price_thread.start()
+
+    def prepare(self, product_id: int, amount: float):
+        """
+        Builds market buy/sell and reduce-only SL/TP templates for a product and trade size.
+
+        Args:
+            product_id (int): The ID of the product.
+            amount (float): The amount to trade and to close with SL/TP orders.
+        """
+        if product_id not in self.price_increments:
+            markets = get_scheduler().call(
+                "engine.query", self.nado_client.market.get_all_engine_markets,
+                priority=PRIORITY_MARKET_DATA, key=("engine_markets",)
+            )
+            for product in markets.spot_products + markets.perp_products:
+                self.price_increments[product.product_id] = int(product.book_info.price_increment_x18)
+
+        scaled_amount = to_x18(amount)
+        market_appendix = build_appendix(OrderType.FOK)
+        trigger_appendix = build_appendix(
+            OrderType.DEFAULT, reduce_only=True, trigger_type=OrderAppendixTriggerType.PRICE
+        )
+        templates = {
+            ("market", True): OrderTemplate(product_id, self.subaccount, scaled_amount, market_appendix, MARKET_ORDER_TTL),
+            ("market", False): OrderTemplate(product_id, self.subaccount, -scaled_amount, market_appendix, MARKET_ORDER_TTL),
+        }
+        for position_is_long in (True, False):
+            # Closing a long sells, closing a short buys
+            close_amount = -scaled_amount if position_is_long else scaled_amount
+            templates[("stop_loss", position_is_long)] = OrderTemplate(
+                product_id, self.subaccount, close_amount, trigger_appendix, TRIGGER_ORDER_TTL,
+                trigger_type="last_price_below" if position_is_long else "last_price_above",
+            )
+            templates[("take_profit", position_is_long)] = OrderTemplate(
+                product_id, self.subaccount, close_amount, trigger_appendix, TRIGGER_ORDER_TTL,
+                trigger_type="last_price_above" if position_is_long else "last_price_below",
+            )
+
+        with self._lock:
+            for (kind, side), template in templates.items():
+                self.templates[(product_id, kind, side)] = template
+
+    def _refresh_expirations(self):
+        while not self._stopped.wait(NONCE_REFRESH_SECONDS):
+            with self._lock:
+                for template in self.templates.values():
+                    template.refresh()
+
+    def _refresh_prices(self):
+        failing = set()
+        while not self._stopped.wait(PRICE_REFRESH_SECONDS):
+            with self._lock:
+                product_ids = {product_id for product_id, _, _ in self.templates}
+            for product_id in product_ids:
+                try:
+                    prices = get_scheduler().call(
+                        "engine.query", self.nado_client.perp.get_prices, product_id,
+                        priority=PRIORITY_MARKET_DATA, key=("perp_prices", product_id)
+                    )
+                    if prices:
+                        self.mark_prices[product_id] = (int(prices.update_time), int(prices.mark_price_x18) / (10**18))
+                    failing.discard(product_id)
+                except Exception as e:
+                    if product_id not in failing:
+                        print(f"An error occurred while refreshing the mark price of product {product_id}: {e}")
+                    failing.add(product_id)
+
+    def reference_price(self, product_id: int, fallback: float) -> float:
+        """
+        Returns the product's background mark price, or `fallback` if it is missing or older
+        than PRICE_MAX_AGE_SECONDS.
+        """
+        mark = self.mark_prices.get(product_id)
+        if mark is None or time.time() - mark[0] > PRICE_MAX_AGE_SECONDS or mark[1] <= 0:
+            self.price_misses += 1
+            return fallback
+        return mark[1]
+
+    def _sign(self, template: OrderTemplate, order: OrderParams):
+        if self._engine_client is None:
+            return None
+        return self._engine_client.sign(
+            NadoExecuteType.PLACE_ORDER,
+            order.dict(),
+            template.verifying_contract,
+            self._engine_client.chain_id,
+            self._engine_client.linked_signer,
+        )
+
+    def _submit(self, template: OrderTemplate, price_x18: int, build_params, submit_fn):
+        started = time.perf_counter()
+        order = template.build(price_x18, self.nonces.take())
+        prepared = time.perf_counter()
+        signature = self._sign(template, order)
+        signed = time.perf_counter()
+        result = get_scheduler().call(
+            "engine.execute", submit_fn, build_params(order, signature),
+            priority=PRIORITY_ORDER, retry_on=is_rate_limited
+        )
+        self.latencies.append((prepared - started, signed - prepared, time.perf_counter() - signed))
+        return result
+
+    def fire_market(self, product_id: int, is_buy: bool, reference_price: float):
+        """
+        Sends the prepared market order for a product and side.
+
+        Args:
+            product_id (int): The ID of the product.
+            is_buy (bool): True for a buy order, False for a sell order.
+            reference_price (float): Caller's latest price, used if the background mark price is stale.
+                                     The limit is the reference price plus slippage.
+        """
+        try:
+            template = self.templates[(product_id, "market", is_buy)]
+            reference_price = self.reference_price(product_id, reference_price)
+            limit_price = reference_price * (1 + self.slippage if is_buy else 1 - self.slippage)
+            price_x18 = round_x18(to_x18(limit_price), self.price_increments.get(product_id, 1))
+
+            order_result = self._submit(
+                template, price_x18,
+                lambda order, signature: PlaceOrderParams(
+                    product_id=product_id, order=order, signature=signature
+                ),
+                self.nado_client.market.place_order,
+            )
+            print(f"Market order placed successfully: {order_result}")
+            return order_result
+        except Exception as e:
+            print(f"An error occurred while placing market order: {e}")
+            return None
+
+    def fire_trigger(self, product_id: int, kind: str, position_is_long: bool, trigger_price: float):
+        """
+        Sends a prepared reduce-only stop-loss or take-profit order.
+
+        Args:
+            product_id (int): The ID of the product.
+            kind (str): "stop_loss" or "take_profit".
+            position_is_long (bool): True if the position being protected is long.
+            trigger_price (float): The price at which the order triggers.
+        """
+        try:
+            template = self.templates[(product_id, kind, position_is_long)]
+            requirement = TRIGGER_REQUIREMENTS[template.trigger_type]
+            trigger = PriceTrigger(price_trigger=PriceTriggerData(
+                price_requirement=requirement(**{template.trigger_type: str(to_x18(trigger_price))})
+            ))
+
+            # Limit price 0 makes the triggered order a market order, as in trade_execution
+            trigger_order_result = self._submit(
+                template, 0,
+                lambda order, signature: PlaceTriggerOrderParams(
+                    product_id=product_id, order=order, trigger=trigger, signature=signature
+                ),
+                self.nado_client.market.place_trigger_order,
+            )
+            print(f"{kind.replace('_', '-').capitalize()} order placed successfully: {trigger_order_result}")
+            return trigger_order_result
+        except Exception as e:
+            print(f"An error occurred while placing {kind.replace('_', '-')} order: {e}")
+            return None
+
+    def latency_summary(self) -> dict:
+        """
+        Returns mean and worst prepare, sign and network times in milliseconds over recent fires.
+        """
+        if not self.latencies:
+            return {}
+        summary = {'orders': len(self.latencies), 'nonce_misses': self.nonces.misses, 'price_misses': self.price_misses}
+        for i, phase in enumerate(('prepare', 'sign', 'network')):
+            values = [latency[i] * 1000 for latency in self.latencies]
+            summary[f'{phase}_ms_mean'] = sum(values) / len(values)
+            summary[f'{phase}_ms_max'] = max(values)
+        return summary
+
+    def stop(self):
+        self._stopped.set()
+        self.nonces.stop()
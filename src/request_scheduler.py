@@ -0,0 +1,243 @@
+import itertools
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+# Lower values are dispatched first
+PRIORITY_ORDER = 0        # Order placement and cancellation
+PRIORITY_ACCOUNT = 1      # Subaccount and health queries
+PRIORITY_MARKET_DATA = 2  # Prices and candlesticks
+
+# Per-endpoint token buckets: (requests per second, burst size)
+ENDPOINT_LIMITS = {
+    "engine.execute": (10.0, 10),
+    "engine.query": (20.0, 20),
+    "indexer": (10.0, 10),
+}
+DEFAULT_LIMIT = (10.0, 10)
+
+# Threads per endpoint. Each endpoint has its own pool, so a burst of queries or indexer
+# reads never holds up order execution. Account refreshes submit one engine query per
+# subaccount at once, so that pool is sized for a whole batch; throttled, the bucket
+# still bounds throughput.
+ENDPOINT_WORKERS = {
+    "engine.execute": 8,
+    "engine.query": 64,
+    "indexer": 8,
+}
+DEFAULT_WORKERS = 8
+MAX_RETRIES = 5
+BASE_RETRY_DELAY = 0.25  # seconds, doubled on every retry
+MAX_RETRY_DELAY = 8.0
+
+
+def is_rate_limited(exc: Exception) -> bool:
+    """True if the error says the request was throttled (and therefore not executed)."""
+    message = str(exc).lower()
+    return "429" in message or "rate limit" in message or "too many requests" in message
+
+
+def is_transient_error(exc: Exception) -> bool:
+    """True for throttling, timeouts and connection problems that are worth retrying."""
+    if is_rate_limited(exc) or isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    message = str(exc).lower()
+    return any(marker in message for marker in ("timeout", "timed out", "502", "503", "504", "temporarily"))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Args:
+        rate (float): Tokens added per second.
+        capacity (int): Maximum number of tokens (burst size).
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """
+        Takes a token if one is available.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the seconds until one will be available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+
+class _Job:
+    def __init__(self, endpoint, fn, args, kwargs, priority, key, retry_on, future):
+        self.endpoint = endpoint
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.key = key
+        self.retry_on = retry_on
+        self.future = future
+        self.attempt = 0
+
+
+class RequestScheduler:
+    """
+    Central scheduler for SDK requests.
+
+    Each endpoint has its own queue and threads, so a batch of queries never holds up orders.
+    Requests are dispatched by priority (orders before account queries before market data),
+    throttled by a token bucket per endpoint, retried with jittered exponential backoff,
+    and identical reads that are already in flight are merged into a single request.
+
+    Args:
+        limits (dict, optional): Endpoint -> (rate, burst). Defaults to ENDPOINT_LIMITS.
+        workers (dict, optional): Endpoint -> threads executing its requests. Defaults to
+                                  ENDPOINT_WORKERS, and DEFAULT_WORKERS for other endpoints.
+        max_retries (int): Retries before the last error is raised to the caller.
+        base_delay (float): First retry delay in seconds.
+        max_delay (float): Upper bound for retry delays in seconds.
+        throttle (bool): Apply the endpoint rate limits. Disable for offline replays.
+    """
+
+    def __init__(
+        self,
+        limits: dict = None,
+        workers: dict = None,
+        max_retries: int = MAX_RETRIES,
+        base_delay: float = BASE_RETRY_DELAY,
+        max_delay: float = MAX_RETRY_DELAY,
+        throttle: bool = True,
+    ):
+        self.throttle = throttle
+        self.limits = dict(ENDPOINT_LIMITS if limits is None else limits)
+        self.workers = dict(ENDPOINT_WORKERS if workers is None else workers)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._buckets = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._queues = {}
+        self._sequence = itertools.count()
+
+    def _bucket(self, endpoint: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(endpoint)
+            if bucket is None:
+                rate, capacity = self.limits.get(endpoint, DEFAULT_LIMIT)
+                bucket = self._buckets[endpoint] = TokenBucket(rate, capacity)
+            return bucket
+
+    def _queue(self, endpoint: str) -> queue.PriorityQueue:
+        """Returns an endpoint's queue, starting its threads on first use."""
+        with self._lock:
+            endpoint_queue = self._queues.get(endpoint)
+            if endpoint_queue is None:
+                endpoint_queue = self._queues[endpoint] = queue.PriorityQueue()
+                for i in range(self.workers.get(endpoint, DEFAULT_WORKERS)):
+                    threading.Thread(
+                        target=self._worker, args=(endpoint_queue,), name=f"nado-{endpoint}-{i}", daemon=True
+                    ).start()
+            return endpoint_queue
+
+    def submit(self, endpoint: str, fn, *args, priority: int = PRIORITY_MARKET_DATA,
+               key=None, retry_on=is_transient_error, **kwargs) -> Future:
+        """
+        Schedules fn(*args, **kwargs) against an endpoint's rate limit.
+
+        Args:
+            endpoint (str): Rate-limit bucket, e.g. "indexer" or "engine.execute".
+            fn (callable): The SDK call to make.
+            priority (int): One of the PRIORITY_* constants.
+            key (hashable, optional): Identifies a read; concurrent submissions with the same
+                                      key share one request. Never set it for orders.
+            retry_on (callable): Predicate deciding whether an exception is retried.
+
+        Returns:
+            Future: Resolves to the call's result or raises its last error.
+        """
+        if key is not None:
+            with self._lock:
+                inflight = self._inflight.get(key)
+                if inflight is not None:
+                    return inflight
+                future = self._inflight[key] = Future()
+        else:
+            future = Future()
+
+        self._enqueue(_Job(endpoint, fn, args, kwargs, priority, key, retry_on, future))
+        return future
+
+    def call(self, endpoint: str, fn, *args, **kwargs):
+        """Like submit, but blocks and returns the result (or raises the error)."""
+        return self.submit(endpoint, fn, *args, **kwargs).result()
+
+    def _enqueue(self, job: _Job, delay: float = 0.0):
+        if delay > 0:
+            timer = threading.Timer(delay, self._enqueue, args=(job,))
+            timer.daemon = True
+            timer.start()
+            return
+        self._queue(job.endpoint).put((job.priority, next(self._sequence), job))
+
+    def _finish(self, job: _Job, result=None, error: Exception = None):
+        if job.key is not None:
+            with self._lock:
+                self._inflight.pop(job.key, None)
+        if error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(result)
+
+    def _worker(self, endpoint_queue: queue.PriorityQueue):
+        while True:
+            _, _, job = endpoint_queue.get()
+
+            wait = self._bucket(job.endpoint).try_acquire() if self.throttle else 0.0
+            if wait > 0:
+                self._enqueue(job, wait)
+                continue
+
+            try:
+                result = job.fn(*job.args, **job.kwargs)
+            except Exception as e:
+                if job.attempt < self.max_retries and job.retry_on(e):
+                    delay = min(self.max_delay, self.base_delay * 2 ** job.attempt)
+                    job.attempt += 1
+                    self._enqueue(job, random.uniform(delay / 2, delay))
+                else:
+                    self._finish(job, error=e)
+                continue
+            self._finish(job, result=result)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def set_scheduler(scheduler: RequestScheduler):
+    """Replaces the process-wide request scheduler, e.g. with an unthrottled one for replays."""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
+
+def get_scheduler() -> RequestScheduler:
+    """Returns the process-wide request scheduler, creating it on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
@@ -0,0 +1,265 @@
+import threading
+from typing import NamedTuple
+
+import numpy as np
+
+from src.account_service import HEALTH, HEALTH_INITIAL, HEALTH_MAINTENANCE
+from src.request_scheduler import get_scheduler, PRIORITY_MARKET_DATA
+
+X18 = 10**18
+
+DEFAULT_MIN_INITIAL_HEALTH = 0.0         # The engine rejects orders that take initial health below 0
+DEFAULT_MIN_LIQUIDATION_DISTANCE = 0.10  # Reject risk-increasing orders closer than 10% to liquidation
+DEFAULT_TAKER_FEE = 0.0002
+
+
+class RiskCheck(NamedTuple):
+    """Result of RiskEngine.check_order. Healths and liquidation figures are after the trade."""
+    allowed: bool
+    reason: str
+    initial_health: float
+    maintenance_health: float
+    liquidation_price: float     # nan when the position is flat, 0 when a long cannot be liquidated
+    liquidation_distance: float  # Fraction of the mark price, inf when there is no liquidation price
+
+
+class RiskEngine:
+    """
+    Pre-trade and on-tick risk checks for one subaccount, computed locally from per-product arrays.
+
+    Health follows the engine's model for perps: each position contributes
+    amount * price * weight + v_quote_balance, with the long or short initial/maintenance weight
+    depending on its side, on top of the quote balance. sync() records the difference between
+    this and the healths the engine reports (spot assets, unsettled funding) as a constant offset,
+    so checks between syncs need no network round-trip.
+
+    Args:
+        max_position (dict, optional): product_id -> largest absolute position allowed.
+        min_initial_health (float): Smallest initial health a risk-increasing order may leave.
+        min_liquidation_distance (float): Smallest distance to the liquidation price, as a fraction
+                                          of the mark price, a risk-increasing order may leave.
+        taker_fee (float): Fee rate charged on orders, deducted from the quote side.
+    """
+
+    def __init__(
+        self,
+        max_position: dict = None,
+        min_initial_health: float = DEFAULT_MIN_INITIAL_HEALTH,
+        min_liquidation_distance: float = DEFAULT_MIN_LIQUIDATION_DISTANCE,
+        taker_fee: float = DEFAULT_TAKER_FEE,
+    ):
+        self.max_position = dict(max_position or {})
+        self.min_initial_health = min_initial_health
+        self.min_liquidation_distance = min_liquidation_distance
+        self.taker_fee = taker_fee
+
+        self.product_ids = np.zeros(0, dtype=np.int64)
+        self.price = np.zeros(0)
+        self.position = np.zeros(0)
+        self.v_quote = np.zeros(0)
+        self.position_limit = np.zeros(0)
+        # Columns: long weight, short weight
+        self.initial_weights = np.zeros((0, 2))
+        self.maintenance_weights = np.zeros((0, 2))
+        self.quote_balance = 0.0
+        self.health_offset = np.zeros(2)  # Engine-reported minus computed (initial, maintenance)
+
+        self._index = {}
+        self._lock = threading.Lock()
+        self._recompute()
+
+    # --- State ---
+
+    def load_markets(self, nado_client):
+        """
+        Loads perp products, their risk weights and prices from get_all_engine_markets.
+        """
+        markets = get_scheduler().call(
+            "engine.query", nado_client.market.get_all_engine_markets,
+            priority=PRIORITY_MARKET_DATA, key=("engine_markets",)
+        )
+        products = sorted(markets.perp_products, key=lambda product: int(product.product_id))
+
+        with self._lock:
+            self.product_ids = np.array([int(product.product_id) for product in products], dtype=np.int64)
+            self._index = {int(product_id): i for i, product_id in enumerate(self.product_ids)}
+            self.price = np.array([int(product.risk.price_x18) / X18 for product in products])
+            self.initial_weights = np.array([
+                (int(product.risk.long_weight_initial_x18) / X18, int(product.risk.short_weight_initial_x18) / X18)
+                for product in products
+            ]).reshape(-1, 2)
+            self.maintenance_weights = np.array([
+                (int(product.risk.long_weight_maintenance_x18) / X18, int(product.risk.short_weight_maintenance_x18) / X18)
+                for product in products
+            ]).reshape(-1, 2)
+            self.position = np.zeros(len(products))
+            self.v_quote = np.zeros(len(products))
+            self.position_limit = np.array([
+                self.max_position.get(int(product_id), np.inf) for product_id in self.product_ids
+            ])
+            self._recompute()
+
+    def sync(self, account_service, subaccount: str):
+        """
+        Copies a subaccount's positions and quote balance from an AccountService and reconciles
+        the computed healths with the ones the engine reported.
+        """
+        row = account_service.row(subaccount)
+        if row is None:
+            raise ValueError(f"Subaccount {subaccount} is not monitored by the account service.")
+
+        with self._lock:
+            self.quote_balance = float(account_service.quote_balance[row])
+            self.position[:] = 0.0
+            self.v_quote[:] = 0.0
+            for column, product_id in enumerate(account_service.product_ids):
+                i = self._index.get(int(product_id))
+                if i is not None:
+                    self.position[i] = account_service.perp_amount[row, column]
+                    self.v_quote[i] = account_service.perp_v_quote[row, column]
+
+            self.health_offset[:] = 0.0
+            self._recompute()
+            if account_service.exists[row]:
+                self.health_offset[0] = account_service.health[row, HEALTH_INITIAL, HEALTH] - self.initial_health
+                self.health_offset[1] = account_service.health[row, HEALTH_MAINTENANCE, HEALTH] - self.maintenance_health
+                self._recompute()
+
+    def apply_fill(self, product_id: int, amount: float, price: float):
+        """Updates the position after a fill, positive amount for buys."""
+        with self._lock:
+            i = self._index[product_id]
+            self.position[i] += amount
+            self.v_quote[i] -= amount * price + abs(amount) * price * self.taker_fee
+            self._recompute()
+
+    # --- Vectorized figures ---
+
+    def _contributions(self, weights: np.ndarray) -> np.ndarray:
+        side_weights = np.where(self.position >= 0, weights[:, 0], weights[:, 1])
+        return self.position * self.price * side_weights + self.v_quote
+
+    def _recompute(self):
+        self.initial_contribution = self._contributions(self.initial_weights)
+        self.maintenance_contribution = self._contributions(self.maintenance_weights)
+        self.initial_health = float(self.quote_balance + self.initial_contribution.sum() + self.health_offset[0])
+        self.maintenance_health = float(self.quote_balance + self.maintenance_contribution.sum() + self.health_offset[1])
+
+    def liquidation_prices(self) -> np.ndarray:
+        """
+        Price of each product at which maintenance health reaches 0, other prices unchanged.
+        nan for flat positions and 0 for longs that cannot be liquidated by this product alone.
+        """
+        side_weights = np.where(self.position >= 0, self.maintenance_weights[:, 0], self.maintenance_weights[:, 1])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            prices = self.price - self.maintenance_health / (self.position * side_weights)
+        prices[self.position == 0] = np.nan
+        return np.maximum(prices, 0.0)
+
+    def liquidation_distances(self) -> np.ndarray:
+        """
+        Distance from the mark price to the liquidation price as a fraction of the mark price.
+        inf for flat positions and for longs that cannot be liquidated.
+        """
+        prices = self.liquidation_prices()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            distances = np.abs(self.price - prices) / self.price
+        distances[np.isnan(prices) | (prices == 0)] = np.inf
+        return distances
+
+    # --- Checks ---
+
+    def check_order(self, product_id: int, amount: float, price: float = None) -> RiskCheck:
+        """
+        Computes health, position limit and liquidation distance after a hypothetical fill.
+
+        Only risk-increasing orders (growing or flipping a position) can be rejected;
+        orders that reduce a position are always allowed.
+
+        Args:
+            product_id (int): The ID of the product.
+            amount (float): Signed order size, positive to buy.
+            price (float, optional): Expected fill price. Defaults to the mark price.
+
+        Returns:
+            RiskCheck: Whether the order is allowed, why not, and the post-trade figures.
+        """
+        # sync and on_tick replace positions, prices and health totals from other threads
+        with self._lock:
+            i = self._index.get(product_id)
+            if i is None:
+                return RiskCheck(False, f"Unknown product {product_id}", np.nan, np.nan, np.nan, np.nan)
+
+            mark = self.price.item(i)
+            if not mark > 0 or not np.isfinite(mark):
+                # An empty or halted book has no mark to size health or liquidation distance against
+                return RiskCheck(False, f"No mark price for product {product_id}", np.nan, np.nan, np.nan, np.nan)
+            fill_price = mark if price is None else price
+            position = self.position.item(i)
+            new_position = position + amount
+            new_v_quote = self.v_quote.item(i) - amount * fill_price - abs(amount) * fill_price * self.taker_fee
+
+            # Only this product's contribution changes, so update the totals instead of re-summing
+            side = 0 if new_position >= 0 else 1
+            maintenance_weight = self.maintenance_weights.item(i, side)
+            initial_health = self.initial_health - self.initial_contribution.item(i) \
+                + new_position * mark * self.initial_weights.item(i, side) + new_v_quote
+            maintenance_health = self.maintenance_health - self.maintenance_contribution.item(i) \
+                + new_position * mark * maintenance_weight + new_v_quote
+
+            if new_position == 0:
+                liquidation_price, liquidation_distance = np.nan, np.inf
+            else:
+                liquidation_price = max(mark - maintenance_health / (new_position * maintenance_weight), 0.0)
+                liquidation_distance = abs(mark - liquidation_price) / mark if liquidation_price > 0 else np.inf
+
+            allowed, reason = True, ""
+            if abs(new_position) > abs(position) or position * new_position < 0:
+                if abs(new_position) > self.position_limit.item(i):
+                    allowed, reason = False, f"Position {new_position} exceeds the limit of {self.position_limit.item(i)}"
+                elif initial_health < self.min_initial_health:
+                    allowed, reason = False, f"Initial health would fall to {initial_health:.2f}"
+                elif liquidation_distance < self.min_liquidation_distance:
+                    allowed, reason = False, f"Liquidation price {liquidation_price:.2f} would be {liquidation_distance:.2%} away"
+
+            return RiskCheck(allowed, reason, initial_health, maintenance_health, liquidation_price, liquidation_distance)
+
+    def on_tick(self, product_id: int, price: float) -> list:
+        """
+        Updates a product's mark price and re-checks every open position.
+
+        Returns:
+            list: Product IDs of open positions below maintenance health or closer to
+                  liquidation than min_liquidation_distance.
+        """
+        with self._lock:
+            i = self._index.get(product_id)
+            if i is None:
+                return []
+            self.price[i] = price
+            self._recompute()
+            distances = self.liquidation_distances()
+            at_risk = (self.position != 0) & ((distances < self.min_liquidation_distance) | (self.maintenance_health < 0))
+        return [int(product_id) for product_id in self.product_ids[at_risk]]
+
+
+if __name__ == "__main__":
+    import timeit
+    from src.account_service import AccountService
+    from src.nado_client import get_nado_client
+
+    nado_client = get_nado_client()
+    service = AccountService(nado_client)
+    subaccount = service.list_subaccounts()[0]
+    service.refresh()
+
+    engine = RiskEngine()
+    engine.load_markets(nado_client)
+    engine.sync(service, subaccount)
+    print(f"Initial health: {engine.initial_health:.2f}, maintenance health: {engine.maintenance_health:.2f}")
+
+    product_id = int(engine.product_ids[0])
+    check = engine.check_order(product_id, 0.01)
+    print(f"Buying 0.01 of product {product_id}: {check}")
+    seconds = timeit.timeit(lambda: engine.check_order(product_id, 0.01), number=10000) / 10000
+    print(f"check_order: {seconds * 1e6:.1f} us")
@@ -1,36 +1,21 @@
-import pandas as pd
+import numpy as np
 from src.data_acquisition import get_historical_candlesticks
 
-def calculate_sma(data: pd.Series, window: int) -> pd.Series:
+# pandas is imported where DataFrames are built, so the live bot's NumPy signal path
+# (latest_crossover_signal) starts without loading it
+
+def calculate_sma(data: "pd.Series", window: int) -> "pd.Series":
     """
     Calculates the Simple Moving Average (SMA) for a given data series.
     """
     return data.rolling(window=window).mean()
 
-def moving_average_crossover_strategy(
-    product_id: int,
-    interval: str,
-    short_window: int,
-    long_window: int
-) -> pd.DataFrame:
+def candlesticks_to_dataframe(candlesticks) -> "pd.DataFrame":
     """
-    Implements a moving average crossover strategy.
-
-    Args:
-        product_id (int): The ID of the product (e.g., 1 for BTC).
-        interval (str): The candlestick interval (e.g., "1H", "4H", "1D").
-        short_window (int): The window size for the short-term SMA.
-        long_window (int): The window size for the long-term SMA.
-
-    Returns:
-        pd.DataFrame: A DataFrame with historical data, SMAs, and buy/sell signals.
+    Converts indexer candlesticks into a DataFrame indexed and sorted by timestamp.
     """
-    candlesticks = get_historical_candlesticks(product_id, interval)
-
-    if not candlesticks:
-        return pd.DataFrame()
+    import pandas as pd
 
-    # Convert to pandas DataFrame
     df = pd.DataFrame([
         {
             'timestamp': int(c.timestamp),
@@ -45,7 +30,24 @@ def moving_average_crossover_strategy(
     df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
     df.set_index('timestamp', inplace=True)
     df.sort_index(inplace=True) # Ensure data is sorted by time
+    return df
+
+def apply_moving_average_crossover(
+    df: "pd.DataFrame",
+    short_window: int,
+    long_window: int
+) -> "pd.DataFrame":
+    """
+    Adds SMAs and buy/sell signals to a DataFrame of bars with a 'close' column.
+
+    Args:
+        df (pd.DataFrame): Bars indexed by time, oldest first.
+        short_window (int): The window size for the short-term SMA.
+        long_window (int): The window size for the long-term SMA.
 
+    Returns:
+        pd.DataFrame: The same DataFrame with SMA_Short, SMA_Long, Signal and Position columns.
+    """
     # Calculate SMAs
     df['SMA_Short'] = calculate_sma(df['close'], short_window)
     df['SMA_Long'] = calculate_sma(df['close'], long_window)
@@ -60,6 +62,98 @@ def moving_average_crossover_strategy(
 
     return df
 
+def sma_crossover_positions(close: np.ndarray, short_window: int, long_window: int) -> np.ndarray:
+    """
+    NumPy equivalent of the Position column of apply_moving_average_crossover, for one price
+    series or many at once (e.g. resampled paths).
+
+    Args:
+        close (np.ndarray): Closing prices oldest first, shape (bars,) or (paths, bars).
+        short_window (int): The window size for the short-term SMA.
+        long_window (int): The window size for the long-term SMA.
+
+    Returns:
+        np.ndarray: Same shape as close; 1 for buy crossovers, -1 for sell crossovers, 0 otherwise.
+    """
+    paths = np.atleast_2d(np.asarray(close, dtype=float))
+    bars = paths.shape[1]
+    signal = np.zeros(paths.shape, dtype=np.int8)
+
+    # Both SMAs exist from bar max(windows) - 1 on; before that the pandas comparison is False.
+    # Window sums come from one cumulative sum with a leading zero column.
+    first = max(short_window, long_window)
+    if short_window > 0 and long_window > 0 and first <= bars:
+        cumulative = np.zeros((paths.shape[0], bars + 1))
+        np.cumsum(paths, axis=1, out=cumulative[:, 1:])
+        ends = cumulative[:, first:]
+        short_sma = np.subtract(ends, cumulative[:, first - short_window:bars + 1 - short_window])
+        short_sma /= short_window
+        long_sma = np.subtract(ends, cumulative[:, first - long_window:bars + 1 - long_window])
+        long_sma /= long_window
+        np.greater(short_sma, long_sma, out=signal[:, first - 1:], casting="unsafe")
+        signal[:, :short_window] = 0
+
+    positions = np.diff(signal, axis=1, prepend=signal[:, :1])
+    return positions.reshape(np.shape(close))
+
+def crossover_lookback(short_window: int, long_window: int) -> int:
+    """
+    Number of bars the crossover Position of the latest bar depends on: both SMAs of the last
+    two bars, neither of which may fall in the first short_window bars.
+    """
+    return max(short_window + 2, long_window + 1)
+
+def latest_crossover_signal(candlesticks, short_window: int, long_window: int):
+    """
+    The Position and close of the last row of moving_average_crossover_strategy, computed from
+    only the latest crossover_lookback candles instead of a DataFrame of all of them.
+
+    Args:
+        candlesticks (list): Indexer candlesticks, in any order.
+        short_window (int): The window size for the short-term SMA.
+        long_window (int): The window size for the long-term SMA.
+
+    Returns:
+        tuple: (position, close), position 1 for buy, -1 for sell, 0 for no change;
+               None if there are no candlesticks.
+    """
+    if not candlesticks:
+        return None
+    latest = sorted(candlesticks, key=lambda c: int(c.timestamp))[-crossover_lookback(short_window, long_window):]
+    close = np.array([int(c.close_x18) / (10**18) for c in latest])
+    return int(sma_crossover_positions(close, short_window, long_window)[-1]), float(close[-1])
+
+def crossover_strategy_name(short_window: int, long_window: int) -> str:
+    """Name the crossover strategy is recorded under in the trade journal, e.g. "sma_10_30"."""
+    return f"sma_{short_window}_{long_window}"
+
+def moving_average_crossover_strategy(
+    product_id: int,
+    interval: str,
+    short_window: int,
+    long_window: int
+) -> "pd.DataFrame":
+    """
+    Implements a moving average crossover strategy.
+
+    Args:
+        product_id (int): The ID of the product (e.g., 1 for BTC).
+        interval (str): The candlestick interval (e.g., "1H", "4H", "1D").
+        short_window (int): The window size for the short-term SMA.
+        long_window (int): The window size for the long-term SMA.
+
+    Returns:
+        pd.DataFrame: A DataFrame with historical data, SMAs, and buy/sell signals.
+    """
+    candlesticks = get_historical_candlesticks(product_id, interval)
+
+    if not candlesticks:
+        import pandas as pd
+        return pd.DataFrame()
+
+    df = candlesticks_to_dataframe(candlesticks)
+    return apply_moving_average_crossover(df, short_window, long_window)
+
 if __name__ == "__main__":
     product_id_btc = 2
     interval_1h = "1H"
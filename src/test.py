@@ -1,5 +1,4 @@
-from src.nado_client import get_nado_client, NadoClientMode
-from nado_protocol.client import NadoClientMode
+from src.nado_client import get_nado_client
 import os
 
 PRODUCT_ID = 2
@@ -1,9 +1,10 @@
-from src.nado_client import get_nado_client, NadoClientMode
+from src.nado_client import get_nado_client
 from nado_protocol.engine_client.types.execute import PlaceMarketOrderParams
+from nado_protocol.utils.execute import MarketOrderParams
 from nado_protocol.utils.math import to_x18
 from nado_protocol.utils.expiration import get_expiration_timestamp
-from nado_protocol.client import NadoClientMode
 from src.account_summary import get_account_summary
+from src.request_scheduler import get_scheduler, is_rate_limited, PRIORITY_ORDER
 
 def place_market_order_for_product(
     product_id: int,
@@ -25,14 +26,20 @@ def place_market_order_for_product(
 
         scaled_amount = to_x18(amount)
 
+        # Market order amounts are signed: positive buys, negative sells
         params = PlaceMarketOrderParams(
             product_id=product_id,
-            subaccount=subaccount,
-            is_buy=is_buy,
-            amount=scaled_amount,
+            market_order=MarketOrderParams(
+                sender=subaccount,
+                amount=scaled_amount if is_buy else -scaled_amount,
+            ),
         )
 
-        order_result = nado_client.market.place_market_order(params)
+        # Orders are only retried when throttled, so a fill is never submitted twice
+        order_result = get_scheduler().call(
+            "engine.execute", nado_client.market.place_market_order, params,
+            priority=PRIORITY_ORDER, retry_on=is_rate_limited
+        )
         print(f"Market order placed successfully: {order_result}")
         return order_result
     except Exception as e:
@@ -74,7 +81,9 @@ def place_stop_loss_order(
         # Amount to close should be negative for sell orders, positive for buy orders.
         order_amount_x18 = -scaled_amount if position_is_long else scaled_amount
 
-        trigger_order_result = nado_client.market.place_price_trigger_order(
+        trigger_order_result = get_scheduler().call(
+            "engine.execute", nado_client.market.place_price_trigger_order,
+            priority=PRIORITY_ORDER, retry_on=is_rate_limited,
             product_id=product_id,
             sender=subaccount,
             price_x18=str(scaled_limit_price), # Limit price for the order once triggered
@@ -125,7 +134,9 @@ def place_take_profit_order(
         # Amount to close should be negative for sell orders, positive for buy orders.
         order_amount_x18 = -scaled_amount if position_is_long else scaled_amount
 
-        trigger_order_result = nado_client.market.place_price_trigger_order(
+        trigger_order_result = get_scheduler().call(
+            "engine.execute", nado_client.market.place_price_trigger_order,
+            priority=PRIORITY_ORDER, retry_on=is_rate_limited,
             product_id=product_id,
             sender=subaccount,
             price_x18=str(scaled_limit_price), # Limit price for the order once triggered
@@ -0,0 +1,517 @@
+import os
+import time
+import uuid
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from src.request_scheduler import get_scheduler, PRIORITY_ACCOUNT
+
+X18 = 10**18
+
+JOURNAL_DIR = "journal"
+FLUSH_ROWS = 10000  # Buffered fills written per part file
+FLUSH_SECONDS = 300.0     # Longest a live fill stays buffered
+COMPACT_SECONDS = 3600.0  # How often a live session merges its small part files
+
+SOURCE_LIVE = "live"
+SOURCE_BACKTEST = "backtest"
+
+BUY = 1
+SELL = -1
+
+TRIGGER_KINDS = ("stop_loss", "take_profit")  # Orders that only exist while a position is open
+
+# One row per fill, shared by the live bot and the backtester
+SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("ms", tz="UTC")),  # Fill time (bar time in backtests)
+    ("source", pa.string()),                      # SOURCE_LIVE or SOURCE_BACKTEST
+    ("run_id", pa.string()),                      # Bot session or backtest run
+    ("strategy", pa.string()),                    # e.g. "sma_10_30"
+    ("product_id", pa.int32()),
+    ("side", pa.int8()),                          # BUY or SELL
+    ("kind", pa.string()),                        # market, stop_loss, take_profit or final
+    ("amount", pa.float64()),                     # Filled base amount, always positive
+    ("signal_price", pa.float64()),               # Price the strategy acted on
+    ("price", pa.float64()),                      # Average fill price
+    ("fee", pa.float64()),
+    ("realized_pnl", pa.float64()),               # Gross PnL of closing fills, null for opening fills
+    ("order_id", pa.string()),                    # Order digest, null in backtests
+])
+
+# Few distinct values each: reading them dictionary-encoded avoids materializing millions of strings
+DICTIONARY_COLUMNS = ("source", "run_id", "strategy", "kind")
+_READ_SCHEMA = pa.schema([
+    pa.field(field.name, pa.dictionary(pa.int32(), field.type)) if field.name in DICTIONARY_COLUMNS else field
+    for field in SCHEMA
+])
+
+# Periods accepted by the query API in place of a column name
+PERIODS = {"hour": "hour", "day": "day", "week": "week", "month": "month"}
+
+
+def new_run_id(source: str) -> str:
+    """Returns a unique, time-sortable ID for a bot session or backtest run."""
+    return f"{source}-{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:6]}"
+
+
+class TradeJournal:
+    """
+    Append-only fill journal stored as a directory of Parquet part files.
+
+    record() buffers fills in memory and flush() writes them as a new part file, so existing
+    files are never modified and the bot, backtests and readers can share one directory.
+    Queries scan only the columns they need, push product/source/strategy/time filters down
+    to the files and aggregate with Arrow's grouped kernels.
+
+    Args:
+        path (str): Journal directory, created on the first flush.
+        flush_rows (int): Number of buffered fills that triggers a flush.
+    """
+
+    def __init__(self, path: str = JOURNAL_DIR, flush_rows: int = FLUSH_ROWS):
+        self.path = path
+        self.flush_rows = flush_rows
+        self._buffer = {name: [] for name in SCHEMA.names}
+
+    # --- Writing ---
+
+    def record(
+        self,
+        timestamp,
+        source: str,
+        run_id: str,
+        strategy: str,
+        product_id: int,
+        side: int,
+        amount: float,
+        signal_price: float,
+        price: float,
+        fee: float = 0.0,
+        realized_pnl: float = None,
+        kind: str = "market",
+        order_id: str = None,
+    ):
+        """
+        Buffers one fill. timestamp is a datetime or seconds since the epoch.
+        """
+        if isinstance(timestamp, (int, float)):
+            timestamp = int(timestamp * 1000)
+        row = {
+            "timestamp": timestamp, "source": source, "run_id": run_id, "strategy": strategy,
+            "product_id": product_id, "side": side, "kind": kind, "amount": abs(amount),
+            "signal_price": signal_price, "price": price, "fee": fee,
+            "realized_pnl": realized_pnl, "order_id": order_id,
+        }
+        for name, value in row.items():
+            self._buffer[name].append(value)
+        if len(self._buffer["timestamp"]) >= self.flush_rows:
+            self.flush()
+
+    def record_backtest(self, results: dict, product_id: int, strategy: str, run_id: str = None) -> str:
+        """
+        Journals the trades of a simulate_trades/run_backtest result and flushes them.
+
+        Returns:
+            str: The run ID the trades were recorded under.
+        """
+        return self.record_backtests([(results, product_id, strategy)], run_id)
+
+    def record_backtests(self, backtests: list, run_id: str = None) -> str:
+        """
+        Journals several backtests, e.g. of a parameter sweep, under one run ID in one part file.
+
+        Args:
+            backtests (list): (results, product_id, strategy) tuples.
+            run_id (str, optional): Defaults to a new backtest run ID.
+
+        Returns:
+            str: The run ID the trades were recorded under.
+        """
+        run_id = run_id or new_run_id(SOURCE_BACKTEST)
+        columns = {name: [] for name in SCHEMA.names}
+        for results, product_id, strategy in backtests:
+            for trade in results.get('trades', []):
+                columns["timestamp"].append(trade['date'])
+                columns["source"].append(SOURCE_BACKTEST)
+                columns["run_id"].append(run_id)
+                columns["strategy"].append(strategy)
+                columns["product_id"].append(product_id)
+                columns["side"].append(BUY if trade['type'].startswith(('BUY', 'COVER')) else SELL)
+                columns["kind"].append("final" if trade['type'].endswith('_FINAL') else "market")
+                columns["amount"].append(trade['shares'])
+                columns["signal_price"].append(trade.get('signal_price'))
+                columns["price"].append(trade['price'])
+                columns["fee"].append(trade.get('fee', 0.0))
+                columns["realized_pnl"].append(trade.get('pnl'))
+                columns["order_id"].append(None)
+        self.write_table(pa.table(columns, schema=SCHEMA))
+        return run_id
+
+    def write_table(self, table: pa.Table):
+        """Writes a table of fills with the journal schema as a new part file."""
+        if table.num_rows == 0:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        name = f"part-{time.time_ns()}-{os.getpid()}-{uuid.uuid4().hex[:6]}.parquet"
+        # Write under a hidden name first so readers never see a partial file
+        temporary_path = os.path.join(self.path, "." + name)
+        pq.write_table(table.cast(SCHEMA), temporary_path)
+        os.replace(temporary_path, os.path.join(self.path, name))
+
+    def flush(self):
+        """Writes the buffered fills as a new part file."""
+        if not self._buffer["timestamp"]:
+            return
+        table = pa.table(self._buffer, schema=SCHEMA)
+        self._buffer = {name: [] for name in SCHEMA.names}
+        self.write_table(table)
+
+    @property
+    def buffered(self) -> int:
+        """Number of fills recorded but not flushed yet."""
+        return len(self._buffer["timestamp"])
+
+    def compact(self, min_rows: int = None):
+        """
+        Rewrites part files as one, e.g. after a long live session of small flushes.
+
+        Args:
+            min_rows (int, optional): Only merge part files with fewer fills than this,
+                                      so large backtest files are not rewritten. Defaults to all.
+        """
+        self.flush()
+        paths = [
+            path for path in self._part_paths()
+            if min_rows is None or pq.ParquetFile(path).metadata.num_rows < min_rows
+        ]
+        if len(paths) < 2:
+            return
+        # Only the listed files are merged and removed; parts written meanwhile are kept as they are
+        self.write_table(pa.concat_tables([pq.read_table(path) for path in paths]))
+        for path in paths:
+            os.remove(path)
+
+    # --- Reading ---
+
+    def _part_paths(self) -> list:
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(
+            os.path.join(self.path, name) for name in os.listdir(self.path)
+            if name.startswith("part-") and name.endswith(".parquet")
+        )
+
+    def read(
+        self,
+        columns: list = None,
+        product_id=None,
+        source: str = None,
+        strategy: str = None,
+        run_id: str = None,
+        start=None,
+        end=None,
+    ) -> pa.Table:
+        """
+        Reads fills as an Arrow table, including ones still buffered. The string columns in
+        DICTIONARY_COLUMNS are dictionary-encoded.
+
+        Args:
+            columns (list, optional): Columns to read. Defaults to all.
+            product_id (int or list, optional): Only these products.
+            source (str, optional): Only SOURCE_LIVE or SOURCE_BACKTEST fills.
+            strategy (str, optional): Only this strategy.
+            run_id (str, optional): Only this run.
+            start, end (datetime or str, optional): Time range, start inclusive, end exclusive.
+        """
+        # pyarrow.dataset loads pandas, which the live bot only needs for queries
+        import pyarrow.dataset as ds
+
+        filters = []
+        if product_id is not None:
+            product_ids = product_id if isinstance(product_id, (list, tuple)) else [product_id]
+            filters.append(ds.field("product_id").isin(product_ids))
+        for name, value in (("source", source), ("strategy", strategy), ("run_id", run_id)):
+            if value is not None:
+                filters.append(ds.field(name) == value)
+        if start is not None:
+            filters.append(ds.field("timestamp") >= pa.scalar(_to_timestamp(start), SCHEMA.field("timestamp").type))
+        if end is not None:
+            filters.append(ds.field("timestamp") < pa.scalar(_to_timestamp(end), SCHEMA.field("timestamp").type))
+        expression = None
+        for condition in filters:
+            expression = condition if expression is None else expression & condition
+
+        tables = []
+        paths = self._part_paths()
+        if paths:
+            read_format = ds.ParquetFileFormat(
+                read_options=ds.ParquetReadOptions(dictionary_columns=list(DICTIONARY_COLUMNS))
+            )
+            dataset = ds.dataset(paths, schema=_READ_SCHEMA, format=read_format)
+            tables.append(dataset.to_table(columns=columns, filter=expression))
+        if self._buffer["timestamp"]:
+            buffered = pa.table(self._buffer, schema=SCHEMA).cast(_READ_SCHEMA)
+            if expression is not None:
+                buffered = buffered.filter(expression)
+            tables.append(buffered.select(columns) if columns else buffered)
+        if not tables:
+            empty = _READ_SCHEMA.empty_table()
+            return empty.select(columns) if columns else empty
+        return pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+
+    def _grouped(self, by, columns: list, filters: dict):
+        """Reads the columns a query needs plus its group keys, adding period keys from timestamps."""
+        keys = [by] if isinstance(by, str) else list(by)
+        period_keys = [key for key in keys if key in PERIODS]
+        needed = sorted(set(columns) | {key for key in keys if key not in PERIODS}
+                        | ({"timestamp"} if period_keys else set()))
+        # Each part file has its own dictionaries; grouping needs them unified
+        table = self.read(columns=needed, **filters).unify_dictionaries()
+        if period_keys:
+            # Flooring UTC wall times without the time zone is an order of magnitude faster
+            timestamps = table["timestamp"].cast(pa.timestamp("ms"))
+            for key in period_keys:
+                period = pc.floor_temporal(timestamps, unit=PERIODS[key]).cast(SCHEMA.field("timestamp").type)
+                table = table.append_column(key, period)
+        return table, keys
+
+    def pnl(self, by="product_id", **filters):
+        """
+        Realized PnL, fees and volume per group.
+
+        Args:
+            by (str or list): Columns to group by (e.g. "product_id", "strategy", "source",
+                              "run_id") and/or a period: "hour", "day", "week" or "month".
+            **filters: Passed to read().
+
+        Returns:
+            pd.DataFrame: fills, volume (quote), realized_pnl (gross), fees and net_pnl per group.
+        """
+        table, keys = self._grouped(by, ["amount", "price", "fee", "realized_pnl"], filters)
+        table = table.append_column("volume", pc.multiply(table["amount"], table["price"]))
+        result = table.group_by(keys).aggregate([
+            ("amount", "count"), ("volume", "sum"), ("realized_pnl", "sum"), ("fee", "sum"),
+        ]).rename_columns(keys + ["fills", "volume", "realized_pnl", "fees"])
+        realized_pnl = pc.coalesce(result["realized_pnl"], 0.0)  # Groups without closing fills
+        result = result.set_column(result.schema.get_field_index("realized_pnl"), "realized_pnl", realized_pnl)
+        result = result.append_column("net_pnl", pc.subtract(realized_pnl, result["fees"]))
+        return _to_dataframe(result, keys)
+
+    def slippage(self, by="product_id", **filters):
+        """
+        Slippage of fill prices against signal prices per group, positive when the fill was worse.
+
+        Args:
+            by (str or list): Grouping, as for pnl().
+            **filters: Passed to read().
+
+        Returns:
+            pd.DataFrame: fills, mean_bps, std_bps, max_bps and cost (quote) per group.
+        """
+        table, keys = self._grouped(by, ["side", "amount", "signal_price", "price"], filters)
+        table = table.filter(pc.and_(pc.is_valid(table["signal_price"]), pc.is_valid(table["price"])))
+        difference = pc.multiply(pc.subtract(table["price"], table["signal_price"]), pc.cast(table["side"], pa.float64()))
+        table = table.append_column("bps", pc.multiply(pc.divide(difference, table["signal_price"]), 10000.0))
+        table = table.append_column("cost", pc.multiply(difference, table["amount"]))
+        result = table.group_by(keys).aggregate([
+            ("bps", "count"), ("bps", "mean"), ("bps", "stddev"), ("bps", "max"), ("cost", "sum"),
+        ]).rename_columns(keys + ["fills", "mean_bps", "std_bps", "max_bps", "cost"])
+        return _to_dataframe(result, keys)
+
+    def hit_rate(self, by="strategy", **filters):
+        """
+        Share of closing fills with a positive realized PnL (before fees) per group.
+
+        Args:
+            by (str or list): Grouping, as for pnl().
+            **filters: Passed to read().
+
+        Returns:
+            pd.DataFrame: trades, wins, hit_rate, avg_win and avg_loss per group.
+        """
+        table, keys = self._grouped(by, ["realized_pnl"], filters)
+        table = table.filter(pc.is_valid(table["realized_pnl"]))
+        wins = pc.greater(table["realized_pnl"], 0.0)
+        table = table.append_column("win", pc.cast(wins, pa.int64()))
+        table = table.append_column("win_pnl", pc.if_else(wins, table["realized_pnl"], None))
+        table = table.append_column("loss_pnl", pc.if_else(wins, None, table["realized_pnl"]))
+        result = table.group_by(keys).aggregate([
+            ("realized_pnl", "count"), ("win", "sum"), ("win_pnl", "mean"), ("loss_pnl", "mean"),
+        ]).rename_columns(keys + ["trades", "wins", "avg_win", "avg_loss"])
+        result = result.append_column(
+            "hit_rate", pc.divide(pc.cast(result["wins"], pa.float64()), pc.cast(result["trades"], pa.float64()))
+        )
+        columns = keys + ["trades", "wins", "hit_rate", "avg_win", "avg_loss"]
+        return _to_dataframe(result.select(columns), keys)
+
+
+def _to_dataframe(result: pa.Table, keys: list):
+    """Sorts aggregated results by their group keys and converts them, with plain string keys."""
+    for i, field in enumerate(result.schema):
+        if pa.types.is_dictionary(field.type):
+            result = result.set_column(i, field.name, result[field.name].cast(field.type.value_type))
+    return result.sort_by([(key, "ascending") for key in keys]).to_pandas()
+
+
+def _to_timestamp(value):
+    import pandas as pd
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize("UTC") if timestamp.tzinfo is None else timestamp
+
+
+class FillTracker:
+    """
+    Journals the fills of a live bot's orders.
+
+    Order responses only carry a digest, so orders are tracked and resolve() looks their fills
+    up on the indexer, on a later cycle if the indexer has not caught up yet. Realized PnL is
+    computed against the average entry price of the tracked position, which sync() seeds from
+    the account after a restart.
+
+    Fills are buffered and written every flush_seconds (or once the journal's flush_rows are
+    buffered), and the journal's small part files are merged every compact_seconds; close()
+    writes and merges the rest at shutdown.
+
+    Args:
+        journal (TradeJournal): Journal to write to.
+        nado_client: The Nado client (or MockNadoClient).
+        strategy (str): Strategy name recorded with every fill.
+        run_id (str, optional): Defaults to a new live run ID.
+        flush_seconds (float): Longest a fill stays buffered.
+        compact_seconds (float): How often small part files are merged.
+    """
+
+    def __init__(self, journal: TradeJournal, nado_client, strategy: str, run_id: str = None,
+                 flush_seconds: float = FLUSH_SECONDS, compact_seconds: float = COMPACT_SECONDS):
+        self.journal = journal
+        self.nado_client = nado_client
+        self.strategy = strategy
+        self.run_id = run_id or new_run_id(SOURCE_LIVE)
+        self.flush_seconds = flush_seconds
+        self.compact_seconds = compact_seconds
+        self.pending = {}    # digest -> (product_id, signal_price, kind)
+        self.positions = {}  # product_id -> [amount x18, average entry price]
+        self._last_flush = self._last_compact = time.monotonic()
+
+    def sync(self, account_service, subaccount: str):
+        """
+        Starts from a subaccount's open perp positions, e.g. after a restart, with the entry
+        price implied by their v_quote_balance. Uses the raw summary of an AccountService.
+        """
+        summary = account_service.summaries.get(subaccount)
+        self.positions = {}
+        for balance in (summary.perp_balances or []) if summary is not None else []:
+            amount = int(balance.balance.amount)
+            if amount != 0:
+                self.positions[int(balance.product_id)] = [amount, -int(balance.balance.v_quote_balance) / amount]
+
+    def track(self, order_result, product_id: int, signal_price: float, kind: str = "market"):
+        """Tracks an order placed from an order response (anything with data.digest)."""
+        digest = getattr(getattr(order_result, "data", None), "digest", None)
+        if digest:
+            self.pending[digest] = (product_id, signal_price, kind)
+
+    def forget(self, kind: str):
+        """Stops tracking unfilled orders of a kind, e.g. triggers of a closed position."""
+        self.pending = {digest: order for digest, order in self.pending.items() if order[2] != kind}
+
+    def resolve(self, now: float = None) -> int:
+        """
+        Journals the tracked orders that have filled and flushes them.
+
+        Once a position is flat again, its stop-loss and take-profit orders stop being tracked.
+
+        Args:
+            now (float, optional): Time recorded for fills the indexer reports without a
+                                   timestamp, in seconds since the epoch. Defaults to the current time.
+
+        Returns:
+            int: Number of fills journaled.
+        """
+        if not self.pending:
+            self._flush_due()
+            return 0
+        response = get_scheduler().call(
+            "indexer", self.nado_client.market.get_historical_orders_by_digest,
+            list(self.pending),
+            priority=PRIORITY_ACCOUNT
+        )
+
+        filled = 0
+        try:
+            for order in (response.orders if response else None) or []:
+                tracked = self.pending.get(order.digest)
+                base_filled = int(order.base_filled)
+                if tracked is None or base_filled == 0:
+                    continue
+                product_id, signal_price, kind = tracked
+                price = abs(int(order.quote_filled) / base_filled)
+                if order.timestamp is not None:
+                    timestamp = int(order.timestamp)
+                else:
+                    timestamp = time.time() if now is None else now
+                self.journal.record(
+                    timestamp, SOURCE_LIVE, self.run_id, self.strategy, product_id,
+                    BUY if base_filled > 0 else SELL, abs(base_filled) / X18, signal_price, price,
+                    fee=int(order.fee) / X18, realized_pnl=self._apply(product_id, base_filled, price),
+                    kind=kind, order_id=order.digest,
+                )
+                del self.pending[order.digest]
+                filled += 1
+                if self.positions[product_id][0] == 0:
+                    self.pending = {
+                        digest: tracked for digest, tracked in self.pending.items()
+                        if tracked[0] != product_id or tracked[2] not in TRIGGER_KINDS
+                    }
+        finally:
+            # Rows buffered before a failure are no longer pending, so they must still be written
+            self._flush_due()
+        return filled
+
+    def _flush_due(self):
+        now = time.monotonic()
+        if self.journal.buffered and now - self._last_flush >= self.flush_seconds:
+            self.journal.flush()
+            self._last_flush = now
+        if now - self._last_compact >= self.compact_seconds:
+            self.journal.compact(min_rows=self.journal.flush_rows)
+            self._last_compact = now
+
+    def close(self):
+        """Writes the buffered fills and merges the journal's small part files, at shutdown."""
+        self.journal.compact(min_rows=self.journal.flush_rows)
+
+    def _apply(self, product_id: int, amount: int, price: float) -> float:
+        """
+        Updates the tracked position with a fill of `amount` x18 and returns the realized PnL
+        of the closed part, if any. Amounts stay integers so a closed position is exactly 0.
+        """
+        position, entry_price = self.positions.get(product_id, (0, 0.0))
+        if position == 0 or (position > 0) == (amount > 0):
+            total = position + amount
+            self.positions[product_id] = [total, (position * entry_price + amount * price) / total]
+            return None
+        closed = min(abs(amount), abs(position)) / X18
+        realized_pnl = closed * (price - entry_price) * (1 if position > 0 else -1)
+        remaining = position + amount
+        if remaining == 0 or (remaining > 0) == (position > 0):
+            self.positions[product_id] = [remaining, entry_price]
+        else:
+            self.positions[product_id] = [remaining, price]  # Flipped: the rest opened at this price
+        return realized_pnl
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize the trade journal.")
+    parser.add_argument("path", nargs="?", default=JOURNAL_DIR)
+    parser.add_argument("--by", default="strategy")
+    args = parser.parse_args()
+
+    journal = TradeJournal(args.path)
+    print(journal.pnl(by=args.by).to_string(index=False))
+    print(journal.slippage(by=args.by).to_string(index=False))
+    print(journal.hit_rate(by=args.by).to_string(index=False))
@@ -0,0 +1,57 @@
+import math
+import os
+import sys
+
+import pytest
+
+# The modules import each other as src.*, so the tests run from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.mock_exchange import MockNadoClient
+from src.nado_client import set_nado_client
+from src.request_scheduler import RequestScheduler, set_scheduler
+
+PRODUCT_ID = 2
+HOUR = 3600
+START = 1_699_999_200  # A whole hour, so bars line up with the interval
+
+
+def make_candles(count: int = 300, start: int = START, seconds: int = HOUR, base: float = 30000.0) -> list:
+    """Deterministic hourly candles: a slow trend with a few swings, so SMA crossovers occur."""
+    candles = []
+    previous = base
+    for i in range(count):
+        close = base * (1 + 0.05 * math.sin(i / 12) + 0.0005 * i)
+        candles.append({
+            "timestamp": start + i * seconds,
+            "open": previous,
+            "high": max(previous, close) * 1.002,
+            "low": min(previous, close) * 0.998,
+            "close": close,
+            "volume": 10.0 + i % 7,
+        })
+        previous = close
+    return candles
+
+
+@pytest.fixture
+def candles():
+    return make_candles()
+
+
+@pytest.fixture
+def scheduler():
+    """An unthrottled process-wide scheduler, as in offline replays."""
+    scheduler = RequestScheduler(throttle=False, base_delay=0.001, max_delay=0.01)
+    set_scheduler(scheduler)
+    yield scheduler
+    set_scheduler(None)
+
+
+@pytest.fixture
+def mock_client(candles, scheduler):
+    """A MockNadoClient over the synthetic candles, installed as the process-wide client."""
+    client = MockNadoClient({PRODUCT_ID: {"1H": candles}})
+    set_nado_client(client)
+    yield client
+    set_nado_client(None)
@@ -0,0 +1,99 @@
+import pytest
+
+from src.account_service import ASSETS, HEALTH, HEALTH_INITIAL, HEALTH_UNWEIGHTED, LIABILITIES, AccountService
+from src.mock_exchange import MockNadoClient
+
+PRODUCT_ID = 2
+
+
+@pytest.fixture
+def client(candles, scheduler):
+    return MockNadoClient({PRODUCT_ID: {"1H": candles}}, subaccount_names=["default", "hedge", "idle"])
+
+
+@pytest.fixture
+def service(client):
+    return AccountService(client)
+
+
+def test_subaccounts_are_listed_once(service, client):
+    subaccounts = service.list_subaccounts()
+    assert subaccounts == list(client._subaccounts)
+    client._subaccounts.clear()
+    assert service.list_subaccounts() == subaccounts
+
+
+def test_refresh_decodes_healths_and_balances(service, client):
+    default, hedge, _ = service.list_subaccounts()
+    client._subaccounts[hedge].positions[PRODUCT_ID] = [-0.5, 16000.0]
+    client._subaccounts[hedge].quote_balance = 100.0
+    price = client.price(PRODUCT_ID)
+
+    assert service.refresh() == service.subaccounts
+    assert service.exists.all()
+    row = service.row(hedge)
+    assert service.quote_balance[row] == pytest.approx(100.0)
+    assert service.position(hedge, PRODUCT_ID) == pytest.approx((-0.5, 16000.0))
+    assert service.position(default, PRODUCT_ID) == (0.0, 0.0)
+    assert service.health[row, HEALTH_UNWEIGHTED, HEALTH] == pytest.approx(100.0 + 16000.0 - 0.5 * price)
+    assert service.health[row, HEALTH_INITIAL, LIABILITIES] == pytest.approx(0.5 * price * 1.1 - 16000.0)
+    assert service.health[service.row(default), HEALTH_INITIAL, ASSETS] == pytest.approx(10000.0)
+
+
+def test_unchanged_summaries_are_not_decoded_again(service, client):
+    default, hedge, _ = service.list_subaccounts()
+    service.refresh()
+    assert service.refresh(service.subaccounts) == []
+
+    client._subaccounts[default].quote_balance = 5.0
+    assert service.refresh(service.subaccounts) == [default]
+
+
+def test_only_open_touched_and_new_accounts_are_due(service, client):
+    default, hedge, idle = service.list_subaccounts()
+    client._subaccounts[hedge].positions[PRODUCT_ID] = [1.0, -30000.0]
+    assert service._due() == [default, hedge, idle]  # First refresh is a full one
+    service.refresh()
+
+    assert service._due() == [hedge]
+    service.touch(idle)
+    assert service._due() == [hedge, idle]
+    service.refresh()
+    assert service._due() == [hedge]
+
+    service.full_refresh_seconds = 0.0
+    assert service._due() == [default, hedge, idle]
+
+
+def test_failed_fetches_are_skipped(service, client, capsys):
+    default, hedge, _ = service.list_subaccounts()
+    fetch = client.subaccount.get_engine_subaccount_summary
+
+    def flaky(subaccount):
+        if subaccount == hedge:
+            raise ValueError("bad subaccount")
+        return fetch(subaccount)
+
+    client.subaccount.get_engine_subaccount_summary = flaky
+    assert hedge not in service.refresh()
+    assert service.exists[service.row(default)]
+    assert not service.exists[service.row(hedge)]
+    assert "bad subaccount" in capsys.readouterr().out
+
+
+def test_unknown_subaccounts_do_not_exist(service):
+    unknown = "0x" + "ff" * 32
+    assert service.refresh([unknown]) == [unknown]
+    assert not service.exists[service.row(unknown)]
+
+
+def test_to_dataframe_has_one_row_per_subaccount(service, client):
+    _, hedge, _ = service.list_subaccounts()
+    client._subaccounts[hedge].positions[PRODUCT_ID] = [0.25, -7500.0]
+    service.refresh()
+
+    frame = service.to_dataframe()
+    assert list(frame.index) == service.subaccounts
+    assert frame.loc[hedge, f"amount_{PRODUCT_ID}"] == pytest.approx(0.25)
+    assert frame.loc[hedge, f"v_quote_{PRODUCT_ID}"] == pytest.approx(-7500.0)
+    assert {"initial_health", "maintenance_assets", "unweighted_liabilities", "quote_balance"} <= set(frame.columns)
@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from src.fill_model import BookSnapshots, FillModel, ImpactCurve, record_book_snapshots
+
+PRODUCT_ID = 2
+T0 = 1_700_000_000
+
+
+def _book(rng, mid, levels):
+    """Random (price, size) levels, best first."""
+    distances = np.cumsum(rng.uniform(0.5, 5.0, levels))  # bps
+    sizes = rng.uniform(0.1, 2.0, levels).round(3)
+    bids = [(mid * (1 - d / 10000.0), s) for d, s in zip(distances, sizes)]
+    asks = [(mid * (1 + d / 10000.0), s) for d, s in zip(distances * 1.5, sizes[::-1])]
+    return bids, asks
+
+
+def _walk(levels, mid, size):
+    """Reference VWAP walk, one level at a time, in bps of the mid; nan if the book is too thin."""
+    remaining, cost = size, 0.0
+    for price, level_size in levels:
+        taken = min(remaining, level_size)
+        cost += taken * abs(price - mid) / mid * 10000.0
+        remaining -= taken
+        if remaining <= 1e-12:
+            return cost / size
+    return np.nan
+
+
+@pytest.fixture
+def books():
+    rng = np.random.default_rng(0)
+    timestamps = [T0 + 60 * i for i in range(8)]
+    books = [_book(rng, 30000.0 + 10 * i, levels) for i, levels in enumerate([1, 5, 20, 3, 50, 8, 2, 30])]
+    books[3] = ([], books[3][1])  # An empty bid side
+    return timestamps, [bids for bids, _ in books], [asks for _, asks in books]
+
+
+def test_vectorized_walk_matches_level_by_level_vwap(books):
+    timestamps, bids, asks = books
+    snapshots = BookSnapshots.from_levels(timestamps, bids, asks)
+    rng = np.random.default_rng(1)
+    order_times = np.repeat(timestamps, 12) + 30
+    sizes = rng.uniform(0.0, 6.0, len(order_times))
+    sizes[::12] = 0.0
+    is_buy = rng.random(len(order_times)) < 0.5
+
+    result = snapshots.slippage_bps(order_times, sizes, is_buy)
+    for i, (row, size, buy) in enumerate(zip(np.repeat(np.arange(len(timestamps)), 12), sizes, is_buy)):
+        levels = asks[row] if buy else bids[row]
+        mid = snapshots.mid[row]
+        if size == 0:
+            expected = abs(levels[0][0] - mid) / mid * 10000.0 if levels else np.nan
+        else:
+            expected = _walk(levels, mid, size)
+        if np.isnan(expected):
+            assert np.isnan(result[i])
+        else:
+            assert result[i] == pytest.approx(expected, rel=1e-4)
+
+
+def test_lookup_uses_the_latest_fresh_snapshot(books):
+    snapshots = BookSnapshots.from_levels(*books)
+    rows = snapshots.lookup([T0 - 1, T0, T0 + 59, T0 + 60, T0 + 7 * 60 + 100], max_age=60)
+    assert rows.tolist() == [-1, 0, 0, 1, -1]
+
+
+def test_snapshots_round_trip_through_npz(tmp_path, books):
+    snapshots = BookSnapshots.from_levels(*books)
+    path = str(tmp_path / "book.npz")
+    snapshots.save(path)
+    loaded = BookSnapshots.load(path)
+    assert loaded.timestamps.tolist() == snapshots.timestamps.tolist()
+    sizes = np.full(len(snapshots), 0.5)
+    np.testing.assert_array_equal(loaded.slippage_bps(loaded.timestamps, sizes, True),
+                                  snapshots.slippage_bps(snapshots.timestamps, sizes, True))
+
+
+def test_impact_curve_fit_recovers_a_linear_book():
+    # Equal levels 1 + d / 20 bps from the mid: the average cost grows linearly with size
+    levels = np.arange(1, 201)
+    timestamps = [T0, T0 + 60]
+    bids = [[(100.0 * (1 - 0.0001 * (1 + d / 20)), 0.1) for d in levels]] * 2
+    asks = [[(100.0 * (1 + 0.0001 * (1 + d / 20)), 0.1) for d in levels]] * 2
+    curve = ImpactCurve.fit(BookSnapshots.from_levels(timestamps, bids, asks), exponent=1.0)
+
+    assert curve.reference_size == pytest.approx(20.0)  # The whole book
+    assert curve.half_spread_bps == pytest.approx(1.025, rel=1e-4)
+    assert curve.impact_bps == pytest.approx(5.0, rel=1e-4)
+    assert curve.slippage_bps([10.0])[0] == pytest.approx(3.525, rel=1e-4)
+
+
+def test_fill_model_falls_back_to_the_curve(books):
+    snapshots = BookSnapshots.from_levels(*books)
+    curve = ImpactCurve(half_spread_bps=2.0, impact_bps=8.0, reference_size=4.0)
+    model = FillModel(snapshots, curve, max_age=60)
+
+    # Fresh and deep enough, too large for the 1-level book, and without a fresh snapshot
+    bps = model.slippage_bps([T0 + 120, T0, T0 + 3600], [0.1, 100.0, 4.0], True)
+    assert bps[0] == pytest.approx(snapshots.slippage_bps(T0 + 120, 0.1, True)[0])
+    assert bps[1:].tolist() == pytest.approx([2.0 + 8.0 * 5.0, 10.0])
+
+    prices = model.fill_prices([100.0, 100.0], [T0 + 3600] * 2, [4.0, 4.0], [True, False])
+    assert prices.tolist() == pytest.approx([100.1, 99.9])
+    assert FillModel(curve=curve).slippage_bps(None, [16.0], True).tolist() == pytest.approx([18.0])
+    with pytest.raises(ValueError):
+        FillModel()
+
+
+def test_book_snapshots_are_recorded_from_market_liquidity(tmp_path, mock_client):
+    path = str(tmp_path / "book.npz")
+    snapshots = record_book_snapshots(path, PRODUCT_ID, count=3, interval_seconds=60, depth=10,
+                                      nado_client=mock_client, clock=mock_client.clock)
+    assert len(snapshots) == 3
+    assert np.diff(snapshots.timestamps).tolist() == [60, 60]
+    assert np.diff(snapshots.asks.offsets).tolist() == [10, 10, 10]
+    assert snapshots.mid[-1] == pytest.approx(mock_client.price(PRODUCT_ID))
+    assert len(BookSnapshots.load(path)) == 3
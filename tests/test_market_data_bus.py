@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from conftest import make_candles
+from src.data_acquisition import get_historical_candlesticks
+from src.market_data_bus import (
+    CLOSE,
+    COLUMNS,
+    TIMESTAMP,
+    BarRing,
+    MarketDataBus,
+    candlesticks_to_bars,
+    crossover_spec,
+)
+from src.strategy import latest_crossover_signal
+
+PRODUCT_ID = 2
+HOUR = 3600
+
+
+def _bars(timestamps):
+    """Bars whose every column is derived from the timestamp, so torn reads are detectable."""
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    return np.vstack([timestamps] + [timestamps + column for column in range(1, len(COLUMNS))])
+
+
+@pytest.fixture
+def ring():
+    ring = BarRing.create(capacity=8)
+    yield ring
+    ring.close()
+
+
+def test_ring_reads_the_latest_bars_as_one_view(ring):
+    assert len(ring) == 0 and ring.latest_timestamp is None
+    assert ring.read()[0].shape == (len(COLUMNS), 0)
+
+    assert ring.publish(_bars(range(5))) == 5
+    assert ring.publish(_bars(range(3, 11))) == 7  # 3 is older than the latest bar and skipped
+    assert len(ring) == 8
+    bars, sequence = ring.read()
+    assert bars[TIMESTAMP].tolist() == list(range(3, 11))
+    assert bars[CLOSE].tolist() == [t + CLOSE for t in range(3, 11)]
+    assert ring.read(3)[0][TIMESTAMP].tolist() == [8, 9, 10]
+    assert not bars.flags.writeable
+
+    # Republishing the latest bar updates it in place
+    updated = _bars([10])
+    updated[CLOSE] = -1.0
+    ring.publish(updated)
+    assert ring.changed(sequence)
+    bars, _ = ring.read(2)
+    assert bars[TIMESTAMP].tolist() == [9, 10] and bars[CLOSE, -1] == -1.0
+
+
+def test_ring_keeps_only_the_latest_capacity_bars(ring):
+    assert ring.publish(_bars(range(20))) == 20
+    assert ring.read()[0][TIMESTAMP].tolist() == list(range(12, 20))
+    assert ring.latest_timestamp == 19
+
+
+def test_readers_in_other_mappings_never_use_a_torn_view(ring):
+    reader = BarRing.attach(ring.name)
+    stop = threading.Event()
+
+    def write():
+        timestamp = 0
+        while not stop.is_set():
+            timestamp += 1
+            ring.publish(_bars(np.arange(timestamp, timestamp + 8)))
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    consistent = 0
+    try:
+        deadline = time.monotonic() + 0.5
+        while time.monotonic() < deadline:
+            bars, sequence = reader.read(4)
+            copy = bars.copy()
+            del bars
+            if reader.changed(sequence):
+                continue  # The writer overlapped this read
+            consistent += 1
+            assert (np.diff(copy[TIMESTAMP]) == 1).all()
+            assert (copy[1:] - copy[TIMESTAMP] == np.arange(1, len(COLUMNS))[:, None]).all()
+    finally:
+        stop.set()
+        writer.join()
+        reader.close()
+    assert consistent > 0
+
+
+def test_crossover_spec_matches_the_strategy(mock_client):
+    spec = crossover_spec(PRODUCT_ID, 5, 20)
+    assert spec.name == "sma_5_20"
+    for _ in range(40):
+        candlesticks = get_historical_candlesticks(PRODUCT_ID, "1H")
+        bars = candlesticks_to_bars(candlesticks)
+        assert (np.diff(bars[TIMESTAMP]) > 0).all()
+        position = spec.fn(bars[:, -spec.lookback:], **spec.params)
+        assert (position, bars[CLOSE, -1]) == latest_crossover_signal(candlesticks, 5, 20)
+        mock_client.clock.advance(HOUR)
+
+    since = bars[TIMESTAMP, -3]
+    assert candlesticks_to_bars(candlesticks, since)[TIMESTAMP].tolist() == bars[TIMESTAMP, -3:].tolist()
+
+
+def test_replay_finishes_with_a_product_without_bars(tmp_path, monkeypatch):
+    # Product 3 has no hourly candles, so its worker sees polls that bring no bars
+    path = tmp_path / "recording.json"
+    path.write_text(json.dumps({"candlesticks": {
+        str(PRODUCT_ID): {"1H": make_candles(120)},
+        "3": {"1D": make_candles(60, seconds=24 * HOUR)},
+    }}))
+    monkeypatch.setenv("NADO_MOCK_RECORDING", str(path))
+
+    specs = [crossover_spec(PRODUCT_ID, 5, 20), crossover_spec(3, 5, 20)]
+    bus = MarketDataBus([PRODUCT_ID, 3], "1H", specs, workers=2, poll_seconds=HOUR, replay=True, max_polls=40)
+    signals = []
+    started = time.monotonic()
+    with bus:
+        while bus.running and time.monotonic() - started < 60:
+            signal = bus.get_signal()
+            if signal is not None:
+                signals.append(signal)
+    assert time.monotonic() - started < 60
+
+    timestamps = [signal.timestamp for signal in signals if signal.product_id == PRODUCT_ID]
+    assert len(timestamps) == 40  # One signal per poll
+    assert timestamps == sorted(set(timestamps))
+    assert all(signal.product_id == PRODUCT_ID for signal in signals)
@@ -0,0 +1,127 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import src.market_stream as market_stream
+from src.market_stream import BarBuilder, MarketStream
+
+X18 = 10**18
+PRODUCT_ID = 2
+MINUTE = 60
+T0 = 1_700_000_040  # A whole minute
+
+
+def _trade(stream, timestamp, price=100.0, size=1.0):
+    stream.handle_message(json.dumps({
+        "type": "trade", "product_id": PRODUCT_ID, "timestamp": str(int(timestamp * 1e9)),
+        "price": str(int(price * X18)), "taker_qty": str(int(size * X18)),
+    }))
+
+
+def _stream(now, interval="1M"):
+    stream = MarketStream([PRODUCT_ID], interval, url="ws://127.0.0.1:1")
+    stream._now = lambda: now["time"]
+    published = []
+    stream.on_bar(lambda product_id, bar, bars: published.append((bar, len(bars))))
+    return stream, published
+
+
+def _drain(stream):
+    stream._executor.shutdown(wait=True)
+
+
+def test_bar_builder_rolls_over_on_the_next_interval():
+    builder = BarBuilder(MINUTE)
+    assert builder.update(T0 + 1, 100.0, 1.0) == []
+    assert builder.update(T0 + 20, 105.0, 2.0) == []
+    assert builder.update(T0 + 40, 95.0, 1.0) == []
+    closed = builder.update(T0 + MINUTE + 5, 101.0, 1.0)
+    assert closed == [{"timestamp": T0, "open": 100.0, "high": 105.0, "low": 95.0, "close": 95.0, "volume": 4.0}]
+    assert builder.current["open"] == 101.0
+
+    # Late trades for a published bar are ignored
+    assert builder.update(T0 + 59, 200.0, 1.0) == []
+    assert builder.current["high"] == 101.0
+
+
+def test_bar_builder_closes_idle_bars():
+    builder = BarBuilder(MINUTE)
+    builder.update(T0 + 1, 100.0)
+    assert builder.close_until(T0 + MINUTE - 1) == []
+    assert [bar["timestamp"] for bar in builder.close_until(T0 + MINUTE)] == [T0]
+    assert builder.current is None
+
+
+def test_bar_builder_skips_the_bar_of_the_next_trade():
+    builder = BarBuilder(MINUTE)
+    builder.update(T0 + 1, 100.0)
+    builder.skip()
+    assert builder.current is None
+    assert builder.update(T0 + 30, 100.0) == []
+    assert builder.update(T0 + 50, 100.0) == []
+    assert builder.current is None
+    assert builder.skipped == T0
+    builder.update(T0 + MINUTE + 1, 101.0)
+    assert builder.current["timestamp"] == T0 + MINUTE
+
+
+def test_backfill_does_not_call_back_for_history(mock_client):
+    stream, published = _stream({"time": mock_client.clock.now}, interval="1H")
+    asyncio.run(stream.backfill(PRODUCT_ID))
+    _drain(stream)
+    assert published == []
+    assert len(stream.bars[PRODUCT_ID]) == 51
+    assert stream._builders[PRODUCT_ID].last_closed == stream.bars[PRODUCT_ID][-1]["timestamp"]
+
+
+def test_bars_spanning_startup_and_reconnects_come_from_rest(monkeypatch):
+    now = {"time": T0 + 30}
+
+    def candles(product_id, interval):
+        # REST candles up to the one forming now, with a volume no trade-built bar has
+        return [
+            SimpleNamespace(timestamp=str(start), open_x18=str(100 * X18), high_x18=str(110 * X18),
+                            low_x18=str(90 * X18), close_x18=str(105 * X18), volume=str(7 * X18))
+            for start in range(T0 - 10 * MINUTE, now["time"] + 1, MINUTE)
+        ]
+
+    monkeypatch.setattr(market_stream, "get_historical_candlesticks", candles)
+    stream, published = _stream(now)
+    builder = stream._builders[PRODUCT_ID]
+
+    async def scenario():
+        await stream.resync()  # Subscribed mid-bar: the T0 bar misses its first trades
+        _trade(stream, T0 + 40)
+        _trade(stream, T0 + 50)
+        now["time"] = T0 + MINUTE + 1
+        _trade(stream, T0 + MINUTE + 1)
+        await stream._fetch_skipped_bar(PRODUCT_ID, builder, now["time"])
+        _trade(stream, T0 + MINUTE + 10)
+
+        now["time"] = T0 + MINUTE + 40  # Disconnected at +20, reconnected within the same bar
+        await stream.resync()
+        _trade(stream, T0 + MINUTE + 50)
+        now["time"] = T0 + 2 * MINUTE + 1
+        _trade(stream, T0 + 2 * MINUTE + 1)
+        await stream._fetch_skipped_bar(PRODUCT_ID, builder, now["time"])
+
+        now["time"] = T0 + 3 * MINUTE + 1
+        _trade(stream, T0 + 3 * MINUTE + 1)  # Closes the first complete trade-built bar
+
+    asyncio.run(scenario())
+    _drain(stream)
+    assert [(bar["timestamp"] - T0, bar["volume"]) for bar, _ in published] == [
+        (0, 7.0), (MINUTE, 7.0), (2 * MINUTE, 1.0)
+    ]
+    assert builder.skipped is None
+    timestamps = [bar["timestamp"] for bar in stream.bars[PRODUCT_ID]]
+    assert timestamps == sorted(set(timestamps))
+
+
+def test_messages_for_other_streams_and_products_are_ignored():
+    stream, published = _stream({"time": T0})
+    stream.handle_message(json.dumps({"type": "subscribed", "id": 1}))
+    stream.handle_message(json.dumps({"type": "trade", "product_id": 99, "timestamp": str(T0 * 10**9),
+                                      "price": str(X18), "taker_qty": str(X18)}))
+    assert stream._builders[PRODUCT_ID].current is None
+    assert stream._clock_offset is None
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from src.data_acquisition import get_historical_candlesticks, get_latest_perp_price
+from src.mock_exchange import X18, replay_bot
+from src.order_preparation import OrderPreparer
+
+PRODUCT_ID = 2
+HOUR = 3600
+
+
+def _subaccount(client):
+    return client.subaccount.get_subaccounts().subaccounts[0].subaccount
+
+
+def test_candles_are_served_as_of_the_replay_clock(mock_client, candles):
+    served = get_historical_candlesticks(PRODUCT_ID, "1H")
+    newest = max(int(candle.timestamp) for candle in served)
+    assert newest + HOUR <= mock_client.clock.now
+    assert len(served) == 51  # The clock starts when the bar after DEFAULT_WARMUP_BARS closes
+
+    mock_client.clock.advance(HOUR)
+    served = get_historical_candlesticks(PRODUCT_ID, "1H")
+    assert len(served) == 52
+    assert int(served[0].timestamp) == newest + HOUR  # Newest first, like the indexer
+    assert get_latest_perp_price(PRODUCT_ID) == pytest.approx(candles[51]["close"])
+
+
+def test_market_orders_fill_at_the_replayed_price_and_report_to_the_indexer(mock_client):
+    preparer = OrderPreparer(mock_client, _subaccount(mock_client))
+    try:
+        preparer.prepare(PRODUCT_ID, 0.5)
+        price = mock_client.price(PRODUCT_ID)
+        result = preparer.fire_market(PRODUCT_ID, is_buy=True, reference_price=price)
+    finally:
+        preparer.stop()
+
+    assert result.status == "success"
+    order = mock_client.get_historical_orders_by_digest([result.data.digest]).orders[0]
+    assert int(order.base_filled) == 5 * X18 // 10
+    assert -int(order.quote_filled) / int(order.base_filled) == pytest.approx(price)
+    assert int(order.fee) / X18 == pytest.approx(0.5 * price * mock_client.taker_fee)
+
+
+def test_limit_orders_that_are_not_marketable_are_rejected(mock_client):
+    preparer = OrderPreparer(mock_client, _subaccount(mock_client))
+    try:
+        preparer.prepare(PRODUCT_ID, 0.5)
+        result = preparer.fire_market(PRODUCT_ID, is_buy=True, reference_price=mock_client.price(PRODUCT_ID) * 0.9)
+    finally:
+        preparer.stop()
+
+    assert result is None
+    assert mock_client.fills == []
+
+
+def test_trigger_orders_fill_once_the_price_crosses(mock_client, candles):
+    subaccount = _subaccount(mock_client)
+    state = mock_client._subaccounts[subaccount]
+    state.positions[PRODUCT_ID] = [1.0, -candles[49]["close"]]
+    trigger_price = max(candle["close"] for candle in candles[51:75])
+    assert mock_client.price(PRODUCT_ID) < trigger_price
+
+    mock_client.place_price_trigger_order(
+        product_id=PRODUCT_ID, sender=subaccount, price_x18="0", amount_x18=str(-X18),
+        trigger_price_x18=str(int(trigger_price * X18)), trigger_type="last_price_above", reduce_only=True,
+    )
+    while mock_client.price(PRODUCT_ID) < trigger_price:
+        assert mock_client.fills == []
+        mock_client.clock.advance(HOUR)
+
+    assert len(mock_client.fills) == 1
+    assert mock_client.fills[0]["type"] == "trigger"
+    assert state.positions[PRODUCT_ID][0] == 0
+    assert state.trigger_orders == []
+
+
+def test_unknown_subaccounts_have_no_summary(mock_client):
+    summary = mock_client.subaccount.get_engine_subaccount_summary("0x" + "ff" * 32)
+    assert summary.exists is False
+
+
+def test_replays_are_deterministic(tmp_path, monkeypatch, candles):
+    from src import main_bot
+
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "recording.json"
+    path.write_text(json.dumps({"candlesticks": {str(PRODUCT_ID): {"1H": candles}}}))
+
+    fills = []
+    for _ in range(2):
+        monkeypatch.setattr(main_bot, "current_position", None)
+        client = replay_bot(str(path))
+        fills.append([(fill["timestamp"], fill["amount"], round(fill["price"], 6)) for fill in client.fills])
+
+    assert fills[0]
+    assert fills[0] == fills[1]
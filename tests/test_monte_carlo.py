@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from src.monte_carlo import (
+    bootstrap_candles,
+    bootstrap_trades,
+    crossover_trade_factors,
+    path_metrics,
+    trade_factors,
+)
+
+
+@pytest.fixture
+def close(candles):
+    return np.array([candle["close"] for candle in candles])
+
+
+def test_trade_factors_recover_round_trip_multipliers():
+    trades = [
+        {"type": "BUY", "shares": 2.0, "price": 50.0},
+        {"type": "SELL", "capital": 110.0},
+        {"type": "BUY", "shares": 1.0, "price": 110.0},
+        {"type": "SELL_FINAL", "capital": 99.0},
+    ]
+    assert trade_factors(trades).tolist() == pytest.approx([1.1, 0.9])
+
+
+def test_crossover_trade_factors_close_open_positions_at_the_last_bar():
+    close = np.array([100.0, 110.0, 121.0, 90.0, 99.0])
+    positions = np.array([0.0, 1.0, -1.0, 1.0, 0.0])
+    factors = crossover_trade_factors(close, positions, commission_rate=0.0, slippage=0.0)
+    assert factors.tolist() == pytest.approx([1.1, 1.1])
+
+
+def test_path_metrics_ignore_padding():
+    factors = np.array([[1.1, 0.5, 1.0], [1.2, 1.0, 1.0]])
+    metrics = path_metrics(factors, np.array([2, 1]), 100.0, np.array([1.0, 1.0]))
+    assert metrics["total_pnl"].tolist() == pytest.approx([-45.0, 20.0])
+    assert metrics["max_drawdown"].tolist() == pytest.approx([0.5, 0.0])
+    assert metrics["sharpe"][0] == pytest.approx(np.mean([0.1, -0.5]) / np.std([0.1, -0.5], ddof=1))
+    assert np.isnan(metrics["sharpe"][1])  # A single trade has no variance
+
+
+def test_trade_bootstrap_of_identical_trades_has_no_spread():
+    summary = bootstrap_trades(np.full(10, 1.01), years=1.0, n_resamples=200, workers=1, seed=1)
+    assert summary["total_pnl"]["lower"] == pytest.approx(summary["total_pnl"]["upper"])
+    assert summary["total_pnl"]["observed"] == pytest.approx(10000.0 * (1.01 ** 10 - 1))
+    assert summary["prob_loss"] == 0.0
+    assert bootstrap_trades(np.array([1.1]), years=1.0) == {}
+
+
+def test_one_block_spanning_the_history_reproduces_the_backtest(close):
+    summary = bootstrap_candles(close, "1H", 5, 20, n_resamples=20, block_length=len(close), workers=1, seed=3)
+    for metric in ("total_pnl", "max_drawdown"):
+        assert summary[metric]["lower"] == pytest.approx(summary[metric]["observed"])
+        assert summary[metric]["upper"] == pytest.approx(summary[metric]["observed"])
+
+
+def test_block_bootstrap_is_reproducible_for_any_worker_count(close):
+    kwargs = dict(n_resamples=60, block_length=24, seed=42, chunk_size=20)
+    serial = bootstrap_candles(close, "1H", 5, 20, workers=1, **kwargs)
+    parallel = bootstrap_candles(close, "1H", 5, 20, workers=2, **kwargs)
+    assert serial == parallel
+    assert serial["total_pnl"]["lower"] < serial["total_pnl"]["upper"]
+    assert bootstrap_candles(close, "1H", 5, 20, workers=1, **dict(kwargs, seed=7)) != serial
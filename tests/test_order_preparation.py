@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+from src.mock_exchange import X18
+from src.order_preparation import DEFAULT_MARKET_SLIPPAGE, PRICE_MAX_AGE_SECONDS, NonceManager, OrderPreparer
+
+PRODUCT_ID = 2
+
+
+@pytest.fixture
+def preparer(mock_client):
+    subaccount = mock_client.subaccount.get_subaccounts().subaccounts[0].subaccount
+    preparer = OrderPreparer(mock_client, subaccount)
+    preparer.prepare(PRODUCT_ID, 0.5)
+    yield preparer
+    preparer.stop()
+
+
+def test_nonces_come_from_the_pool():
+    nonces = NonceManager(pool_size=4, refresh_seconds=60)
+    try:
+        taken = [nonces.take() for _ in range(4)]
+        assert len(set(taken)) == 4
+        assert nonces.misses == 0
+        nonces.take()
+        assert nonces.misses == 1  # Pool ran dry
+    finally:
+        nonces.stop()
+
+
+def test_expired_nonces_are_never_handed_out():
+    nonces = NonceManager(pool_size=4, max_age_seconds=0.05, refresh_seconds=60)
+    try:
+        time.sleep(0.1)
+        nonces.take()
+        assert nonces.misses == 1
+        nonces._refill()
+        assert len(nonces._pool) == 4
+    finally:
+        nonces.stop()
+
+
+def test_templates_cover_both_sides_and_triggers(preparer):
+    kinds = {(kind, side) for product_id, kind, side in preparer.templates if product_id == PRODUCT_ID}
+    assert kinds == {(kind, side) for kind in ("market", "stop_loss", "take_profit") for side in (True, False)}
+    assert preparer.templates[(PRODUCT_ID, "market", True)].amount_x18 == X18 // 2
+    assert preparer.templates[(PRODUCT_ID, "stop_loss", True)].amount_x18 == -X18 // 2
+    assert preparer.templates[(PRODUCT_ID, "stop_loss", True)].trigger_type == "last_price_below"
+    assert preparer.templates[(PRODUCT_ID, "take_profit", False)].trigger_type == "last_price_below"
+
+
+def test_market_orders_use_a_fresh_mark_price(preparer, mock_client):
+    mark = mock_client.price(PRODUCT_ID)
+    preparer.mark_prices[PRODUCT_ID] = (int(time.time()), mark)
+
+    # The caller's bar close is 10% stale; the limit still follows the mark price
+    result = preparer.fire_market(PRODUCT_ID, is_buy=True, reference_price=mark * 0.9)
+    assert result is not None
+    assert preparer.price_misses == 0
+    assert mock_client.fills[-1]["price"] == pytest.approx(mark)
+
+
+def test_market_orders_fall_back_to_the_callers_price_when_the_mark_is_stale(preparer, mock_client):
+    mark = mock_client.price(PRODUCT_ID)
+    preparer.mark_prices[PRODUCT_ID] = (int(time.time() - 2 * PRICE_MAX_AGE_SECONDS), mark * 0.5)
+    assert preparer.reference_price(PRODUCT_ID, mark) == mark
+    assert preparer.price_misses == 1
+
+
+def test_market_order_limit_includes_slippage(preparer, mock_client):
+    placed = []
+    place_order = mock_client.market.place_order
+    mock_client.market.place_order = lambda params: placed.append(params) or place_order(params)
+    price = mock_client.price(PRODUCT_ID)
+
+    preparer.fire_market(PRODUCT_ID, is_buy=False, reference_price=price)
+    assert int(placed[0].order.priceX18) / X18 == pytest.approx(price * (1 - DEFAULT_MARKET_SLIPPAGE))
+    assert int(placed[0].order.amount) == -X18 // 2
+
+
+def test_trigger_orders_are_placed_reduce_only(preparer, mock_client):
+    subaccount = preparer.subaccount
+    result = preparer.fire_trigger(PRODUCT_ID, "stop_loss", position_is_long=True, trigger_price=25000.0)
+    assert result is not None
+
+    (order,) = mock_client._subaccounts[subaccount].trigger_orders
+    assert order["trigger_type"] == "last_price_below"
+    assert order["trigger_price"] == pytest.approx(25000.0)
+    assert order["reduce_only"]
+    summary = preparer.latency_summary()
+    assert summary["orders"] == 1
+    assert {"prepare_ms_mean", "sign_ms_mean", "network_ms_mean", "price_misses"} <= set(summary)
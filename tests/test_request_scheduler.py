@@ -0,0 +1,128 @@
+import threading
+import time
+
+import pytest
+
+from src.request_scheduler import (
+    PRIORITY_ACCOUNT,
+    PRIORITY_MARKET_DATA,
+    PRIORITY_ORDER,
+    RequestScheduler,
+    TokenBucket,
+    is_rate_limited,
+    is_transient_error,
+)
+
+
+def test_token_bucket_allows_a_burst_then_waits_for_the_rate():
+    bucket = TokenBucket(rate=10.0, capacity=3)
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = bucket.try_acquire()
+    assert 0.0 < wait <= 0.1
+
+
+def test_error_classification():
+    assert is_rate_limited(Exception("HTTP 429 Too Many Requests"))
+    assert not is_rate_limited(Exception("invalid signature"))
+    assert is_transient_error(ConnectionError("reset"))
+    assert is_transient_error(Exception("503 Service Unavailable"))
+    assert not is_transient_error(ValueError("bad params"))
+
+
+def test_requests_are_dispatched_by_priority():
+    scheduler = RequestScheduler(workers={"engine.query": 1}, throttle=False)
+    release = threading.Event()
+    blocker = scheduler.submit("engine.query", release.wait, 5)
+    time.sleep(0.05)  # The only worker is now busy
+
+    order = []
+    futures = [
+        scheduler.submit("engine.query", order.append, name, priority=priority)
+        for name, priority in (("market data", PRIORITY_MARKET_DATA), ("account", PRIORITY_ACCOUNT),
+                               ("order", PRIORITY_ORDER))
+    ]
+    release.set()
+    blocker.result(timeout=5)
+    for future in futures:
+        future.result(timeout=5)
+    assert order == ["order", "account", "market data"]
+
+
+def test_identical_reads_in_flight_share_one_request():
+    scheduler = RequestScheduler(throttle=False)
+    release = threading.Event()
+    calls = []
+
+    def read():
+        calls.append(1)
+        release.wait(5)
+        return "summary"
+
+    first = scheduler.submit("engine.query", read, key=("summary", "a"))
+    second = scheduler.submit("engine.query", read, key=("summary", "a"))
+    assert first is second
+    release.set()
+    assert first.result(timeout=5) == "summary"
+    assert len(calls) == 1
+
+    # Once finished, the same key is fetched again
+    assert scheduler.call("engine.query", read, key=("summary", "a")) == "summary"
+    assert len(calls) == 2
+
+
+def test_transient_errors_are_retried_and_others_raised():
+    scheduler = RequestScheduler(throttle=False, base_delay=0.001, max_delay=0.01)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("connection reset")
+        return "ok"
+
+    assert scheduler.call("indexer", flaky) == "ok"
+    assert len(attempts) == 3
+
+    def broken():
+        attempts.append(1)
+        raise ValueError("bad params")
+
+    attempts.clear()
+    with pytest.raises(ValueError):
+        scheduler.call("indexer", broken)
+    assert len(attempts) == 1
+
+
+def test_retries_give_up_after_max_retries():
+    scheduler = RequestScheduler(throttle=False, max_retries=2, base_delay=0.001, max_delay=0.01)
+    attempts = []
+
+    def down():
+        attempts.append(1)
+        raise TimeoutError("timed out")
+
+    with pytest.raises(TimeoutError):
+        scheduler.call("indexer", down)
+    assert len(attempts) == 3
+
+
+def test_endpoint_rate_limits_are_applied():
+    scheduler = RequestScheduler(limits={"engine.query": (50.0, 1)})
+    started = time.perf_counter()
+    for future in [scheduler.submit("engine.query", time.perf_counter) for _ in range(5)]:
+        future.result(timeout=5)
+    # One request from the burst, then four at 50 per second
+    assert time.perf_counter() - started >= 0.06
+
+
+def test_busy_query_workers_do_not_delay_orders():
+    scheduler = RequestScheduler(workers={"engine.query": 2, "engine.execute": 1}, throttle=False)
+    release = threading.Event()
+    queries = [scheduler.submit("engine.query", release.wait, 5) for _ in range(10)]
+    try:
+        started = time.perf_counter()
+        assert scheduler.call("engine.execute", lambda: "placed", priority=PRIORITY_ORDER) == "placed"
+        assert time.perf_counter() - started < 1.0
+        assert not any(query.done() for query in queries)
+    finally:
+        release.set()
@@ -0,0 +1,107 @@
+import math
+
+import pytest
+
+from src.account_service import HEALTH, HEALTH_INITIAL, HEALTH_MAINTENANCE, AccountService
+from src.risk import RiskEngine
+
+PRODUCT_ID = 2
+
+
+def _engine(client, service, subaccount, **kwargs) -> RiskEngine:
+    engine = RiskEngine(**kwargs)
+    engine.load_markets(client)
+    engine.sync(service, subaccount)
+    return engine
+
+
+@pytest.fixture
+def account(mock_client):
+    """A monitored subaccount holding 1 long at 29,000 with 10,000 of quote."""
+    service = AccountService(mock_client)
+    subaccount = service.list_subaccounts()[0]
+    mock_client._subaccounts[subaccount].positions[PRODUCT_ID] = [1.0, -29000.0]
+    service.refresh()
+    return service, subaccount
+
+
+def test_sync_reproduces_the_engine_healths(mock_client, account):
+    service, subaccount = account
+    engine = _engine(mock_client, service, subaccount)
+    row = service.row(subaccount)
+
+    assert engine.position.tolist() == [1.0]
+    assert engine.initial_health == pytest.approx(service.health[row, HEALTH_INITIAL, HEALTH])
+    assert engine.maintenance_health == pytest.approx(service.health[row, HEALTH_MAINTENANCE, HEALTH])
+    assert engine.health_offset == pytest.approx([0.0, 0.0], abs=1e-6)  # The mock has no spot assets or funding
+
+
+def test_sync_requires_a_monitored_subaccount(mock_client, account):
+    service, _ = account
+    with pytest.raises(ValueError):
+        _engine(mock_client, service, "0x" + "ff" * 32)
+
+
+@pytest.mark.parametrize("amount, price", [(0.5, None), (-0.4, 31000.0), (-3.0, None), (-1.0, None)])
+def test_check_order_matches_a_full_recompute(mock_client, account, amount, price):
+    service, subaccount = account
+    engine = _engine(mock_client, service, subaccount, min_liquidation_distance=0.0)
+    check = engine.check_order(PRODUCT_ID, amount, price)
+
+    filled = _engine(mock_client, service, subaccount)
+    filled.apply_fill(PRODUCT_ID, amount, mock_client.price(PRODUCT_ID) if price is None else price)
+    assert check.initial_health == pytest.approx(filled.initial_health)
+    assert check.maintenance_health == pytest.approx(filled.maintenance_health)
+    expected = filled.liquidation_prices()[0]
+    if math.isnan(expected):
+        assert math.isnan(check.liquidation_price) and check.liquidation_distance == math.inf
+    else:
+        assert check.liquidation_price == pytest.approx(expected)
+        assert check.liquidation_distance == pytest.approx(filled.liquidation_distances()[0])
+
+
+def test_risk_increasing_orders_are_limited(mock_client, account):
+    service, subaccount = account
+    engine = _engine(mock_client, service, subaccount, max_position={PRODUCT_ID: 2.0})
+
+    assert engine.check_order(PRODUCT_ID, 0.5).allowed
+    check = engine.check_order(PRODUCT_ID, 1.5)
+    assert not check.allowed and "exceeds the limit" in check.reason
+    check = engine.check_order(PRODUCT_ID, -3.5)  # Flips to a short beyond the limit
+    assert not check.allowed and "exceeds the limit" in check.reason
+
+    engine.max_position.clear()
+    engine.load_markets(mock_client)
+    engine.sync(service, subaccount)
+    check = engine.check_order(PRODUCT_ID, 20.0)
+    assert not check.allowed and "Initial health" in check.reason
+
+
+def test_reducing_orders_are_always_allowed(mock_client, account):
+    service, subaccount = account
+    engine = _engine(mock_client, service, subaccount, min_initial_health=1e9, max_position={PRODUCT_ID: 0.1})
+    assert not engine.check_order(PRODUCT_ID, 0.1).allowed
+    assert engine.check_order(PRODUCT_ID, -0.5).allowed
+    assert engine.check_order(PRODUCT_ID, -1.0).allowed
+
+
+def test_orders_without_a_mark_price_are_rejected(mock_client, account):
+    service, subaccount = account
+    engine = _engine(mock_client, service, subaccount)
+    engine.on_tick(PRODUCT_ID, 0.0)
+    check = engine.check_order(PRODUCT_ID, -0.5)
+    assert not check.allowed and "No mark price" in check.reason
+    assert not engine.check_order(99, 1.0).allowed
+
+
+def test_on_tick_reports_positions_near_liquidation(mock_client, account):
+    service, subaccount = account
+    engine = _engine(mock_client, service, subaccount)
+    engine.apply_fill(PRODUCT_ID, 0.3, mock_client.price(PRODUCT_ID))  # 1.3 long on 10,000 of quote
+
+    liquidation_price = engine.liquidation_prices()[0]
+    assert engine.on_tick(PRODUCT_ID, liquidation_price * 1.5) == []
+    assert engine.on_tick(PRODUCT_ID, liquidation_price * 1.05) == [PRODUCT_ID]
+    assert engine.on_tick(PRODUCT_ID, liquidation_price * 0.99) == [PRODUCT_ID]
+    assert engine.maintenance_health < 0
+    assert engine.on_tick(99, 1.0) == []
@@ -0,0 +1,185 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from src.account_service import AccountService
+from src.mock_exchange import X18
+from src.order_preparation import OrderPreparer
+from src.trade_journal import BUY, SELL, SOURCE_BACKTEST, SOURCE_LIVE, FillTracker, TradeJournal
+
+PRODUCT_ID = 2
+HOUR = 3600
+T0 = 1_700_000_000
+
+
+def _record(journal, timestamp, side, price, realized_pnl=None, strategy="sma", source=SOURCE_LIVE,
+            signal_price=None, product_id=PRODUCT_ID):
+    journal.record(timestamp, source, "run", strategy, product_id, side, 2.0,
+                   signal_price or price, price, fee=0.5, realized_pnl=realized_pnl)
+
+
+def _parts(journal):
+    return [name for name in os.listdir(journal.path) if name.startswith("part-")]
+
+
+def test_fills_are_buffered_until_flush_rows(tmp_path):
+    journal = TradeJournal(str(tmp_path / "journal"), flush_rows=3)
+    _record(journal, T0, BUY, 100.0)
+    _record(journal, T0 + 1, SELL, 110.0, realized_pnl=20.0)
+    assert journal.buffered == 2
+    assert not os.path.exists(journal.path)
+    assert journal.read().num_rows == 2  # Reads include buffered fills
+
+    _record(journal, T0 + 2, BUY, 105.0)
+    assert journal.buffered == 0
+    assert len(_parts(journal)) == 1
+    assert journal.read(columns=["price"])["price"].to_pylist() == [100.0, 110.0, 105.0]
+
+
+def test_reads_filter_by_product_source_and_time(tmp_path):
+    journal = TradeJournal(str(tmp_path / "journal"))
+    _record(journal, T0, BUY, 100.0)
+    _record(journal, T0 + HOUR, SELL, 110.0, product_id=3)
+    journal.flush()
+    _record(journal, T0 + 2 * HOUR, BUY, 120.0, source=SOURCE_BACKTEST)
+
+    assert journal.read(product_id=3).num_rows == 1
+    assert journal.read(product_id=[2, 3], source=SOURCE_LIVE).num_rows == 2
+    assert journal.read(source=SOURCE_BACKTEST)["price"].to_pylist() == [120.0]
+    prices = journal.read(start="2023-11-14 22:13:20", end="2023-11-15 00:13:20")["price"]
+    assert prices.to_pylist() == [100.0, 110.0]
+
+
+def test_pnl_slippage_and_hit_rate(tmp_path):
+    journal = TradeJournal(str(tmp_path / "journal"))
+    _record(journal, T0, BUY, 101.0, signal_price=100.0)
+    _record(journal, T0 + 1, SELL, 99.0, realized_pnl=-4.0, signal_price=100.0)
+    journal.flush()
+    _record(journal, T0 + 2, BUY, 100.0, strategy="rsi")
+    _record(journal, T0 + 3, SELL, 110.0, realized_pnl=20.0, strategy="rsi")
+
+    pnl = journal.pnl(by="strategy").set_index("strategy")
+    assert pnl.loc["sma", "fills"] == 2
+    assert pnl.loc["sma", "volume"] == pytest.approx(400.0)
+    assert pnl.loc["sma", "net_pnl"] == pytest.approx(-5.0)
+    assert pnl.loc["rsi", "realized_pnl"] == pytest.approx(20.0)
+
+    slippage = journal.slippage(by="strategy").set_index("strategy")
+    assert slippage.loc["sma", "mean_bps"] == pytest.approx(100.0)  # Bought 1% above, sold 1% below
+    assert slippage.loc["sma", "cost"] == pytest.approx(4.0)
+    assert slippage.loc["rsi", "max_bps"] == pytest.approx(0.0)
+
+    hit_rate = journal.hit_rate().set_index("strategy")
+    assert hit_rate["trades"].tolist() == [1, 1]
+    assert hit_rate.loc["rsi", "hit_rate"] == 1.0
+    assert hit_rate.loc["sma", "avg_loss"] == pytest.approx(-4.0)
+
+    by_day = journal.pnl(by=["day", "product_id"])
+    assert len(by_day) == 1 and by_day["fills"].iloc[0] == 4
+
+
+def test_compact_merges_only_small_part_files(tmp_path):
+    journal = TradeJournal(str(tmp_path / "journal"), flush_rows=3)
+    for i in range(3):  # One full part file
+        _record(journal, T0 + i, BUY, 100.0)
+    for i in range(3):
+        _record(journal, T0 + 10 + i, SELL, 100.0)
+        journal.flush()
+    assert len(_parts(journal)) == 4
+
+    _record(journal, T0 + 20, BUY, 100.0)
+    journal.compact(min_rows=journal.flush_rows)
+    assert len(_parts(journal)) == 2
+    assert journal.read().num_rows == 7
+
+    journal.compact()
+    assert len(_parts(journal)) == 1
+    assert journal.read(columns=["side"])["side"].to_pylist().count(SELL) == 3
+
+
+def test_apply_realizes_pnl_against_the_average_entry(tmp_path):
+    tracker = FillTracker(TradeJournal(str(tmp_path / "journal")), None, "sma")
+    assert tracker._apply(PRODUCT_ID, X18, 100.0) is None
+    assert tracker._apply(PRODUCT_ID, X18, 110.0) is None
+    assert tracker.positions[PRODUCT_ID] == [2 * X18, 105.0]
+    assert tracker._apply(PRODUCT_ID, -X18 // 2, 115.0) == pytest.approx(5.0)
+    assert tracker.positions[PRODUCT_ID] == [3 * X18 // 2, 105.0]
+
+    # Selling 2.5 closes the 1.5 long and opens a 1 short at the fill price
+    assert tracker._apply(PRODUCT_ID, -5 * X18 // 2, 95.0) == pytest.approx(-15.0)
+    assert tracker.positions[PRODUCT_ID] == [-X18, 95.0]
+    assert tracker._apply(PRODUCT_ID, X18, 90.0) == pytest.approx(5.0)
+    assert tracker.positions[PRODUCT_ID][0] == 0
+
+
+def test_live_fills_are_journaled_with_realized_pnl(tmp_path, mock_client):
+    subaccount = mock_client.subaccount.get_subaccounts().subaccounts[0].subaccount
+    journal = TradeJournal(str(tmp_path / "journal"))
+    tracker = FillTracker(journal, mock_client, "sma", flush_seconds=0.0)
+    preparer = OrderPreparer(mock_client, subaccount)
+    try:
+        preparer.prepare(PRODUCT_ID, 0.5)
+        entry = mock_client.price(PRODUCT_ID)
+        tracker.track(preparer.fire_market(PRODUCT_ID, True, entry), PRODUCT_ID, entry)
+        stop = preparer.fire_trigger(PRODUCT_ID, "stop_loss", position_is_long=True, trigger_price=entry * 0.5)
+        tracker.track(stop, PRODUCT_ID, entry * 0.5, kind="stop_loss")
+        assert tracker.resolve() == 1
+        assert list(tracker.pending.values()) == [(PRODUCT_ID, entry * 0.5, "stop_loss")]
+
+        mock_client.clock.advance(HOUR)
+        exit_price = mock_client.price(PRODUCT_ID)
+        tracker.track(preparer.fire_market(PRODUCT_ID, False, exit_price), PRODUCT_ID, exit_price)
+        assert tracker.resolve() == 1
+    finally:
+        preparer.stop()
+
+    assert tracker.pending == {}  # The stop of the closed position is no longer tracked
+    assert tracker.positions[PRODUCT_ID][0] == 0
+    assert journal.buffered == 0
+    fills = journal.read().to_pydict()
+    assert fills["side"] == [BUY, SELL]
+    assert fills["realized_pnl"][1] == pytest.approx(0.5 * (exit_price - entry))
+    assert int(fills["timestamp"][1].timestamp()) == mock_client.clock.now
+
+
+def test_fills_without_a_timestamp_use_the_resolve_time(tmp_path, mock_client):
+    subaccount = mock_client.subaccount.get_subaccounts().subaccounts[0].subaccount
+    journal = TradeJournal(str(tmp_path / "journal"))
+    tracker = FillTracker(journal, mock_client, "sma")
+    orders = mock_client.market.get_historical_orders_by_digest
+
+    def without_timestamps(digests):
+        return SimpleNamespace(orders=[SimpleNamespace(**dict(vars(order), timestamp=None))
+                                       for order in orders(digests).orders])
+
+    mock_client.market.get_historical_orders_by_digest = without_timestamps
+    preparer = OrderPreparer(mock_client, subaccount)
+    try:
+        preparer.prepare(PRODUCT_ID, 0.5)
+        price = mock_client.price(PRODUCT_ID)
+        tracker.track(preparer.fire_market(PRODUCT_ID, True, price), PRODUCT_ID, price)
+    finally:
+        preparer.stop()
+
+    assert tracker.resolve(now=T0) == 1
+    assert journal.buffered == 1  # Within flush_seconds
+    tracker.close()
+    assert journal.buffered == 0
+    assert int(journal.read()["timestamp"][0].as_py().timestamp()) == T0
+
+
+def test_sync_seeds_positions_from_the_account(tmp_path, mock_client):
+    service = AccountService(mock_client)
+    subaccount = service.list_subaccounts()[0]
+    mock_client._subaccounts[subaccount].positions[PRODUCT_ID] = [-0.25, 7500.0]
+    service.refresh()
+
+    tracker = FillTracker(TradeJournal(str(tmp_path / "journal")), mock_client, "sma")
+    tracker.sync(service, subaccount)
+    assert tracker.positions == {PRODUCT_ID: [-X18 // 4, 30000.0]}
+    assert tracker._apply(PRODUCT_ID, X18 // 4, 29000.0) == pytest.approx(250.0)
+    assert tracker.positions[PRODUCT_ID][0] == 0
+
+    tracker.sync(service, "0x" + "ff" * 32)
+    assert tracker.positions == {}